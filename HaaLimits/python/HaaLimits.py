@@ -15,6 +15,7 @@ ROOT.gROOT.SetBatch()
 
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
+from CombineLimits.Limits.Selection import sumEntries
 from CombineLimits.Limits.utilities import *
 
 class HaaLimits(Limits):
@@ -337,7 +338,7 @@ class HaaLimits(Limits):
         if self.binned:
             integrals = [histMap[self.SIGNAME.format(h=h,a=a)].Integral() for a in amasses]
         else:
-            integrals = [histMap[self.SIGNAME.format(h=h,a=a)].sumEntries('x>{} && x<{}'.format(*self.XRANGE)) for a in amasses]
+            integrals = [sumEntries(histMap[self.SIGNAME.format(h=h,a=a)],'x>{} && x<{}'.format(*self.XRANGE)) for a in amasses]
         print 'Integrals', tag, h, integrals
 
         param = 'integral'
@@ -385,7 +386,7 @@ class HaaLimits(Limits):
             integral = hist.Integral(hist.FindBin(self.XRANGE[0]),hist.FindBin(self.XRANGE[1]))
             data = ROOT.RooDataHist(name,name,ROOT.RooArgList(self.workspace.var('x')),hist)
         else:
-            integral = hist.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+            integral = sumEntries(hist,'x>{} && x<{}'.format(*self.XRANGE))
             data = hist.Clone(name)
 
         if setUpsilonLambda:
@@ -457,7 +458,7 @@ class HaaLimits(Limits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
             data_obs.SetName(name)
         else:
@@ -482,7 +483,7 @@ class HaaLimits(Limits):
                 if h.InheritsFrom('TH1'):
                     integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
                 else:
-                    integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                    integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
                 data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
                 if addSignal:
                     self.workspace.var('MH').setVal(ma)
@@ -607,7 +608,7 @@ class HaaLimits(Limits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             self.setExpected('bg',region,integral)
 
             for proc in [self.SPLINENAME.format(h=h) for h in self.HMASSES]:
@@ -625,7 +626,7 @@ class HaaLimits(Limits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             self.setExpected('bg',region,integral)
 
             self.setObserved(region,-1) # reads from histogram
@@ -16,6 +16,7 @@ ROOT.gROOT.SetBatch()
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
 from CombineLimits.HaaLimits.HaaLimits import HaaLimits
+from CombineLimits.Limits.Selection import sumEntries
 from CombineLimits.Limits.utilities import *
 
 class HaaLimits2D(HaaLimits):
@@ -753,7 +754,7 @@ class HaaLimits2D(HaaLimits):
         if self.binned:
             integrals = [histMap[self.SIGNAME.format(h=h,a=a)].Integral() for a in amasses]
         else:
-            integrals = [histMap[self.SIGNAME.format(h=h,a=a)].sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE)) for a in amasses]
+            integrals = [sumEntries(histMap[self.SIGNAME.format(h=h,a=a)],'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE)) for a in amasses]
         print 'Integrals', tag, h, integrals
 
         param = 'integral'
@@ -805,7 +806,7 @@ class HaaLimits2D(HaaLimits):
             data = ROOT.RooDataHist(name,name,ROOT.RooArgList(self.workspace.var('x'),self.workspace.var('y')),hist)
         else:
             data = hist.Clone(name)
-            integral = hist.sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
+            integral = sumEntries(hist,'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
 
         data.Print("v")
 #        print "DataSetName=", data.GetName()
@@ -894,7 +895,7 @@ class HaaLimits2D(HaaLimits):
                 if h.InheritsFrom('TH1'):
                     integral = h.Integral() # 2D integral?
                 else:
-                    integral = h.sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
+                    integral = sumEntries(h,'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
                 print "BEFORE DATA_OBS AFTER INTEGRAL"
                 data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x'),self.workspace.var('y')),int(integral))
                 print "AFTER DATA_OBS"
@@ -985,7 +986,7 @@ class HaaLimits2D(HaaLimits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral() # 2D restricted integral?
             else:
-                integral = h.sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
+                integral = sumEntries(h,'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
             self.setExpected('bg',region,integral)
 
             for proc in [self.SPLINENAME.format(h=h) for h in self.HMASSES]:
@@ -1003,7 +1004,7 @@ class HaaLimits2D(HaaLimits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             self.setExpected('bg',region,integral)
 
             self.setObserved(region,-1) # reads from histogram
@@ -7,6 +7,8 @@ import argparse
 import math
 import errno
 import json
+import time
+import multiprocessing
 from array import array
 
 import ROOT
@@ -14,10 +16,26 @@ ROOT.PyConfig.IgnoreCommandLineOptions = True
 ROOT.gROOT.SetBatch()
 
 import CombineLimits.Limits.Models as Models
+import CombineLimits.Limits.NumpyModels as NumpyModels
 from CombineLimits.Limits.Limits import Limits
+from CombineLimits.Limits.ModelGraph import ModelGraph
+from CombineLimits.Limits.ImportRegistry import ImportRegistry, wsimport
 from CombineLimits.HaaLimits.HaaLimitsNew import HaaLimits
+from CombineLimits.Limits.Selection import sumEntries
 from CombineLimits.Limits.utilities import *
 
+# the HaaLimits2D object used by the worker processes, set before the pool is forked
+_signalFitter = None
+
+def _fitSignalPointWorker(task):
+    '''Fit a single signal mass point in a worker process.'''
+    h, a, region, shift, initial, kwargs = task
+    # the queue is copied from the parent, only draw the plots of this point
+    _signalFitter.plotQueue.clear()
+    result = _signalFitter._fitSignalPoint(h,a,region=region,shift=shift,initial=initial,**kwargs)
+    _signalFitter.plotQueue.render()
+    return result
+
 class HaaLimits2D(HaaLimits):
     '''
     Create the Haa Limits workspace
@@ -26,6 +44,20 @@ class HaaLimits2D(HaaLimits):
     YRANGE = [50,1000]
     YBINNING = 19
     YLABEL = 'm_{#mu#mu#tau_{#mu}#tau_{h}}'
+    YFITBINS = 400
+
+    WORKERS = 1 # number of processes for the signal fits
+
+    # the central signal fits start from the fits of the neighbouring masses, beginning at ANCHORMASS
+    WARMSTART = True
+    ANCHORMASS = 7
+    SEEDTABLES = False # start from the hardcoded GetInitialValues* tables where they have an entry
+
+    # dense signal templates (see buildTemplate)
+    TEMPLATE = False        # also store a template of each signal spline model
+    TEMPLATEMHSTEP = 0.1    # the MH step of the limit scans, so that they are table lookups
+    TEMPLATEPOINTS = 2000   # grid points in x and in y
+    TEMPLATECHECKS = 10     # MH values at which the template is compared to the spline model
 
     def __init__(self,histMap,tag=''):
         '''
@@ -48,6 +80,7 @@ class HaaLimits2D(HaaLimits):
 
         self.plotDir = 'figures/HaaLimits2D{}'.format('_'+tag if tag else '')
         self.fitsDir = 'fitParams/HaaLimits2D{}'.format('_'+tag if tag else '')
+        self.templateDeviations = {}
 
 
     ###########################
@@ -61,6 +94,9 @@ class HaaLimits2D(HaaLimits):
     def _buildYModel(self,region='PP',**kwargs):
         workspace = kwargs.pop('workspace',self.workspace)
         tag = kwargs.pop('tag',region)
+        graph = kwargs.pop('graph',None)
+        doBuild = graph is None
+        if doBuild: graph = ModelGraph()
 
         # try landau
         if self.YRANGE[1]>100:
@@ -106,14 +142,14 @@ class HaaLimits2D(HaaLimits):
                 lamb = [-0.015917105481197694,-0.1,0],
             )
             nameC1 = 'conty1{}'.format('_'+tag if tag else '')
-            cont1.build(self.workspace,nameC1)
+            graph.add(cont1,nameC1)
 
             cont2 = Models.Exponential('conty2',
                 x = 'y',
                 lamb = [-0.08200651250658608,-0.1,-0.01],
             )
             nameC2 = 'conty2{}'.format('_'+tag if tag else '')
-            cont2.build(self.workspace,nameC2)
+            graph.add(cont2,nameC2)
 
             bg = Models.Sum('bg',
                 **{
@@ -123,7 +159,7 @@ class HaaLimits2D(HaaLimits):
                 }
             )
             nameSum = 'bg_{}'.format(region)
-            bg.build(self.workspace,nameSum)
+            graph.add(bg,nameSum)
 #
 #            bg = Models.Prod('bg',
 #                nameE1,
@@ -188,7 +224,7 @@ class HaaLimits2D(HaaLimits):
                 mu    = kwargs.pop('mu_{}'.format(nameL1), [1.5,0,5]),
                 sigma = kwargs.pop('sigma_{}'.format(nameL1), [0.4,0,2]),
             )
-            land1.build(workspace,nameL1)
+            graph.add(land1,nameL1)
 
             # jpsi
             #jpsi2 = Models.Voigtian('jpsi2S',
@@ -208,7 +244,7 @@ class HaaLimits2D(HaaLimits):
                 mean  = kwargs.pop('mean_{}'.format(nameU1), [6,5,7]),
                 sigma = kwargs.pop('sigma_{}'.format(nameU1), [0.02,0,1]),
             )
-            upsilon1.build(workspace,nameU1)
+            graph.add(upsilon1,nameU1)
 
             bg = Models.Sum('bg',
                 **{
@@ -287,7 +323,8 @@ class HaaLimits2D(HaaLimits):
         #    )
 
         name = 'bg_{}'.format(region)
-        bg.build(workspace,name)
+        graph.add(bg,name)
+        if doBuild: graph.build(workspace,name)
 
     def _buildXModel(self,region='PP',**kwargs):
         super(HaaLimits2D,self).buildModel(region,**kwargs)
@@ -295,12 +332,13 @@ class HaaLimits2D(HaaLimits):
     def buildModel(self,region='PP',**kwargs):
         workspace = kwargs.pop('workspace',self.workspace)
         tag = kwargs.pop('tag',region)
+        graph = ModelGraph()
 
         # build the x variable
-        self._buildXModel(region+'_x',workspace=workspace,**kwargs)
+        self._buildXModel(region+'_x',workspace=workspace,graph=graph,**kwargs)
 
         # build the y variable
-        self._buildYModel(region+'_y',workspace=workspace,**kwargs)
+        self._buildYModel(region+'_y',workspace=workspace,graph=graph,**kwargs)
 
         # the 2D model
         cont1 = Models.Prod('cont1',
@@ -308,57 +346,61 @@ class HaaLimits2D(HaaLimits):
             'bg_{}_y'.format(region),
         )
         name = 'cont1_{}_xy'.format(region)
-        cont1.build(workspace,name)
+        graph.add(cont1,name)
 
         cont2 = Models.Prod('cont2',
             'cont2_{}_x'.format(region),
             'bg_{}_y'.format(region),
         )
         name = 'cont2_{}_xy'.format(region)
-        cont2.build(workspace,name)
+        graph.add(cont2,name)
 
         jpsi1S = Models.Prod('jpsi1S',
             'jpsi1S',
             'bg_{}_y'.format(region),
         )
         name = 'jpsi1S_{}_xy'.format(region)
-        jpsi1S.build(workspace,name)
+        graph.add(jpsi1S,name)
   
         jpsi2S = Models.Prod('jpsi2S',
             'jpsi2S',
             'bg_{}_y'.format(region),
         )
         name = 'jpsi2S_{}_xy'.format(region)
-        jpsi2S.build(workspace,name)
+        graph.add(jpsi2S,name)
 
         upsilon1S = Models.Prod('upsilon1S',
             'upsilon1S',
             'bg_{}_y'.format(region),
         )
         name = 'upsilon1S_{}_xy'.format(region)
-        upsilon1S.build(workspace,name)
+        graph.add(upsilon1S,name)
 
         upsilon2S = Models.Prod('upsilon2S',
             'upsilon2S',
             'bg_{}_y'.format(region),
         )
         name = 'upsilon2S_{}_xy'.format(region)
-        upsilon2S.build(workspace,name)
+        graph.add(upsilon2S,name)
 
         upsilon3S = Models.Prod('upsilon3S',
             'upsilon3S',
             'bg_{}_y'.format(region),
         )
         name = 'upsilon3S_{}_xy'.format(region)
-        upsilon3S.build(workspace,name)
+        graph.add(upsilon3S,name)
 
         bg = Models.Prod('bg',
             'bg_{}_x'.format(region),
             'bg_{}_y'.format(region),
         )
         name = 'bg_{}_xy'.format(region)
-        bg.build(workspace,name)
+        graph.add(bg,name)
 
+        # the 2D components are only built if the x model uses them
+        used = graph.resolve(['bg_{}_x'.format(region)],workspace)
+        tops = [label for label in graph.labels if label.endswith('_{}_xy'.format(region)) and graph.models[label].args[0] in used]
+        graph.build(workspace,tops)
 
     def fitSignals(self,h,region='PP',shift='',**kwargs):
         '''
@@ -372,11 +414,10 @@ class HaaLimits2D(HaaLimits):
         fit = kwargs.get('fit',False)
         load = kwargs.get('load',False)
         skipFit = kwargs.get('skipFit',False)
-        dobgsig = kwargs.get('doBackgroundSignal',False)
+        fitted = kwargs.pop('fitted',{}) # results of fitSignalPoints, keyed by a
         amasses = self.AMASSES
         if h>125:      amasses = [a for a in amasses if a not in ['3p6',4,6]]
         avals = [float(str(x).replace('p','.')) for x in amasses]
-        histMap = self.histMap[region][shift]
         tag= '{}{}'.format(region,'_'+shift if shift else '')
 
         # initial fit
@@ -393,271 +434,20 @@ class HaaLimits2D(HaaLimits):
             results[h] = {}
             errors[h] = {}
             integrals[h] = {}
-        if self.YRANGE[1] > 100: 
-            if yFitFunc == "DCB_Fix": initialMeans = self.GetInitialDCBMean()
-            if "DCB" in yFitFunc: initialValuesDCB = self.GetInitialValuesDCB(isKinFit=isKinFit)
-            elif yFitFunc == "DG": initialValuesDG = self.GetInitialValuesDG(region=region)
-        elif yFitFunc == "L": initialValuesL = self.GetInitialValuesDitau(isLandau=True)
-        elif yFitFunc == "V": initialValuesV = self.GetInitialValuesDitau(isLandau=False)
-        for a in amasses:
-            aval = float(str(a).replace('p','.'))
-            thisxrange = [0.8*aval, 1.2*aval]
-            thisyrange = [0.15*h, 1.2*h] if self.YRANGE[1]>100 else [self.YRANGE[0], 1.2*aval]
-            if self.YRANGE[1]>100:
-                if  h == 125:  thisyrange = [20, 150]
-                elif h == 300: thisyrange = [40,360]
-                elif h == 750: thisyrange = [140,900]
-            ws = ROOT.RooWorkspace('sig')
-            ws.factory('x[{0}, {1}]'.format(*thisxrange)) 
-            #ws.factory('x[{0}, {1}]'.format(*self.XRANGE))
-            ws.var('x').setUnit('GeV')
-            ws.var('x').setPlotLabel(self.XLABEL)
-            ws.var('x').SetTitle(self.XLABEL)
-            ws.factory('y[{0}, {1}]'.format(*thisyrange)) 
-            #ws.factory('y[{0}, {1}]'.format(*self.YRANGE))
-            ws.var('y').setUnit('GeV')
-            ws.var('y').setPlotLabel(self.YLABEL)
-            ws.var('y').SetTitle(self.YLABEL)
-            modelx = Models.Voigtian('sigx',
-                mean  = [aval,0,30],
-                width = [0.01*aval,0.001,5],
-                sigma = [0.01*aval,0.001,5],
-            )
-            modelx.build(ws, 'sigx')
-            if self.YRANGE[1]>100: # y variable is h mass
-                if yFitFunc == "G": 
-                    modely = Models.Gaussian('sigy',
-                        x = 'y',
-                        mean  = [h,0,1.25*h],
-                        sigma = [0.1*h,0.01,0.5*h],
-                    )
-                elif yFitFunc == "V":
-                    modely = Models.Voigtian('sigy',
-                        x = 'y',
-                        mean  = [0.75*h,0,1.25*h],
-                        width = [0.1*h,0.01,0.5*h],
-                        sigma = [0.1*h,0.01,0.5*h],
-                    )
-                elif yFitFunc == "CB":
-                    modely = Models.CrystalBall('sigy',
-                        x = 'y',
-                        mean  = [h,0,1.25*h],
-                        sigma = [0.1*h,0.01,0.5*h],
-                        a = [1.0,.5,5],
-                        n = [0.5,.1,10],
-                    )
-                elif yFitFunc == "DCB":
-                    modely = Models.DoubleCrystalBall('sigy',
-                        x = 'y',
-                        mean  = [h,0,1.25*h],
-                        sigma = [initialValuesDCB["h"+str(h)+"a"+str(a)]["sigma"],0.05*h,0.5*h],
-                        a1    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["a1"],0.1,10],
-                        n1    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["n1"],1,30],
-                        a2    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["a2"],0.1,10],
-                        n2    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["n2"],0.1,30],
-                    )
-                elif yFitFunc == "DCB_Fix":
-                    MEAN = initialMeans["h"+str(h)+"a"+str(a)]["mean"]
-                    self.YRANGE[0] = MEAN
-                    modely = Models.DoubleCrystalBall('sigy',
-                        x = 'y',
-                        mean  = [MEAN, MEAN-2, MEAN+2],
-                        sigma = [initialValuesDCB["h"+str(h)+"a"+str(a)]["sigma"],0.05*h,0.5*h],
-                        a1    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["a1"],0.1,10],
-                        n1    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["n1"],1,20],
-                        a2    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["a2"],0.1,10],
-                        n2    = [initialValuesDCB["h"+str(h)+"a"+str(a)]["n2"],0.1,5],
-                    )
-                elif yFitFunc == "DG":
-                    modely = Models.DoubleSidedGaussian('sigy',
-                        x = 'y',
-                        #mean  = [h,0,1.25*h],
-                        #sigma1 = [0.1*h,0.05*h,0.5*h],
-                        #sigma2 = [0.2*h,0.05*h,0.5*h],
-                        mean    = [initialValuesDG["h"+str(h)+"a"+str(a)]["mean"],0,1.1*h],
-                        sigma1  = [initialValuesDG["h"+str(h)+"a"+str(a)]["sigma1"],0.05*h,0.5*h],
-                        sigma2  = [initialValuesDG["h"+str(h)+"a"+str(a)]["sigma2"],0.05*h,0.5*h],
-                        yMax = self.YRANGE[1],
-                    )
-                elif yFitFunc == "DV":
-                    modely = Models.DoubleSidedVoigtian('sigy',
-                        x = 'y',
-                        mean  = [h,0,1.25*h],
-                        sigma1 = [0.1*h,0.01,0.5*h],
-                        sigma2 = [0.2*h,0.01,0.5*h],
-                        width1 = [1.0,0.01,10.0],
-                        width2 = [2.0,0.01,10.0],
-                        yMax = self.YRANGE[1],
-                    )
-                else:
-                    raise
-                modely.build(ws, 'sigy')
-                model = Models.Prod('sig',
-                    'sigx',
-                    'sigy',
-                )
-            else: # y variable is tt
-                if yFitFunc == "G":
-                    modely = Models.Gaussian('sigy',
-                        x = 'y',
-                        mean  = [0.5*aval,0,1.25*aval],
-                        sigma = [0.1*aval,0.01,0.5*aval],
-                    )
-                elif yFitFunc == "V":
-                    modely = Models.Voigtian('sigy',
-                        x = 'y',
-                        mean  = [initialValuesV["h"+str(h)+"a"+str(a)]["mean_sigy"],0.75,30],
-                        width = [initialValuesV["h"+str(h)+"a"+str(a)]["width_sigy"],0.01,5],
-                        sigma = [initialValuesV["h"+str(h)+"a"+str(a)]["sigma_sigy"],0.01,5],
-                    )
-                elif yFitFunc == "CB":
-                    modely = Models.CrystalBall('sigy',
-                        x = 'y',
-                        mean  = [0.5*aval,0,30],
-                        sigma = [0.1*aval,0,5],
-                        a = [1.0,0.5,5],
-                        n = [0.5,0.1,10],
-                    )
-                elif yFitFunc == "DCB":
-                    modely = Models.DoubleCrystalBall('sigy',
-                        x = 'y',
-                        mean  = [0.5*aval,0.5,30],
-                        sigma = [0.1*aval,0.1,5],
-                        a1 = [1.0,0.1,6],
-                        n1 = [0.9,0.1,6],
-                        a2 = [2.0,0.1,10],
-                        n2 = [1.5,0.1,10],
-                    )
-                elif yFitFunc == "DG":
-                    modely = Models.DoubleSidedGaussian('sigy',
-                        x = 'y',
-                        mean  = [0.5*aval,0,30],
-                        sigma1 = [0.1*aval,0.05*aval,0.4*aval],
-                        sigma2 = [0.3*aval,0.05*aval,0.4*aval],
-                        yMax = self.YRANGE[1],
-                    )
-                elif yFitFunc == "DV":
-                    modely = Models.DoubleSidedVoigtian('sigy',
-                        x = 'y',
-                        mean  = [0.5*aval,0,30],
-                        sigma1 = [0.1*aval,0.05*aval,0.4*aval],
-                        sigma2 = [0.3*aval,0.05*aval,0.4*aval],
-                        width1 = [0.1,0.01,5],
-                        width2 = [0.3,0.01,5],
-                        yMax = self.YRANGE[1],
-                    )
-                elif yFitFunc == "errG":
-                    tterf = Models.Erf('tterf',
-                       x = 'y',
-                       erfScale = [0.4,0.1,5],
-                       erfShift = [0.2*aval,0.05*aval,aval],
-                    )
-                    ttgaus = Models.Gaussian('ttgaus',
-                       x = 'y',
-                       mean  = [0.45*aval,0,aval],
-                       sigma = [0.1*aval,0.05*aval,0.4*aval],
-                    )
-                    ttgaus.build(ws,"ttgaus")
-                    tterf.build(ws,"tterf")
-                    modely = Models.Prod('sigy',
-                            'ttgaus',
-                            'tterf',
-                    )
-                elif yFitFunc == "L":
-                    #modely = Models.Landau('sigy',
-                    #    x = 'y',
-                    #    mu  = [0.5*aval,0,30],
-                    #    sigma = [0.1*aval,0.05*aval,aval],
-                    #)
-                    ttland = Models.Landau('ttland',
-                        x = 'y',
-                        mu  = [initialValuesL["h"+str(h)+"a"+str(a)]["mu_ttland"],0.01,30],
-                        sigma = [initialValuesL["h"+str(h)+"a"+str(a)]["sigma_ttland"],0.01,aval],
-                    )
-                    ttland.build(ws,'ttland')
-                    ttgaus = Models.Gaussian('ttgaus',
-                       x = 'y',
-                       mean  = [initialValuesL["h"+str(h)+"a"+str(a)]["mean_ttgaus"],0.01,30],
-                       #mean  = [initialValuesL["h"+str(h)+"a"+str(a)]["mean_ttgaus"],0.2*initialValuesL["h"+str(h)+"a"+str(a)]["mean_ttgaus"],30],
-                       sigma = [initialValuesL["h"+str(h)+"a"+str(a)]["sigma_ttgaus"],0.01,aval],
-                    )
-                    ttgaus.build(ws,"ttgaus")
-                    modely = Models.Prod('sigy',
-                            'ttgaus',
-                            'ttland',
-                    )
-                    #modely = Models.Sum('sigy',
-                    #    **{
-                    #        'ttland'     : [0.9,0,1],
-                    #        'ttgaus'     : [0.5,0,1],
-                    #        'recursive': True,
-                    #    }
-                    #)
-                else:
-                    raise
-
-                modely.build(ws, 'sigy')
-
-                if region=='PP' or not dobgsig:
-                    model = Models.Prod('sig',
-                        'sigx',
-                        'sigy',
-                    )
-                else:
-                    conty = Models.Exponential('conty',
-                        x = 'y',
-                        lamb = [-0.25,-1,-0.001], # visible
-                    )
-                    conty.build(ws,'conty')
-
-                    erfy = Models.Erf('erfy',
-                        x = 'y',
-                        erfScale = [0.1,0.01,10],
-                        erfShift = [2,0,10],
-                    )
-                    erfy.build(ws,'erfy')
-
-                    erfc = Models.Prod('erfcy',
-                        'erfy',
-                        'conty',
-                    )
-                    erfc.build(ws,'erfcy')
-
-                    modelymod = Models.Sum('bgsigy',
-                        **{ 
-                            'erfcy'    : [0.5,0,1],
-                            'sigy'     : [0.5,0,1],
-                            'recursive': True,
-                        }
-                    )
-                    modelymod.build(ws,'bgsigy')
-
-                    model = Models.Prod('sig',
-                        'sigx',
-                        'bgsigy',
-                    )
-
-            name = 'h{}_a{}_{}'.format(h,a,tag)
-            model.build(ws, name)
-            if load:
-                for param in results[h][a]:
-                    ws.var(param).setVal(results[h][a][param])
-            elif shift and not skipFit:
-                for param in results[h][a]:
-                    #ws.var(param+'_{}'.format(shift)).setVal(results[h][a][param])
-                    ws.var(param).setVal(results[h][a][param])
-            hist = histMap[self.SIGNAME.format(h=h,a=a)]
-            saveDir = '{}/{}'.format(self.plotDir,shift if shift else 'central')
-            if not skipFit:
-                results[h][a], errors[h][a] = model.fit2D(ws, hist, name, saveDir=saveDir, save=True, doErrors=True)
-                if self.binned:
-                    integral = histMap[self.SIGNAME.format(h=h,a=a)].Integral()
+        stats = {}
+        for step in self.signalFitOrder(amasses):
+            for a, neighbours in step:
+                if skipFit: continue
+                if a in fitted:
+                    # already fit in parallel, see fitSignalPoints
+                    results[h][a], errors[h][a], integrals[h][a], stats[a] = fitted[a]
+                    continue
+                if load or shift:
+                    initial = results[h].get(a,{})
                 else:
-                    integral = histMap[self.SIGNAME.format(h=h,a=a)].sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
-                    if integral!=integral:
-                        logging.error('Integral for spline is invalid: h{h} a{a} {region} {shift}'.format(h=h,a=a,region=region,shift=shift))
-                        raise
-                integrals[h][a] = integral
+                    initial = self.warmStart(h,a,neighbours,results[h],region=region,yFitFunc=yFitFunc,isKinFit=isKinFit)
+                results[h][a], errors[h][a], integrals[h][a], stats[a] = self._fitSignalPoint(h,a,region=region,shift=shift,initial=initial,yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
+        if stats: self.logSignalFitStats(h,tag,stats)
 
     
         savedir = '{}/{}'.format(self.fitsDir,shift if shift else 'central')
@@ -665,6 +455,7 @@ class HaaLimits2D(HaaLimits):
         savename = '{}/h{}_{}.json'.format(savedir,h,tag)
         jsonData = {'vals': results, 'errs': errors, 'integrals': integrals}
         self.dump(savename,jsonData)
+        if self.fitCache: self.fitCache.logStats()
 
         # Fit using ROOT rather than RooFit for the splines
         if yFitFunc == "V":
@@ -837,6 +628,410 @@ class HaaLimits2D(HaaLimits):
 
         return results, errors, integrals
 
+    def _fitSignalPoint(self,h,a,region='PP',shift='',initial={},**kwargs):
+        '''
+        Fit the signal model for a single Higgs and pseudoscalar mass.
+        The fit starts from the parameter values in "initial" if given.
+        Returns the fitted values, errors, the signal integral and the fit statistics (see Model.logFit).
+        '''
+        isKinFit = kwargs.pop('isKinFit',False)
+        yFitFunc = kwargs.pop('yFitFunc','G')
+        dobgsig = kwargs.get('doBackgroundSignal',False)
+        histMap = self.histMap[region][shift]
+        tag= '{}{}'.format(region,'_'+shift if shift else '')
+
+        aval = float(str(a).replace('p','.'))
+        # hardcoded initial values, if any, otherwise generic defaults
+        seeds = self.getSeedTable(h,a,region=region,yFitFunc=yFitFunc,isKinFit=isKinFit) if self.SEEDTABLES else {}
+        thisxrange = [0.8*aval, 1.2*aval]
+        thisyrange = [0.15*h, 1.2*h] if self.YRANGE[1]>100 else [self.YRANGE[0], 1.2*aval]
+        if self.YRANGE[1]>100:
+            if  h == 125:  thisyrange = [20, 150]
+            elif h == 300: thisyrange = [40,360]
+            elif h == 750: thisyrange = [140,900]
+        # lower y bound of the integral, raised to the fixed mean for DCB_Fix
+        # (kept local, the fits may run in worker processes)
+        yMin = self.YRANGE[0]
+        ws = ROOT.RooWorkspace('sig')
+        ws.factory('x[{0}, {1}]'.format(*thisxrange)) 
+        #ws.factory('x[{0}, {1}]'.format(*self.XRANGE))
+        ws.var('x').setUnit('GeV')
+        ws.var('x').setPlotLabel(self.XLABEL)
+        ws.var('x').SetTitle(self.XLABEL)
+        ws.factory('y[{0}, {1}]'.format(*thisyrange)) 
+        #ws.factory('y[{0}, {1}]'.format(*self.YRANGE))
+        ws.var('y').setUnit('GeV')
+        ws.var('y').setPlotLabel(self.YLABEL)
+        ws.var('y').SetTitle(self.YLABEL)
+        modelx = Models.Voigtian('sigx',
+            mean  = [aval,0,30],
+            width = [0.01*aval,0.001,5],
+            sigma = [0.01*aval,0.001,5],
+        )
+        modelx.build(ws, 'sigx')
+        if self.YRANGE[1]>100: # y variable is h mass
+            if yFitFunc == "G": 
+                modely = Models.Gaussian('sigy',
+                    x = 'y',
+                    mean  = [h,0,1.25*h],
+                    sigma = [0.1*h,0.01,0.5*h],
+                )
+            elif yFitFunc == "V":
+                modely = Models.Voigtian('sigy',
+                    x = 'y',
+                    mean  = [0.75*h,0,1.25*h],
+                    width = [0.1*h,0.01,0.5*h],
+                    sigma = [0.1*h,0.01,0.5*h],
+                )
+            elif yFitFunc == "CB":
+                modely = Models.CrystalBall('sigy',
+                    x = 'y',
+                    mean  = [h,0,1.25*h],
+                    sigma = [0.1*h,0.01,0.5*h],
+                    a = [1.0,.5,5],
+                    n = [0.5,.1,10],
+                )
+            elif yFitFunc == "DCB":
+                modely = Models.DoubleCrystalBall('sigy',
+                    x = 'y',
+                    mean  = [h,0,1.25*h],
+                    sigma = [seeds.get("sigma",0.1*h),0.05*h,0.5*h],
+                    a1    = [seeds.get("a1",1.0),0.1,10],
+                    n1    = [seeds.get("n1",2.0),1,30],
+                    a2    = [seeds.get("a2",1.0),0.1,10],
+                    n2    = [seeds.get("n2",2.0),0.1,30],
+                )
+            elif yFitFunc == "DCB_Fix":
+                # the mean is part of the model (its window and the integral bound), not a starting value
+                key = 'h{}a{}'.format(h,a)
+                means = self.GetInitialDCBMean()
+                if key not in means:
+                    logging.error('No DCB_Fix mean for {}'.format(key))
+                    raise ValueError('GetInitialDCBMean has no entry for {}'.format(key))
+                MEAN = means[key]["mean"]
+                yMin = MEAN
+                # the fit of this point starts from the mean of its window
+                initial = dict([(param,value) for param,value in initial.iteritems() if param!='mean_sigy'])
+                modely = Models.DoubleCrystalBall('sigy',
+                    x = 'y',
+                    mean  = [MEAN, MEAN-2, MEAN+2],
+                    sigma = [seeds.get("sigma",0.1*h),0.05*h,0.5*h],
+                    a1    = [seeds.get("a1",1.0),0.1,10],
+                    n1    = [seeds.get("n1",2.0),1,20],
+                    a2    = [seeds.get("a2",1.0),0.1,10],
+                    n2    = [seeds.get("n2",2.0),0.1,5],
+                )
+            elif yFitFunc == "DG":
+                modely = Models.DoubleSidedGaussian('sigy',
+                    x = 'y',
+                    #mean  = [h,0,1.25*h],
+                    #sigma1 = [0.1*h,0.05*h,0.5*h],
+                    #sigma2 = [0.2*h,0.05*h,0.5*h],
+                    mean    = [seeds.get("mean",0.75*h),0,1.1*h],
+                    sigma1  = [seeds.get("sigma1",0.1*h),0.05*h,0.5*h],
+                    sigma2  = [seeds.get("sigma2",0.1*h),0.05*h,0.5*h],
+                    yMax = self.YRANGE[1],
+                )
+            elif yFitFunc == "DV":
+                modely = Models.DoubleSidedVoigtian('sigy',
+                    x = 'y',
+                    mean  = [h,0,1.25*h],
+                    sigma1 = [0.1*h,0.01,0.5*h],
+                    sigma2 = [0.2*h,0.01,0.5*h],
+                    width1 = [1.0,0.01,10.0],
+                    width2 = [2.0,0.01,10.0],
+                    yMax = self.YRANGE[1],
+                )
+            else:
+                raise
+            modely.build(ws, 'sigy')
+            model = Models.Prod('sig',
+                'sigx',
+                'sigy',
+            )
+        else: # y variable is tt
+            if yFitFunc == "G":
+                modely = Models.Gaussian('sigy',
+                    x = 'y',
+                    mean  = [0.5*aval,0,1.25*aval],
+                    sigma = [0.1*aval,0.01,0.5*aval],
+                )
+            elif yFitFunc == "V":
+                modely = Models.Voigtian('sigy',
+                    x = 'y',
+                    mean  = [seeds.get("mean_sigy",0.5*aval),0.75,30],
+                    width = [seeds.get("width_sigy",0.1),0.01,5],
+                    sigma = [seeds.get("sigma_sigy",0.1*aval),0.01,5],
+                )
+            elif yFitFunc == "CB":
+                modely = Models.CrystalBall('sigy',
+                    x = 'y',
+                    mean  = [0.5*aval,0,30],
+                    sigma = [0.1*aval,0,5],
+                    a = [1.0,0.5,5],
+                    n = [0.5,0.1,10],
+                )
+            elif yFitFunc == "DCB":
+                modely = Models.DoubleCrystalBall('sigy',
+                    x = 'y',
+                    mean  = [0.5*aval,0.5,30],
+                    sigma = [0.1*aval,0.1,5],
+                    a1 = [1.0,0.1,6],
+                    n1 = [0.9,0.1,6],
+                    a2 = [2.0,0.1,10],
+                    n2 = [1.5,0.1,10],
+                )
+            elif yFitFunc == "DG":
+                modely = Models.DoubleSidedGaussian('sigy',
+                    x = 'y',
+                    mean  = [0.5*aval,0,30],
+                    sigma1 = [0.1*aval,0.05*aval,0.4*aval],
+                    sigma2 = [0.3*aval,0.05*aval,0.4*aval],
+                    yMax = self.YRANGE[1],
+                )
+            elif yFitFunc == "DV":
+                modely = Models.DoubleSidedVoigtian('sigy',
+                    x = 'y',
+                    mean  = [0.5*aval,0,30],
+                    sigma1 = [0.1*aval,0.05*aval,0.4*aval],
+                    sigma2 = [0.3*aval,0.05*aval,0.4*aval],
+                    width1 = [0.1,0.01,5],
+                    width2 = [0.3,0.01,5],
+                    yMax = self.YRANGE[1],
+                )
+            elif yFitFunc == "errG":
+                tterf = Models.Erf('tterf',
+                   x = 'y',
+                   erfScale = [0.4,0.1,5],
+                   erfShift = [0.2*aval,0.05*aval,aval],
+                )
+                ttgaus = Models.Gaussian('ttgaus',
+                   x = 'y',
+                   mean  = [0.45*aval,0,aval],
+                   sigma = [0.1*aval,0.05*aval,0.4*aval],
+                )
+                ttgaus.build(ws,"ttgaus")
+                tterf.build(ws,"tterf")
+                modely = Models.Prod('sigy',
+                        'ttgaus',
+                        'tterf',
+                )
+            elif yFitFunc == "L":
+                #modely = Models.Landau('sigy',
+                #    x = 'y',
+                #    mu  = [0.5*aval,0,30],
+                #    sigma = [0.1*aval,0.05*aval,aval],
+                #)
+                ttland = Models.Landau('ttland',
+                    x = 'y',
+                    mu  = [seeds.get("mu_ttland",0.5*aval),0.01,30],
+                    sigma = [seeds.get("sigma_ttland",0.1*aval),0.01,aval],
+                )
+                ttland.build(ws,'ttland')
+                ttgaus = Models.Gaussian('ttgaus',
+                   x = 'y',
+                   mean  = [seeds.get("mean_ttgaus",0.45*aval),0.01,30],
+                   #mean  = [initialValuesL["h"+str(h)+"a"+str(a)]["mean_ttgaus"],0.2*initialValuesL["h"+str(h)+"a"+str(a)]["mean_ttgaus"],30],
+                   sigma = [seeds.get("sigma_ttgaus",0.1*aval),0.01,aval],
+                )
+                ttgaus.build(ws,"ttgaus")
+                modely = Models.Prod('sigy',
+                        'ttgaus',
+                        'ttland',
+                )
+                #modely = Models.Sum('sigy',
+                #    **{
+                #        'ttland'     : [0.9,0,1],
+                #        'ttgaus'     : [0.5,0,1],
+                #        'recursive': True,
+                #    }
+                #)
+            else:
+                raise
+
+            modely.build(ws, 'sigy')
+
+            if region=='PP' or not dobgsig:
+                model = Models.Prod('sig',
+                    'sigx',
+                    'sigy',
+                )
+            else:
+                conty = Models.Exponential('conty',
+                    x = 'y',
+                    lamb = [-0.25,-1,-0.001], # visible
+                )
+                conty.build(ws,'conty')
+
+                erfy = Models.Erf('erfy',
+                    x = 'y',
+                    erfScale = [0.1,0.01,10],
+                    erfShift = [2,0,10],
+                )
+                erfy.build(ws,'erfy')
+
+                erfc = Models.Prod('erfcy',
+                    'erfy',
+                    'conty',
+                )
+                erfc.build(ws,'erfcy')
+
+                modelymod = Models.Sum('bgsigy',
+                    **{ 
+                        'erfcy'    : [0.5,0,1],
+                        'sigy'     : [0.5,0,1],
+                        'recursive': True,
+                    }
+                )
+                modelymod.build(ws,'bgsigy')
+
+                model = Models.Prod('sig',
+                    'sigx',
+                    'bgsigy',
+                )
+
+        name = 'h{}_a{}_{}'.format(h,a,tag)
+        model.build(ws, name)
+        for param in initial:
+            ws.var(param).setVal(initial[param])
+        hist = histMap[self.SIGNAME.format(h=h,a=a)]
+        saveDir = '{}/{}'.format(self.plotDir,shift if shift else 'central')
+        vals, errs = model.fit2D(ws, hist, name, saveDir=saveDir, save=self.PLOTS, doErrors=True, cache=self.fitCache, plots=self.plotQueue,
+            binThreshold=self.BINTHRESHOLD, fitBins=[self.XFITBINS,self.YFITBINS], validationEntries=self.BINVALIDATION, numCPU=self.NUMCPU)
+        ImportRegistry.release(ws)
+        if self.binned:
+            integral = hist.Integral()
+        else:
+            integral = sumEntries(hist,'x>{} && x<{} && y>{} && y<{}'.format(self.XRANGE[0],self.XRANGE[1],yMin,self.YRANGE[1]))
+            if integral!=integral:
+                logging.error('Integral for spline is invalid: h{h} a{a} {region} {shift}'.format(h=h,a=a,region=region,shift=shift))
+                raise
+        return vals, errs, integral, getattr(model,'fitStats',{}).get(name,{})
+
+    def signalFitOrder(self,amasses):
+        '''
+        Order the pseudoscalar masses for warm started fits: the mass closest to
+        ANCHORMASS first, then outward on both sides.
+        Returns a list of steps, each a list of (a, neighbours), where neighbours
+        are the (up to) two masses on the same side fit just before a, nearest first.
+        The masses within a step do not depend on each other.
+        '''
+        avals = dict([(a,float(str(a).replace('p','.'))) for a in amasses])
+        anchor = min(amasses, key=lambda a: abs(avals[a]-self.ANCHORMASS))
+        below = sorted([a for a in amasses if avals[a]<avals[anchor]], key=lambda a: -avals[a])
+        above = sorted([a for a in amasses if avals[a]>avals[anchor]], key=lambda a: avals[a])
+        steps = [[(anchor,[])]]
+        for i in range(max(len(below),len(above))):
+            step = []
+            for side in [below,above]:
+                if i>=len(side): continue
+                chain = [anchor]+side
+                step += [(side[i], [chain[i],chain[i-1]] if i else [chain[i]])]
+            steps += [step]
+        return steps
+
+    def warmStart(self,h,a,neighbours,results,region='PP',yFitFunc='V',isKinFit=False):
+        '''
+        Initial values for the fit of mass point a: the fitted values of the
+        neighbouring masses, interpolated linearly in a (copied if there is only one).
+        Points with hardcoded initial values start from those if SEEDTABLES is set.
+        '''
+        neighbours = [n for n in neighbours if n in results]
+        if not self.WARMSTART or not neighbours: return {}
+        if self.SEEDTABLES and self.getSeedTable(h,a,region=region,yFitFunc=yFitFunc,isKinFit=isKinFit): return {}
+        if len(neighbours)==1: return dict(results[neighbours[0]])
+        aval = float(str(a).replace('p','.'))
+        a1, a2 = neighbours[:2]
+        aval1 = float(str(a1).replace('p','.'))
+        aval2 = float(str(a2).replace('p','.'))
+        initial = {}
+        for param in results[a1]:
+            if param not in results[a2]: continue
+            slope = (results[a2][param]-results[a1][param])/(aval2-aval1)
+            initial[param] = results[a1][param] + slope*(aval-aval1)
+        return initial
+
+    def getSeedTable(self,h,a,region='PP',yFitFunc='V',isKinFit=False):
+        '''Return the hardcoded initial values of the y model for a signal point, or an empty dict.'''
+        key = 'h{}a{}'.format(h,a)
+        seeds = {}
+        if self.YRANGE[1] > 100:
+            if "DCB" in yFitFunc: seeds.update(self.GetInitialValuesDCB(isKinFit=isKinFit).get(key,{}))
+            elif yFitFunc == "DG": seeds.update(self.GetInitialValuesDG(region=region).get(key,{}))
+        elif yFitFunc == "L": seeds.update(self.GetInitialValuesDitau(isLandau=True).get(key,{}))
+        elif yFitFunc == "V": seeds.update(self.GetInitialValuesDitau(isLandau=False).get(key,{}))
+        return seeds
+
+    def logSignalFitStats(self,h,tag,stats):
+        '''Log the total number of function calls and fit time of the signal fits for a Higgs mass.'''
+        fits = [stats[a] for a in stats if stats[a]]
+        calls = sum([s['calls'] for s in fits])
+        fitTime = sum([s['time'] for s in fits])
+        logging.info('Signal fits h{} {}: {} fits ({} from cache), {} calls, {:.1f} s'.format(h,tag,len(stats),len(stats)-len(fits),calls,fitTime))
+
+    def fitSignalPoints(self,workers,yFitFuncFP='V',yFitFuncPP='V',isKinFit=False,**kwargs):
+        '''
+        Fit every (region, h, a, shift) signal point in a pool of worker processes.
+        The central fits are done first, one step of signalFitOrder at a time so that
+        they start from the same neighbouring fits as in fitSignals, then the shifted
+        fits, which start from the central values. Each point is fit in its own
+        workspace from these initial values, so the results do not depend on the
+        number of workers.
+        Returns fitted[(region,h,shift)][a] = (vals, errs, integral, stats), to be passed to fitSignals.
+        '''
+        global _signalFitter
+        _signalFitter = self
+
+        def run(tasks):
+            if not tasks: return []
+            logging.info('Fitting {} signal points with {} workers'.format(len(tasks),workers))
+            pool = multiprocessing.Pool(workers)
+            try:
+                results = pool.map(_fitSignalPointWorker, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            return results
+
+        start = time.time()
+        orders = {}
+        pointKwargs = {}
+        shifted = []
+        for region in self.REGIONS:
+            yFitFunc = yFitFuncPP if region=='PP' else yFitFuncFP
+            pointKwargs[region] = dict(kwargs, yFitFunc=yFitFunc, isKinFit=isKinFit)
+            for h in self.HMASSES:
+                amasses = self.AMASSES
+                if h>125: amasses = [a for a in amasses if a not in ['3p6',4,6]]
+                orders[(region,h)] = self.signalFitOrder(amasses)
+                for a in amasses:
+                    for shift in self.SIGNALSHIFTS:
+                        shifted += [(h,a,region,shift+'Up',{},pointKwargs[region])]
+                        shifted += [(h,a,region,shift+'Down',{},pointKwargs[region])]
+                    for shift in self.QCDSHIFTS:
+                        shifted += [(h,a,region,shift,{},pointKwargs[region])]
+
+        fitted = {}
+        for step in range(max([len(order) for order in orders.values()])):
+            central = []
+            for (region,h),order in sorted(orders.items()):
+                if step>=len(order): continue
+                results = dict([(a,result[0]) for a,result in fitted.get((region,h,''),{}).iteritems()])
+                for a, neighbours in order[step]:
+                    initial = self.warmStart(h,a,neighbours,results,region=region,yFitFunc=pointKwargs[region]['yFitFunc'],isKinFit=isKinFit)
+                    central += [(h,a,region,'',initial,pointKwargs[region])]
+            for task,result in zip(central,run(central)):
+                h, a, region, shift = task[:4]
+                fitted.setdefault((region,h,shift),{})[a] = result
+
+        shifted = [(h,a,region,shift,fitted[(region,h,'')][a][0],kw) for h,a,region,shift,initial,kw in shifted]
+        for task,result in zip(shifted,run(shifted)):
+            h, a, region, shift = task[:4]
+            fitted.setdefault((region,h,shift),{})[a] = result
+
+        logging.info('Fit all signal points in {:.1f} s'.format(time.time()-start))
+        return fitted
+
     def buildSpline(self,h,vals,errs,integrals,region='PP',shifts=[],isKinFit=False,**kwargs):
         '''
         Get the signal spline for a given Higgs mass.
@@ -861,9 +1056,11 @@ class HaaLimits2D(HaaLimits):
                 ...
             ]
         and similarly for errors and integrals.
+        With template=True (default TEMPLATE), a dense template of the spline model is also stored (see buildTemplate).
         '''
         workspace = kwargs.pop('workspace',self.workspace)
         yFitFunc = kwargs.pop('yFitFunc','G')
+        template = kwargs.pop('template',self.TEMPLATE)
         ygausOnly = kwargs.get('ygausOnly',False)
         fit = kwargs.get('fit',False)
         dobgsig = kwargs.get('doBackgroundSignal',False)
@@ -951,6 +1148,7 @@ class HaaLimits2D(HaaLimits):
                 **{param: 'x{param}_h{h}_{region}_sigx'.format(param=param, h=h, region=region) for param in params}
             )
         modelx.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_x'))
+        components = [(modelx, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_x'))] # for the template
 
         if   yFitFunc == "V"   : ym = Models.Voigtian
         elif yFitFunc == "G"   : ym = Models.Gaussian
@@ -970,11 +1168,13 @@ class HaaLimits2D(HaaLimits):
                      **{param: 'y{param}_ttgaus_h{h}_{region}_sigy'.format(param=param, h=h, region=region) for param in ['mean','sigma']}
                 )
                 modely_gaus.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'))
+                components += [(modely_gaus, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'))]
                 modely_erf = Models.Erf("model_erf",
                     x = 'y',
                      **{param: 'y{param}_tterf_h{h}_{region}_sigy'.format(param=param, h=h, region=region) for param in ['ergScales','erfShifts']}
                 )
                 modely_erf.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_erf_y'))
+                components += [(modely_erf, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_erf_y'))]
                 modely = Models.Prod(self.SPLINENAME.format(h=h)+'_y',
                     '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'),
                     '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_erf_y'),
@@ -985,11 +1185,13 @@ class HaaLimits2D(HaaLimits):
                      **{param: 'y{param}_ttgaus_h{h}_{region}_sigy'.format(param=param, h=h, region=region) for param in ['mean','sigma']}
                 )
                 modely_gaus.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'))
+                components += [(modely_gaus, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'))]
                 modely_land = Models.Landau("model_land",
                     x = 'y',
                      **{param: 'y{param}_ttland_h{h}_{region}_sigy'.format(param=param, h=h, region=region) for param in ['mu','sigma']}
                 )
                 modely_land.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_land_y'))
+                components += [(modely_land, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_land_y'))]
                 modely = Models.Prod(self.SPLINENAME.format(h=h)+'_y',
                     '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_gaus_y'),
                     '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_land_y'),
@@ -1001,6 +1203,7 @@ class HaaLimits2D(HaaLimits):
                     **{param: 'y{param}_h{h}_{region}_sigy'.format(param=param, h=h, region=region) for param in yparameters}
                 )
         modely.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region+'_y'))
+        components += [(modely, '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_y'))]
                 
         model = Models.Prod(self.SPLINENAME.format(h=h),
             '{}_{}'.format(self.SPLINENAME.format(h=h),region+'_x'),
@@ -1008,13 +1211,77 @@ class HaaLimits2D(HaaLimits):
         )
         model.build(workspace,'{}_{}'.format(self.SPLINENAME.format(h=h),region))
 
+        if template: self.templateDeviations['{}_{}'.format(self.SPLINENAME.format(h=h),region)] = self.buildTemplate(h,region,splines,components,workspace=workspace)
+
         return model
 
+    def buildTemplate(self,h,region,splines,components,workspace=None):
+        '''
+        Precompute the normalized signal spline model of h on a dense grid in MH
+        and store it in the workspace as template_{spline}_{region}.
+        The spline model is a product of a pdf in x and a pdf in y, so the template is
+        the product of an MHTemplatePdf in x and one in y rather than a full (MH,x,y) table.
+        The grid values are evaluated with NumpyModels from components, the (model, label)
+        the spline model was built from, with the central values of the parameter splines.
+        Returns the largest deviation from the spline model in each observable, relative to its maximum,
+        at the MH of the grid and halfway between them.
+        '''
+        if workspace is None: workspace = self.workspace
+        name = '{}_{}'.format(self.SPLINENAME.format(h=h),region)
+        evaluator = NumpyModels.Evaluator({'x': self.XRANGE, 'y': self.YRANGE})
+        for model, label in components:
+            evaluator.add(model,label)
+        # the splines are not extrapolated beyond their knots
+        masses = splines.values()[0].kwargs.get('masses',[])
+        mhmin = max(self.SPLINERANGE[0],min(masses))
+        nmh = int((min(self.SPLINERANGE[1],max(masses))-mhmin)/self.TEMPLATEMHSTEP+1e-6)+1
+        mhs = mhmin+self.TEMPLATEMHSTEP*np.arange(nmh)
+        checks = mhs[np.unique(np.linspace(0,nmh-1,self.TEMPLATECHECKS).astype(int))]
+        params = dict([(paramName, NumpyModels.spline(s.kwargs.get('masses',[]),s.kwargs.get('values',[]),mhs)) for paramName, s in splines.iteritems()])
+        mhvar = workspace.var('MH')
+        deviations = {}
+        for obs, (lo, hi) in [('x',self.XRANGE),('y',self.YRANGE)]:
+            label = '{}_{}'.format(name,obs)
+            templateName = 'template_{}'.format(label)
+            grid = np.linspace(lo,hi,self.TEMPLATEPOINTS)
+            values = np.empty((nmh,len(grid)))
+            for i in range(nmh):
+                evaluator.setParams(dict([(paramName, p[i]) for paramName, p in params.iteritems()]))
+                values[i] = evaluator.evaluate(label,**{obs: grid})
+            if not np.all(np.isfinite(values)) or np.any(values<0):
+                logging.error('Invalid template values for {}'.format(label))
+                raise ValueError('The spline model {} is not a valid pdf on the template grid'.format(label))
+            template = ROOT.MHTemplatePdf(templateName, templateName, workspace.var(obs), mhvar,
+                nmh, mhs[0], mhs[-1], len(grid), lo, hi, array('f',values.ravel()))
+            wsimport(workspace, template, ROOT.RooFit.RecycleConflictNodes())
+
+            # compare at the middle of the grid cells, where the interpolation is worst
+            var = workspace.var(obs)
+            normSet = ROOT.RooArgSet(var)
+            pdf = workspace.pdf(label)
+            template = workspace.pdf(templateName)
+            points = 0.5*(grid[1:]+grid[:-1])
+            for where, mhvals in [('grid',checks),('between',checks[:-1]+0.5*self.TEMPLATEMHSTEP)]:
+                deviation = 0.
+                for mh in mhvals:
+                    mhvar.setVal(mh)
+                    modelVals = []
+                    templateVals = []
+                    for point in points:
+                        var.setVal(point)
+                        modelVals += [pdf.getVal(normSet)]
+                        templateVals += [template.getVal(normSet)]
+                    deviation = max(deviation,np.max(np.abs(np.array(templateVals)-np.array(modelVals)))/max(modelVals))
+                deviations[(obs,where)] = deviation
+            logging.info('{}: largest template deviation {:.3g} at the MH of the grid, {:.3g} between them'.format(
+                templateName,deviations[(obs,'grid')],deviations[(obs,'between')]))
+
+        workspace.factory('PROD::template_{0}(template_{0}_x, template_{0}_y)'.format(name))
+        return deviations
+
     def addControlModels(self, load=False, skipFit=False):
         region = 'control'
-        workspace = self.buildWorkspace('control')
-        self.initializeWorkspace(workspace=workspace)
-        super(HaaLimits2D, self).buildModel(region=region, workspace=workspace)
+        workspace = self.buildModelWorkspace('control',[(super(HaaLimits2D, self).buildModel,region)])
         if load:
             vals, errs, ints = self.loadBackgroundFit(region,workspace=workspace)
         if not skipFit:
@@ -1037,6 +1304,7 @@ class HaaLimits2D(HaaLimits):
             return super(HaaLimits2D, self).fitBackground(region=region, shift=shift, **kwargs)
 
         workspace = kwargs.pop('workspace',self.workspace)
+        numCPU = kwargs.pop('numCPU',self.NUMCPU)
 
         model = workspace.pdf('bg_{}_xy'.format(region))
         name = 'data_prefit_{}{}'.format(region,'_'+shift if shift else '')
@@ -1046,78 +1314,88 @@ class HaaLimits2D(HaaLimits):
             data = ROOT.RooDataHist(name,name,ROOT.RooArgList(workspace.var('x'),workspace.var('y')),hist)
         else:
             data = hist.Clone(name)
-            integral = hist.sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
-
-        fr = model.fitTo(data,ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True))
+            integral = sumEntries(hist,'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
 
-        xFrame = workspace.var('x').frame()
-        data.plotOn(xFrame)
-        # continuum
-        model.plotOn(xFrame,ROOT.RooFit.Components('cont1_{}_x'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        if self.XRANGE[0]<4:
-            model.plotOn(xFrame,ROOT.RooFit.Components('cont3_{}_x'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
-            # jpsi
-            model.plotOn(xFrame,ROOT.RooFit.Components('jpsi2S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        if self.XRANGE[0]<3.3:
-            model.plotOn(xFrame,ROOT.RooFit.Components('jpsi1S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        # upsilon
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon1S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon2S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon3S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        # combined model
-        model.plotOn(xFrame)
-        model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-
-        canvas = ROOT.TCanvas('c','c',800,800)
-        canvas.SetRightMargin(0.3)
-        xFrame.Draw()
-        prims = canvas.GetListOfPrimitives()
-        for prim in prims:
-            if 'paramBox' in prim.GetName():
-                prim.SetTextSize(0.02)
-        mi = xFrame.GetMinimum()
-        ma = xFrame.GetMaximum()
-        python_mkdir(self.plotDir)
-        canvas.Print('{}/model_fit_{}{}_xproj.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-        if mi<0:
-            xFrame.SetMinimum(0.1)
-        canvas.SetLogy(True)
-        canvas.Print('{}/model_fit_{}{}_xproj_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-
-        yFrame = workspace.var('y').frame()
-        data.plotOn(yFrame)
-        # continuum
-        model.plotOn(yFrame,ROOT.RooFit.Components('conty1_{}_y'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        # combined model
-        model.plotOn(yFrame)
-        model.paramOn(yFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-
-        canvas = ROOT.TCanvas('c','c',800,800)
-        canvas.SetRightMargin(0.3)
-        yFrame.Draw()
-        prims = canvas.GetListOfPrimitives()
-        for prim in prims:
-            if 'paramBox' in prim.GetName():
-                prim.SetTextSize(0.02)
-        mi = yFrame.GetMinimum()
-        ma = yFrame.GetMaximum()
-        canvas.Print('{}/model_fit_{}{}_yproj.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-        if mi<0:
-            yFrame.SetMinimum(0.1)
-        canvas.SetLogy(True)
-        canvas.Print('{}/model_fit_{}{}_yproj_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-
-        pars = fr.floatParsFinal()
-        vals = {}
-        errs = {}
-        for p in range(pars.getSize()):
-            vals[pars.at(p).GetName()] = pars.at(p).getValV()
-            errs[pars.at(p).GetName()] = pars.at(p).getError()
+        key = self.fitCache.key(hist,model,observables=['x','y'],xRange=self.XRANGE,yRange=self.YRANGE) if self.fitCache else None
+        cached = self.fitCache.get(key) if self.fitCache else None
+        if cached:
+            vals, errs = cached
+            self.fitCache.restore(model,vals,errs)
+        else:
+            fitArgs = [ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True)]
+            if numCPU>1: fitArgs += [ROOT.RooFit.NumCPU(numCPU)]
+            fr = model.fitTo(data,*fitArgs)
+            pars = fr.floatParsFinal()
+            vals = {}
+            errs = {}
+            for p in range(pars.getSize()):
+                vals[pars.at(p).GetName()] = pars.at(p).getValV()
+                errs[pars.at(p).GetName()] = pars.at(p).getError()
+            if self.fitCache: self.fitCache.put(key,(vals,errs))
+
+        if self.PLOTS:
+            xFrame = workspace.var('x').frame()
+            data.plotOn(xFrame)
+            # continuum
+            model.plotOn(xFrame,ROOT.RooFit.Components('cont1_{}_x'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            if self.XRANGE[0]<4:
+                model.plotOn(xFrame,ROOT.RooFit.Components('cont3_{}_x'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
+                # jpsi
+                model.plotOn(xFrame,ROOT.RooFit.Components('jpsi2S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            if self.XRANGE[0]<3.3:
+                model.plotOn(xFrame,ROOT.RooFit.Components('jpsi1S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            # upsilon
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon1S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon2S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon3S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            # combined model
+            model.plotOn(xFrame)
+            model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
+
+            canvas = ROOT.TCanvas('c','c',800,800)
+            canvas.SetRightMargin(0.3)
+            xFrame.Draw()
+            prims = canvas.GetListOfPrimitives()
+            for prim in prims:
+                if 'paramBox' in prim.GetName():
+                    prim.SetTextSize(0.02)
+            mi = xFrame.GetMinimum()
+            ma = xFrame.GetMaximum()
+            python_mkdir(self.plotDir)
+            canvas.Print('{}/model_fit_{}{}_xproj.png'.format(self.plotDir,region,'_'+shift if shift else ''))
+            if mi<0:
+                xFrame.SetMinimum(0.1)
+            canvas.SetLogy(True)
+            canvas.Print('{}/model_fit_{}{}_xproj_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
+
+            yFrame = workspace.var('y').frame()
+            data.plotOn(yFrame)
+            # continuum
+            model.plotOn(yFrame,ROOT.RooFit.Components('conty1_{}_y'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            # combined model
+            model.plotOn(yFrame)
+            model.paramOn(yFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
+
+            canvas = ROOT.TCanvas('c','c',800,800)
+            canvas.SetRightMargin(0.3)
+            yFrame.Draw()
+            prims = canvas.GetListOfPrimitives()
+            for prim in prims:
+                if 'paramBox' in prim.GetName():
+                    prim.SetTextSize(0.02)
+            mi = yFrame.GetMinimum()
+            ma = yFrame.GetMaximum()
+            canvas.Print('{}/model_fit_{}{}_yproj.png'.format(self.plotDir,region,'_'+shift if shift else ''))
+            if mi<0:
+                yFrame.SetMinimum(0.1)
+            canvas.SetLogy(True)
+            canvas.Print('{}/model_fit_{}{}_yproj_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
 
         python_mkdir(self.fitsDir)
         jfile = '{}/background_{}{}.json'.format(self.fitsDir,region,'_'+shift if shift else '')
         results = {'vals':vals, 'errs':errs, 'integral':integral}
         self.dump(jfile,results)
+        if self.fitCache: self.fitCache.logStats()
 
         return vals, errs, integral
 
@@ -1185,7 +1463,7 @@ class HaaLimits2D(HaaLimits):
                 if h.InheritsFrom('TH1'):
                     integral = h.Integral() # 2D integral?
                 else:
-                    integral = h.sumEntries('x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
+                    integral = sumEntries(h,'x>{} && x<{} && y>{} && y<{}'.format(*self.XRANGE+self.YRANGE))
                 data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x'),self.workspace.var('y')),int(integral))
                 if addSignal:
                     logging.info('Generating dataset with signal {}'.format(region))
@@ -1246,9 +1524,8 @@ class HaaLimits2D(HaaLimits):
 
 
     def addBackgroundModels(self, fixAfterControl=False, fixAfterFP=False, load=False, skipFit=False):
-        workspace = self.buildWorkspace('bg')
-        self.initializeWorkspace(workspace=workspace)
-        super(HaaLimits2D, self).buildModel(region='control', workspace=workspace)
+        # all regions are built up front, parameters shared between regions are recycled by name
+        workspace = self.buildModelWorkspace('bg',[(super(HaaLimits2D, self).buildModel,'control')]+[(self.buildModel,region) for region in self.REGIONS])
         self.loadBackgroundFit('control',workspace=workspace)
         if fixAfterControl:
             self.fix(workspace=workspace)
@@ -1262,7 +1539,6 @@ class HaaLimits2D(HaaLimits):
             vals[region] = {}
             errs[region] = {}
             integrals[region] = {}
-            self.buildModel(region=region, workspace=workspace)
             for shift in ['']+self.BACKGROUNDSHIFTS:
                 if shift=='':
                     if load:
@@ -1303,6 +1579,10 @@ class HaaLimits2D(HaaLimits):
         self.background_params = allparams
 
     def addSignalModels(self,yFitFuncFP="V", yFitFuncPP="V",isKinFit=False,**kwargs):
+        workers = kwargs.pop('workers',self.WORKERS)
+        fitted = {}
+        if workers>1 and not kwargs.get('load',False) and not kwargs.get('skipFit',False):
+            fitted = self.fitSignalPoints(workers,yFitFuncFP=yFitFuncFP,yFitFuncPP=yFitFuncPP,isKinFit=isKinFit,**kwargs)
         models = {}
         values = {}
         errors = {}
@@ -1320,18 +1600,18 @@ class HaaLimits2D(HaaLimits):
                 integrals[region][h] = {}
                 for shift in ['']+self.SIGNALSHIFTS+self.QCDSHIFTS:
                     if shift == '':
-                        vals, errs, ints = self.fitSignals(h,region=region,shift=shift,yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
+                        vals, errs, ints = self.fitSignals(h,region=region,shift=shift,yFitFunc=yFitFunc,isKinFit=isKinFit,fitted=fitted.get((region,h,shift),{}),**kwargs)
                         values[region][h][shift] = vals
                         errors[region][h][shift] = errs
                         integrals[region][h][shift] = ints
                     elif shift in self.QCDSHIFTS:
-                        vals, errs, ints = self.fitSignals(h,region=region,shift=shift,yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
+                        vals, errs, ints = self.fitSignals(h,region=region,shift=shift,yFitFunc=yFitFunc,isKinFit=isKinFit,fitted=fitted.get((region,h,shift),{}),**kwargs)
                         values[region][h][shift] = vals
                         errors[region][h][shift] = errs
                         integrals[region][h][shift] = ints
                     else:
-                        valsUp, errsUp, intsUp = self.fitSignals(h,region=region,shift=shift+'Up',yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
-                        valsDown, errsDown, intsDown = self.fitSignals(h,region=region,shift=shift+'Down',yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
+                        valsUp, errsUp, intsUp = self.fitSignals(h,region=region,shift=shift+'Up',yFitFunc=yFitFunc,isKinFit=isKinFit,fitted=fitted.get((region,h,shift+'Up'),{}),**kwargs)
+                        valsDown, errsDown, intsDown = self.fitSignals(h,region=region,shift=shift+'Down',yFitFunc=yFitFunc,isKinFit=isKinFit,fitted=fitted.get((region,h,shift+'Down'),{}),**kwargs)
                         values[region][h][shift+'Up'] = valsUp
                         errors[region][h][shift+'Up'] = errsUp
                         integrals[region][h][shift+'Up'] = intsUp
@@ -1364,6 +1644,7 @@ class HaaLimits2D(HaaLimits):
                     models[region][h] = self.buildSpline(h,values[region][h],errors[region][h],integrals[region][h],region,self.SIGNALSHIFTS,yFitFunc=yFitFunc,isKinFit=isKinFit,**kwargs)
                 #self.workspace.factory('{}_{}_norm[1,0,9999]'.format(self.SPLINENAME.format(h=h),region))
         self.fitted_models = models
+        self.plotQueue.render(workers=self.PLOTWORKERS)
 
     ######################
     ### Setup datacard ###
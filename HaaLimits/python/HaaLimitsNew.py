@@ -16,6 +16,12 @@ ROOT.gROOT.SetBatch()
 
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
+from CombineLimits.Limits.FitCache import FitCache
+from CombineLimits.Limits.ImportRegistry import ImportRegistry
+from CombineLimits.Limits.ModelGraph import ModelGraph
+from CombineLimits.Limits.PlotQueue import PlotQueue
+from CombineLimits.Limits.WorkspaceCache import WorkspaceCache
+from CombineLimits.Limits.Selection import sumEntries
 from CombineLimits.Limits.utilities import *
 
 class HaaLimits(Limits):
@@ -44,6 +50,24 @@ class HaaLimits(Limits):
     SIGNALSHIFTS = []
     QCDSHIFTS = [] # note, max/min of all (excluding 0.5/2)
 
+    FITCACHEDIR = 'fitParams/cache' # shared between tags, results are keyed by content. set to '' to disable
+    FITCACHESIZE = 500*1024*1024
+    WSCACHEDIR = 'fitParams/wscache' # built control and background workspaces, keyed by configuration. set to '' to disable
+
+    PLOTS = True     # draw the diagnostic plots of the fits
+    PLOTWORKERS = 1  # number of processes drawing the signal fit plots
+
+    # unbinned signal datasets with more than BINTHRESHOLD events are binned before the fit (0: never)
+    BINTHRESHOLD = 0
+    XFITBINS = 1500
+    BINVALIDATION = 0 # number of events used to report the bias from the binning (0: no report)
+
+    NUMCPU = 1 # number of processes evaluating the likelihood in the fits
+
+    # settings that only control how the run is done, they do not change the built models
+    # and are left out of the workspace cache key
+    EXECUTIONSETTINGS = ['PLOTS','PLOTWORKERS','NUMCPU','WORKERS','WARMSTART','SEEDTABLES','BINVALIDATION',
+                         'FITCACHEDIR','FITCACHESIZE','WSCACHEDIR','EXECUTIONSETTINGS']
 
     def __init__(self,histMap,tag=''):
         '''
@@ -71,6 +95,9 @@ class HaaLimits(Limits):
 
         self.plotDir = 'figures/HaaLimits{}'.format('_'+tag if tag else '')
         self.fitsDir = 'fitParams/HaaLimits{}'.format('_'+tag if tag else '')
+        self.fitCache = FitCache(self.FITCACHEDIR,maxSize=self.FITCACHESIZE) if self.FITCACHEDIR else None
+        self.plotQueue = PlotQueue()
+        self.workspaceCache = WorkspaceCache(self.WSCACHEDIR) if self.WSCACHEDIR else None
 
     def dump(self,name,results):
         with open(name,'w') as f:
@@ -92,11 +119,46 @@ class HaaLimits(Limits):
         self.addX(*self.XRANGE,unit='GeV',label=self.XLABEL,**kwargs)
         self.addMH(*self.SPLINERANGE,unit='GeV',label=self.SPLINELABEL,**kwargs)
 
+    def modelConfig(self):
+        '''The settings the models may depend on (all but EXECUTIONSETTINGS), used to key the workspace cache.'''
+        config = {}
+        for attr in dir(self):
+            if not attr.isupper() or attr in self.EXECUTIONSETTINGS: continue
+            value = getattr(self,attr)
+            if isinstance(value,(int,float,basestring,list,tuple,dict)): config[attr] = value
+        return config
+
+    def buildModelWorkspace(self,name,builders):
+        '''
+        Return a new workspace with the variables of initializeWorkspace and the
+        models made by builders, a list of (buildModel method, region).
+        If the configuration and code are unchanged, the workspace is reattached
+        from the workspace cache instead of being built.
+        '''
+        if self.workspaceCache:
+            key = self.workspaceCache.key(
+                sources=[Models,ModelGraph]+[c for c in type(self).__mro__ if c is not object],
+                workspace=name,
+                builders=[(build.__module__,build.__name__,region) for build,region in builders],
+                **self.modelConfig())
+            workspace = self.workspaceCache.get(key,name)
+            if workspace: return workspace
+        workspace = self.buildWorkspace(name)
+        self.initializeWorkspace(workspace=workspace)
+        for build,region in builders:
+            build(region=region, workspace=workspace)
+        if self.workspaceCache: self.workspaceCache.put(key,workspace)
+        return workspace
+
     def buildModel(self, region='PP', **kwargs):
         logging.debug('buildModel')
         logging.debug(', '.join([region,str(kwargs)]))
         workspace = kwargs.pop('workspace',self.workspace)
         tag = kwargs.pop('tag',region)
+        # declare the models in a graph, only what bg_<region> uses is built
+        graph = kwargs.pop('graph',None)
+        doBuild = graph is None
+        if doBuild: graph = ModelGraph()
 
         bgRes = Models.Voigtian
         #bgRes = Models.BreitWigner
@@ -108,7 +170,7 @@ class HaaLimits(Limits):
             width = [0.1,0.01,0.5],
         )
         nameJ1 = 'jpsi1S'
-        jpsi1S.build(workspace,nameJ1)
+        graph.add(jpsi1S,nameJ1)
     
         jpsi2S = bgRes('jpsi2S',
             mean  = [3.7,3.6,3.8],
@@ -116,7 +178,7 @@ class HaaLimits(Limits):
             width = [0.1,0.01,0.5],
         )
         nameJ2 = 'jpsi2S'
-        jpsi2S.build(workspace,nameJ2)
+        graph.add(jpsi2S,nameJ2)
 
         #jpsiErr = Models.Erf('jpsiErr',
         #    erfScale = [-10,-500,-1],
@@ -139,7 +201,7 @@ class HaaLimits(Limits):
             jpsi[nameJ2] = [0.1,0,1]
             jpsi = Models.Sum('jpsi', **jpsi)
             nameJ = 'jpsi'
-            jpsi.build(workspace,nameJ)
+            graph.add(jpsi,nameJ)
 
         # upsilon
         upsilon1S = bgRes('upsilon1S',
@@ -149,7 +211,7 @@ class HaaLimits(Limits):
             width = [0.1,0.01,1],
         )
         nameU1 = 'upsilon1S'
-        upsilon1S.build(workspace,nameU1)
+        graph.add(upsilon1S,nameU1)
     
         upsilon2S = bgRes('upsilon2S',
             mean  = [10.0,9.8,10.15],
@@ -158,7 +220,7 @@ class HaaLimits(Limits):
             width = [0.1,0.01,1],
         )
         nameU2 = 'upsilon2S'
-        upsilon2S.build(workspace,nameU2)
+        graph.add(upsilon2S,nameU2)
     
         upsilon3S = bgRes('upsilon3S',
             mean  = [10.3,10.22,10.5],
@@ -167,7 +229,7 @@ class HaaLimits(Limits):
             width = [0.1,0.01,1],
         )
         nameU3 = 'upsilon3S'
-        upsilon3S.build(workspace,nameU3)
+        graph.add(upsilon3S,nameU3)
 
         #upsilon = {'recursive': True}
         #upsilon[nameU1] = [0.75,0,1]
@@ -183,7 +245,7 @@ class HaaLimits(Limits):
         upsilon23[nameU2] = [0.5,0,1]
         upsilon23[nameU3] = [0.5,0,1]
         upsilon23 = Models.Sum(nameU23, **upsilon23)
-        upsilon23.build(workspace,nameU23)
+        graph.add(upsilon23,nameU23)
 
         nameU = 'upsilon'
         #upsilon = {'extended': True}
@@ -191,7 +253,7 @@ class HaaLimits(Limits):
         upsilon[nameU1]  = [0.75,0,1]
         upsilon[nameU23] = [0.5,0,1]
         upsilon = Models.Sum(nameU, **upsilon)
-        upsilon.build(workspace,nameU)
+        graph.add(upsilon,nameU)
 
         # sum upsilon and jpsi
         nameR = 'resonant'
@@ -203,7 +265,7 @@ class HaaLimits(Limits):
         elif self.XRANGE[0]<4.0:
             resonant[nameJ2] = [0.5,0,1]
         resonant = Models.Sum(nameR, **resonant)
-        resonant.build(workspace,nameR)
+        graph.add(resonant,nameR)
 
 
         # continuum background
@@ -213,14 +275,14 @@ class HaaLimits(Limits):
             cont1 = Models.Exponential(nameC1,
                 lamb = kwargs.pop('lambda_{}'.format(nameC1),[-2,-4,0]),
             )
-            cont1.build(workspace,nameC1)
+            graph.add(cont1,nameC1)
 
             nameC2 = 'cont2{}'.format('_'+tag if tag else '')
             #nameC2 = 'cont2'
             cont2 = Models.Exponential(nameC2,
                 lamb = kwargs.pop('lambda_{}'.format(nameC2),[-0.75,-5,0]),
             )
-            cont2.build(workspace,nameC2)
+            graph.add(cont2,nameC2)
 
             nameC = 'cont{}'.format('_'+tag if tag else '')
             #cont = {'extended': True}
@@ -228,14 +290,14 @@ class HaaLimits(Limits):
             cont[nameC1] = [0.75,0,1]
             cont[nameC2] = [0.5,0,1]
             cont = Models.Sum(nameC, **cont)
-            cont.build(workspace,nameC)
+            graph.add(cont,nameC)
         else:
             nameC = 'cont{}'.format('_'+tag if tag else '')
             #nameC = 'cont'
             cont = Models.Exponential(nameC,
                 lamb = kwargs.pop('lambda_{}'.format(nameC),[-2,-4,0]),
             )
-            cont.build(workspace,nameC)
+            graph.add(cont,nameC)
     
         # sum
         bgs = {'recursive': True}
@@ -258,7 +320,8 @@ class HaaLimits(Limits):
                 bgs[nameU] = [0.9,0,1]
         bg = Models.Sum('bg', **bgs)
         name = 'bg_{}'.format(region)
-        bg.build(workspace,name)
+        graph.add(bg,name)
+        if doBuild: graph.build(workspace,name)
 
     def loadSignalFit(self, h, tag, region, shift=''):
         savedir = '{}/{}'.format(self.fitsDir,shift if shift else 'central')
@@ -321,18 +384,21 @@ class HaaLimits(Limits):
             hist = histMap[self.SIGNAME.format(h=h,a=a)]
             saveDir = '{}/{}'.format(self.plotDir,shift if shift else 'central')
             if not skipFit:
-                results[h][a], errors[h][a] = model.fit(ws, hist, name, saveDir=saveDir, save=True, doErrors=True)
+                results[h][a], errors[h][a] = model.fit(ws, hist, name, saveDir=saveDir, save=self.PLOTS, doErrors=True, cache=self.fitCache, plots=self.plotQueue,
+                    binThreshold=self.BINTHRESHOLD, fitBins=self.XFITBINS, validationEntries=self.BINVALIDATION, numCPU=self.NUMCPU)
                 if self.binned:
                     integral = histMap[self.SIGNAME.format(h=h,a=a)].Integral()
                 else:
-                    integral = histMap[self.SIGNAME.format(h=h,a=a)].sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                    integral = sumEntries(histMap[self.SIGNAME.format(h=h,a=a)],'x>{} && x<{}'.format(*self.XRANGE))
                 integrals[h][a] = integral
+            ImportRegistry.release(ws)
     
         savedir = '{}/{}'.format(self.fitsDir,shift if shift else 'central')
         python_mkdir(savedir)
         savename = '{}/h{}_{}.json'.format(savedir,h,tag)
         jsonData = {'vals': results, 'errs': errors, 'integrals': integrals}
         self.dump(savename,jsonData)
+        if self.fitCache: self.fitCache.logStats()
 
         # Fit using ROOT rather than RooFit for the splines
         fitFuncs = {
@@ -475,6 +541,7 @@ class HaaLimits(Limits):
 
     def fitBackground(self,region='PP',shift='', **kwargs):
         workspace = kwargs.pop('workspace',self.workspace)
+        numCPU = kwargs.pop('numCPU',self.NUMCPU)
         model = workspace.pdf('bg_{}'.format(region))
         name = 'data_prefit_{}{}'.format(region,'_'+shift if shift else '')
         hist = self.histMap[region][shift]['dataNoSig']
@@ -482,55 +549,65 @@ class HaaLimits(Limits):
             integral = hist.Integral(hist.FindBin(self.XRANGE[0]),hist.FindBin(self.XRANGE[1]))
             data = ROOT.RooDataHist(name,name,ROOT.RooArgList(workspace.var('x')),hist)
         else:
-            integral = hist.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+            integral = sumEntries(hist,'x>{} && x<{}'.format(*self.XRANGE))
             data = hist.Clone(name)
 
-        fr = model.fitTo(data, ROOT.RooFit.Save(), ROOT.RooFit.SumW2Error(True) )
-
-        xFrame = workspace.var('x').frame()
-        data.plotOn(xFrame)
-        model.plotOn(xFrame,ROOT.RooFit.Components('cont1_{}'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('cont1'),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('cont2_{}'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('cont2'),ROOT.RooFit.LineStyle(ROOT.kDashed))
-        if self.XRANGE[0]<4:
-            # jpsi
-            model.plotOn(xFrame,ROOT.RooFit.Components('jpsi1S'),ROOT.RooFit.LineColor(ROOT.kRed))
-            model.plotOn(xFrame,ROOT.RooFit.Components('jpsi2S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon1S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon2S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        model.plotOn(xFrame,ROOT.RooFit.Components('upsilon3S'),ROOT.RooFit.LineColor(ROOT.kRed))
-        # combined model
-        model.plotOn(xFrame)
-        model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-
-        canvas = ROOT.TCanvas('c','c',800,800)
-        canvas.SetRightMargin(0.3)
-        xFrame.Draw()
-        prims = canvas.GetListOfPrimitives()
-        for prim in prims:
-            if 'paramBox' in prim.GetName():
-                prim.SetTextSize(0.02)
-        mi = xFrame.GetMinimum()
-        ma = xFrame.GetMaximum()
-        if mi<0:
-            xFrame.SetMinimum(0.1)
-        python_mkdir(self.plotDir)
-        canvas.Print('{}/model_fit_{}{}.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-        canvas.SetLogy(True)
-        canvas.Print('{}/model_fit_{}{}_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
-
-        pars = fr.floatParsFinal()
-        vals = {}
-        errs = {}
-        for p in range(pars.getSize()):
-            vals[pars.at(p).GetName()] = pars.at(p).getValV()
-            errs[pars.at(p).GetName()] = pars.at(p).getError()
+        key = self.fitCache.key(hist,model,observables=['x'],xRange=self.XRANGE) if self.fitCache else None
+        cached = self.fitCache.get(key) if self.fitCache else None
+        if cached:
+            vals, errs = cached
+            self.fitCache.restore(model,vals,errs)
+        else:
+            fitArgs = [ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True)]
+            if numCPU>1: fitArgs += [ROOT.RooFit.NumCPU(numCPU)]
+            fr = model.fitTo(data,*fitArgs)
+            pars = fr.floatParsFinal()
+            vals = {}
+            errs = {}
+            for p in range(pars.getSize()):
+                vals[pars.at(p).GetName()] = pars.at(p).getValV()
+                errs[pars.at(p).GetName()] = pars.at(p).getError()
+            if self.fitCache: self.fitCache.put(key,(vals,errs))
+
+        if self.PLOTS:
+            xFrame = workspace.var('x').frame()
+            data.plotOn(xFrame)
+            model.plotOn(xFrame,ROOT.RooFit.Components('cont1_{}'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('cont1'),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('cont2_{}'.format(region)),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('cont2'),ROOT.RooFit.LineStyle(ROOT.kDashed))
+            if self.XRANGE[0]<4:
+                # jpsi
+                model.plotOn(xFrame,ROOT.RooFit.Components('jpsi1S'),ROOT.RooFit.LineColor(ROOT.kRed))
+                model.plotOn(xFrame,ROOT.RooFit.Components('jpsi2S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon1S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon2S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            model.plotOn(xFrame,ROOT.RooFit.Components('upsilon3S'),ROOT.RooFit.LineColor(ROOT.kRed))
+            # combined model
+            model.plotOn(xFrame)
+            model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
+
+            canvas = ROOT.TCanvas('c','c',800,800)
+            canvas.SetRightMargin(0.3)
+            xFrame.Draw()
+            prims = canvas.GetListOfPrimitives()
+            for prim in prims:
+                if 'paramBox' in prim.GetName():
+                    prim.SetTextSize(0.02)
+            mi = xFrame.GetMinimum()
+            ma = xFrame.GetMaximum()
+            if mi<0:
+                xFrame.SetMinimum(0.1)
+            python_mkdir(self.plotDir)
+            canvas.Print('{}/model_fit_{}{}.png'.format(self.plotDir,region,'_'+shift if shift else ''))
+            canvas.SetLogy(True)
+            canvas.Print('{}/model_fit_{}{}_log.png'.format(self.plotDir,region,'_'+shift if shift else ''))
 
         python_mkdir(self.fitsDir)
         jfile = '{}/background_{}{}.json'.format(self.fitsDir,region,'_'+shift if shift else '')
         results = {'vals':vals, 'errs':errs, 'integral':integral}
         self.dump(jfile,results)
+        if self.fitCache: self.fitCache.logStats()
 
         return vals, errs, integral
 
@@ -553,7 +630,7 @@ class HaaLimits(Limits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
             data_obs.SetName(name)
         else:
@@ -626,7 +703,7 @@ class HaaLimits(Limits):
                 if h.InheritsFrom('TH1'):
                     integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
                 else:
-                    integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                    integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
                 data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
                 if addSignal:
                     self.workspace.var('MH').setVal(ma)
@@ -802,9 +879,7 @@ class HaaLimits(Limits):
 
     def addControlModels(self, load=False, skipFit=False):
         region = 'control'
-        workspace = self.buildWorkspace('control')
-        self.initializeWorkspace(workspace=workspace)
-        self.buildModel(region=region, workspace=workspace)
+        workspace = self.buildModelWorkspace('control',[(self.buildModel,region)])
         if load:
             vals, errs, ints = self.loadBackgroundFit(region,workspace=workspace)
         if not skipFit:
@@ -823,36 +898,38 @@ class HaaLimits(Limits):
 
     def fix(self,fix=True,**kwargs):
         workspace = kwargs.pop('workspace',self.workspace)
+        def setConstant(name):
+            # components the background does not use are not built
+            if workspace.arg(name): workspace.arg(name).setConstant(fix)
         #workspace.arg('lambda_cont1').setConstant(fix)
         #workspace.arg('lambda_cont2').setConstant(fix)
-        workspace.arg('mean_upsilon1S').setConstant(fix)
-        workspace.arg('mean_upsilon2S').setConstant(fix)
-        workspace.arg('mean_upsilon3S').setConstant(fix)
-        workspace.arg('sigma_upsilon1S').setConstant(fix)
-        workspace.arg('sigma_upsilon2S').setConstant(fix)
-        workspace.arg('sigma_upsilon3S').setConstant(fix)
-        workspace.arg('width_upsilon1S').setConstant(fix)
-        workspace.arg('width_upsilon2S').setConstant(fix)
-        workspace.arg('width_upsilon3S').setConstant(fix)
-        workspace.arg('upsilon1S_frac').setConstant(fix) 
-        workspace.arg('upsilon2S_frac').setConstant(fix) 
-        workspace.arg('upsilon3S_frac').setConstant(fix) 
-        workspace.arg('upsilon23_frac').setConstant(fix) 
-        workspace.arg('mean_jpsi1S').setConstant(fix)
-        workspace.arg('mean_jpsi2S').setConstant(fix)
-        workspace.arg('sigma_jpsi1S').setConstant(fix)
-        workspace.arg('sigma_jpsi2S').setConstant(fix)
-        workspace.arg('width_jpsi1S').setConstant(fix)
-        workspace.arg('width_jpsi2S').setConstant(fix)
+        setConstant('mean_upsilon1S')
+        setConstant('mean_upsilon2S')
+        setConstant('mean_upsilon3S')
+        setConstant('sigma_upsilon1S')
+        setConstant('sigma_upsilon2S')
+        setConstant('sigma_upsilon3S')
+        setConstant('width_upsilon1S')
+        setConstant('width_upsilon2S')
+        setConstant('width_upsilon3S')
+        setConstant('upsilon1S_frac') 
+        setConstant('upsilon2S_frac') 
+        setConstant('upsilon3S_frac') 
+        setConstant('upsilon23_frac') 
+        setConstant('mean_jpsi1S')
+        setConstant('mean_jpsi2S')
+        setConstant('sigma_jpsi1S')
+        setConstant('sigma_jpsi2S')
+        setConstant('width_jpsi1S')
+        setConstant('width_jpsi2S')
         #if self.XRANGE[0]<3.3: workspace.arg('jpsi1S_frac').setConstant(fix) 
         #if self.XRANGE[0]<4: workspace.arg('jpsi2S_frac').setConstant(fix) 
         #workspace.arg('upsilon_frac').setConstant(fix) 
         #if self.XRANGE[0]<3.3: workspace.arg('jpsi_frac').setConstant(fix) 
 
     def addBackgroundModels(self, fixAfterControl=False, fixAfterFP=False, load=False, skipFit=False):
-        workspace = self.buildWorkspace('bg')
-        self.initializeWorkspace(workspace=workspace)
-        self.buildModel(region='control', workspace=workspace)
+        # all regions are built up front, parameters shared between regions are recycled by name
+        workspace = self.buildModelWorkspace('bg',[(self.buildModel,region) for region in ['control']+self.REGIONS])
         self.loadBackgroundFit('control',workspace=workspace)
         if fixAfterControl:
             self.fix(workspace=workspace)
@@ -866,7 +943,6 @@ class HaaLimits(Limits):
             vals[region] = {}
             errs[region] = {}
             integrals[region] = {}
-            self.buildModel(region=region, workspace=workspace)
             for shift in ['']+self.BACKGROUNDSHIFTS:
                 if shift=='':
                     if load:
@@ -994,6 +1070,7 @@ class HaaLimits(Limits):
                 else:
                     models[region][h] = self.buildSpline(h,values[region][h],errors[region][h],integrals[region][h],region,self.SIGNALSHIFTS,**kwargs)
         self.fitted_models = models
+        self.plotQueue.render(workers=self.PLOTWORKERS)
 
     ######################
     ### Setup datacard ###
@@ -15,6 +15,7 @@ ROOT.gROOT.SetBatch()
 
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
+from CombineLimits.Limits.Selection import sumEntries
 from CombineLimits.Limits.utilities import *
 
 class HaaLimits(Limits):
@@ -40,6 +41,8 @@ class HaaLimits(Limits):
     BACKGROUNDSHIFTS = []
     SIGNALSHIFTS = []
 
+    NUMCPU = 1 # number of processes evaluating the likelihood in the fits
+
 
     def __init__(self,histMap,tag=''):
         '''
@@ -286,7 +289,7 @@ class HaaLimits(Limits):
             if self.binned:
                 integral = histMap[self.SIGNAME.format(h=h,a=a)].Integral()
             else:
-                integral = histMap[self.SIGNAME.format(h=h,a=a)].sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(histMap[self.SIGNAME.format(h=h,a=a)],'x>{} && x<{}'.format(*self.XRANGE))
             integrals[h][a] = integral
     
         savedir = '{}/{}'.format(self.fitsDir,shift if shift else 'central')
@@ -441,15 +444,15 @@ class HaaLimits(Limits):
             integral = hist.Integral(hist.FindBin(self.XRANGE[0]),hist.FindBin(self.XRANGE[1]))
             data = ROOT.RooDataHist(name,name,ROOT.RooArgList(self.workspace.var('x')),hist)
         else:
-            integral = hist.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+            integral = sumEntries(hist,'x>{} && x<{}'.format(*self.XRANGE))
             data = hist.Clone(name)
 
         if setUpsilonLambda:
             self.workspace.var('x').setRange('low', self.XRANGE[0], self.UPSILONRANGE[0] )
             self.workspace.var('x').setRange('high', self.UPSILONRANGE[1], self.XRANGE[1])
-            fr = model.fitTo(data, ROOT.RooFit.Save(), ROOT.RooFit.SumW2Error(True), ROOT.RooFit.Range('low,high') )
+            fr = model.fitTo(data, ROOT.RooFit.Save(), ROOT.RooFit.SumW2Error(True), ROOT.RooFit.Range('low,high'), ROOT.RooFit.NumCPU(self.NUMCPU) )
         else:
-            fr = model.fitTo(data, ROOT.RooFit.Save(), ROOT.RooFit.SumW2Error(True) )
+            fr = model.fitTo(data, ROOT.RooFit.Save(), ROOT.RooFit.SumW2Error(True), ROOT.RooFit.NumCPU(self.NUMCPU) )
 
         xFrame = self.workspace.var('x').frame()
         data.plotOn(xFrame)
@@ -513,7 +516,7 @@ class HaaLimits(Limits):
             if h.InheritsFrom('TH1'):
                 integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
             else:
-                integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
             data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
             data_obs.SetName(name)
         else:
@@ -538,7 +541,7 @@ class HaaLimits(Limits):
                 if h.InheritsFrom('TH1'):
                     integral = h.Integral(h.FindBin(self.XRANGE[0]),h.FindBin(self.XRANGE[1]))
                 else:
-                    integral = h.sumEntries('x>{} && x<{}'.format(*self.XRANGE))
+                    integral = sumEntries(h,'x>{} && x<{}'.format(*self.XRANGE))
                 data_obs = model.generate(ROOT.RooArgSet(self.workspace.var('x')),int(integral))
                 if addSignal:
                     self.workspace.var('MH').setVal(ma)
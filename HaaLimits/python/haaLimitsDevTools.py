@@ -468,9 +468,18 @@ def create_datacard(args):
     haaLimits.HMASSES = [chi2Mass] if chi2Mass else hmasses
     haaLimits.XRANGE = xRange
     haaLimits.XBINNING = int((xRange[1]-xRange[0]) * 10)
+    haaLimits.PLOTS = not args.noPlots
+    haaLimits.PLOTWORKERS = args.plotWorkers
+    haaLimits.BINTHRESHOLD = args.binThreshold
+    haaLimits.BINVALIDATION = args.binValidation
+    haaLimits.NUMCPU = args.numCPU
     if do2D: 
         haaLimits.YRANGE = yRange
         haaLimits.YBINNING = int((yRange[1]-yRange[0]) * 0.02)
+        haaLimits.WORKERS = args.workers
+        haaLimits.WARMSTART = not args.noWarmStart
+        haaLimits.SEEDTABLES = args.seedTables
+        haaLimits.TEMPLATE = args.template
     if 'tt' in var: haaLimits.YLABEL = 'm_{#tau_{#mu}#tau_{h}}'
     if 'h' in var or 'hkf' in var: haaLimits.YLABEL = 'm_{#mu#mu#tau_{#mu}#tau_{h}}'
     haaLimits.initializeWorkspace()
@@ -515,6 +524,15 @@ def parse_command_line(argv):
     parser.add_argument('--tag', type=str, default='')
     parser.add_argument('--chi2Mass', type=int, default=0)
     parser.add_argument('--selection', type=str, default='')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes for the 2D signal fits')
+    parser.add_argument('--noWarmStart', action='store_true', help='Do not start the 2D signal fits from the neighbouring mass points')
+    parser.add_argument('--seedTables', action='store_true', help='Start the 2D signal fits from the hardcoded initial values where available')
+    parser.add_argument('--template', action='store_true', help='Also store dense MH templates of the 2D signal models and report their deviations')
+    parser.add_argument('--noPlots', action='store_true', help='Do not draw the fit plots')
+    parser.add_argument('--plotWorkers', type=int, default=1, help='Number of processes drawing the fit plots')
+    parser.add_argument('--binThreshold', type=int, default=0, help='Bin unbinned signal datasets with more events than this before the fit (0: never)')
+    parser.add_argument('--numCPU', type=int, default=1, help='Number of processes evaluating the likelihood in the fits')
+    parser.add_argument('--binValidation', type=int, default=0, help='Number of events used to report the bias from binning the signal fits')
 
     return parser.parse_args(argv)
 
@@ -14,6 +14,8 @@ ROOT.gROOT.SetBatch()
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
 from CombineLimits.Limits.utilities import *
+from CombineLimits.Limits.InputLoader import InputLoader
+from CombineLimits.Limits.DatasetCache import DatasetCache
 
 from HaaLimits2DNew import *
 
@@ -23,181 +25,38 @@ UPSILONRANGE = [8,11]
 subdirectoryName='KinFit_mumukinFit_CombShape_yDCB/'
 name = 'mmmt_mm_parametric'
 IFCONTROL = True
+NUMCPU = 1 # processes evaluating the likelihood in the fits
+MAXRESIDENT = 20 # reduced datasets kept in memory at once, older ones are rebuilt when needed again
+DATASETCACHEDIR = 'fitParams/datasets' # reduced datasets, keyed by source and selection. set to '' to disable
 CHI_CUTS = [30,50,750]
 
-def getDataset(ds,weight='w',selection='1',xRange=[],yRange=[]):
-   args = ds.get()
-   if xRange: 
-     args.find('x').setRange(*xRange)
-   if args.find('y2'): 
-     args.find('y2').SetName('y')     
-   if yRange: 
-     args.find('y').setRange(*yRange)
-   ds = ROOT.RooDataSet(ds.GetName(),ds.GetTitle(),ds,args,selection,weight)
-   return ds
+EOS = '/eos/cms/store/user/ktos/ShapeDifferences/'
+CHI_LIMITS = {125: CHI_CUTS[0], 300: CHI_CUTS[1], 750: CHI_CUTS[2]}
+POINTS = [{'h': h, 'a': a, 'chi': CHI_LIMITS[h]} for h in [125,300,750] for a in ['3p6',4,5,6,7,9,11,13,15,17,19,21] if not (h in [300,750] and str(a) in ['3p6','4','6'])]
+SIGNALSHIFTS = {'': 'Central', 'IDUp': 'IDUP', 'IDDown': 'IDDOWN', 'IsoUp': 'IsoUP', 'IsoDown': 'IsoDOWN', 'PileupUp': 'PileupUP', 'PileupDown': 'PileupDOWN', 'BTagUp': 'BTagUP', 'BTagDown': 'BTagDOWN'}
+
+manifest = [
+  {'region': 'PP', 'process': 'HToAAH{h}A{a}', 'file': EOS+'FINAL_AllRooDataSet_MedIsoMu2_TauDMMedIso_AUG2_HKinFit.root',
+   'object': 'SIG_h{h}a{a}_MedIsoMu2_TauDMMedIso_AUG2_{shift}_kinFit', 'shifts': SIGNALSHIFTS, 'points': POINTS, 'selection': 'x <= 25 && x >= 2.5 && y>=0 && chi<{chi}'},
+  {'region': 'PP', 'process': ['data','dataNoSig'], 'file': EOS+'FINAL_RooDataSet_MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_AUG2_AFromB_HKinFit_Plots.root',
+   'object': 'mumufourBodyKinFitmass_dataset', 'selection': 'x <= 25 && x >= 2.5 && y>=0'},
+  {'region': 'FP', 'process': ['data','dataNoSig'], 'file': EOS+'FINAL_RooDataSet_MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_AUG2_BItself_HKinFit_Plots.root',
+   'object': 'mumufourBodyKinFitmass_dataset', 'selection': 'x <= 25 && x >= 2.5 && y>=0'},
+  {'region': 'FP', 'process': 'HToAAH{h}A{a}', 'file': EOS+'FINAL_AllRooDataSet_MedIsoMu2_TauDMAntiMedIso_AUG2_HKinFit.root',
+   'object': 'SIG_h{h}a{a}_MedIsoMu2_TauDMAntiMedIso_AUG2_{shift}_kinFit', 'shifts': SIGNALSHIFTS, 'points': POINTS, 'selection': 'x <= 25 && x >= 2.5 && y>=0 && chi<{chi}'},
+]
+for entry in manifest:
+  entry.update({'xRange': XRANGE, 'yRange': YRANGE, 'rename': {'y2': 'y'}})
+if IFCONTROL:
+  manifest += [{'region': 'control', 'process': ['data','dataNoSig'], 'file': EOS+'control.root', 'object': 'mmMass', 'type': 'object'}]
+
+loader = InputLoader(manifest, maxResident=MAXRESIDENT, cache=DatasetCache(DATASETCACHEDIR) if DATASETCACHEDIR else None)
+dictionary = loader.load()
 
-def GetPPData(dictionary,xRange=[],yRange=[]):
-   f_FRC = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_RooDataSet_MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_AUG2_AFromB_HKinFit_Plots.root")
-   
-   SingleMu_FakeRateCentral = f_FRC.Get("mumufourBodyKinFitmass_dataset")
-   SingleMu_FakeRateCentral = getDataset(SingleMu_FakeRateCentral, selection='x <= 25 && x >= 2.5 && y>=0', xRange=xRange, yRange=yRange)
-   dictionary['PP']['']['data'] = SingleMu_FakeRateCentral
-   dictionary['PP']['']['dataNoSig'] = SingleMu_FakeRateCentral
-
-def GetPPSignal(dictionary,xRange=[],yRange=[]):
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_AllRooDataSet_MedIsoMu2_TauDMMedIso_AUG2_HKinFit.root")
-
-  for hMass in ["125","300","750"]:
-     for aMass in ["3p6","4","5","6","7","9","11","13","15","17","19","21"]:
-       if (hMass == "300" or hMass == "750") and (aMass == "3p6" or aMass == "4" or aMass == "6"): continue
-       if hMass == "125": chiLimit = CHI_CUTS[0]
-       if hMass == "300": chiLimit = CHI_CUTS[1]
-       if hMass == "750": chiLimit = CHI_CUTS[2]
-       h_Central = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_Central_kinFit")
-       h_IDDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_IDDOWN_kinFit")
-       h_IDUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_IDUP_kinFit")
-       h_IsoDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_IsoDOWN_kinFit")
-       h_IsoUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_IsoUP_kinFit")
-       h_BTagDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_BTagDOWN_kinFit")
-       h_BTagUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_BTagUP_kinFit")
-       h_PileupDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_PileupDOWN_kinFit")
-       h_PileupUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMMedIso_AUG2_PileupUP_kinFit")
-     
-       h_Central = getDataset(h_Central, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IDDOWN = getDataset(h_IDDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IDUP = getDataset(h_IDUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IsoDOWN = getDataset(h_IsoDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IsoUP = getDataset(h_IsoUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_BTagDOWN = getDataset(h_BTagDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_BTagUP = getDataset(h_BTagUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_PileupDOWN = getDataset(h_PileupDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_PileupUP = getDataset(h_PileupUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-    
-       dictionary['PP']['']["HToAAH" + hMass + "A" + aMass] = h_Central
-       dictionary['PP']['IDUp']["HToAAH" + hMass + "A" + aMass] = h_IDUP
-       dictionary['PP']['IDDown']["HToAAH" + hMass + "A" + aMass] = h_IDDOWN
-       dictionary['PP']['IsoUp']["HToAAH" + hMass + "A" + aMass] = h_IsoUP
-       dictionary['PP']['IsoDown']["HToAAH" + hMass + "A" + aMass] = h_IsoDOWN
-       dictionary['PP']['BTagUp']["HToAAH" + hMass + "A" + aMass] = h_BTagUP
-       dictionary['PP']['BTagDown']["HToAAH" + hMass + "A" + aMass] = h_BTagDOWN
-       dictionary['PP']['PileupUp']["HToAAH" + hMass + "A" + aMass] = h_PileupUP
-       dictionary['PP']['PileupDown']["HToAAH" + hMass + "A" + aMass] = h_PileupDOWN
-
-
-def GetFPData(dictionary,xRange=[],yRange=[]):
-
-   f_FakeRateRegionB = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_RooDataSet_MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_AUG2_BItself_HKinFit_Plots.root")
-   SingleMu_RegionB = f_FakeRateRegionB.Get("mumufourBodyKinFitmass_dataset")
-   SingleMu_RegionB = getDataset(SingleMu_RegionB, selection='x <= 25 && x >= 2.5 && y>=0', xRange=xRange, yRange=yRange)
-
-   dictionary['FP']['']['data'] = SingleMu_RegionB
-   dictionary['FP']['']['dataNoSig'] = SingleMu_RegionB
-
-def GetFPSignal(dictionary,xRange=[],yRange=[]):
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_AllRooDataSet_MedIsoMu2_TauDMAntiMedIso_AUG2_HKinFit.root")
-   
-  for hMass in ["125","300","750"]:
-     for aMass in ["3p6","4","5","6","7","9","11","13","15","17","19","21"]:
-       if (hMass == "300" or hMass == "750") and (aMass == "3p6" or aMass == "4" or aMass == "6"): continue
-       if hMass == "125": chiLimit = CHI_CUTS[0]
-       if hMass == "300": chiLimit = CHI_CUTS[1]
-       if hMass == "750": chiLimit = CHI_CUTS[2]
-       h_Central = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_Central_kinFit")
-       h_IDDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_IDDOWN_kinFit")
-       h_IDUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_IDUP_kinFit")
-       h_IsoDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_IsoDOWN_kinFit")
-       h_IsoUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_IsoUP_kinFit")
-       h_BTagDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_BTagDOWN_kinFit")
-       h_BTagUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_BTagUP_kinFit")
-       h_PileupDOWN = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_PileupDOWN_kinFit")
-       h_PileupUP = f.Get("SIG_h" + hMass + "a" + aMass + "_MedIsoMu2_TauDMAntiMedIso_AUG2_PileupUP_kinFit")
-
-       h_Central = getDataset(h_Central, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IDDOWN = getDataset(h_IDDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IDUP = getDataset(h_IDUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IsoDOWN = getDataset(h_IsoDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_IsoUP = getDataset(h_IsoUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_BTagDOWN = getDataset(h_BTagDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_BTagUP = getDataset(h_BTagUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_PileupDOWN = getDataset(h_PileupDOWN, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
-       h_PileupUP = getDataset(h_PileupUP, selection='x <= 25 && x >= 2.5 && y>=0 && chi<' + str(chiLimit), xRange=xRange, yRange=yRange)
- 
-       dictionary['FP']['']["HToAAH" + hMass + "A" + aMass] = h_Central
-       dictionary['FP']['IDUp']["HToAAH" + hMass + "A" + aMass] = h_IDUP
-       dictionary['FP']['IDDown']["HToAAH" + hMass + "A" + aMass] = h_IDDOWN
-       dictionary['FP']['IsoUp']["HToAAH" + hMass + "A" + aMass] = h_IsoUP
-       dictionary['FP']['IsoDown']["HToAAH" + hMass + "A" + aMass] = h_IsoDOWN
-       dictionary['FP']['BTagUp']["HToAAH" + hMass + "A" + aMass] = h_BTagUP
-       dictionary['FP']['BTagDown']["HToAAH" + hMass + "A" + aMass] = h_BTagDOWN
-       dictionary['FP']['PileupUp']["HToAAH" + hMass + "A" + aMass] = h_PileupUP
-       dictionary['FP']['PileupDown']["HToAAH" + hMass + "A" + aMass] = h_PileupDOWN
-
-
-if not IFCONTROL:
-  dictionary = {'PP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {}
-                       },
-                'FP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {}
-                       }
-               }
-else:
-  dictionary = {'PP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {}
-                       },
-                'FP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {}
-                       },
-                'control': {'' :{} }
-               }
-  
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/control.root")
-  control = f.Get("mmMass")
-  dictionary['control']['']['data'] = control
-  dictionary['control']['']['dataNoSig'] = control
-
-
-
-
-GetPPSignal(dictionary,XRANGE,YRANGE)
-GetPPData(dictionary,XRANGE,YRANGE)
-GetFPData(dictionary,XRANGE,YRANGE)
-GetFPSignal(dictionary,XRANGE,YRANGE)
 
 LimitsClass = HaaLimits2D(dictionary, tag='KinFit_mumukinFit_CombShape_yDCB')
 LimitsClass.XRANGE = XRANGE
+LimitsClass.NUMCPU = NUMCPU
 LimitsClass.YRANGE = YRANGE
 LimitsClass.UPSILONRANGE = UPSILONRANGE
 LimitsClass.SHIFTS = ['Pileup','ID','Iso','BTag']
@@ -211,9 +70,12 @@ LimitsClass.initializeWorkspace()
 # Devin's code
 ####################################
 LimitsClass.addControlModels(voigtian=True)
+loader.release() # the fits of this stage are done, their datasets are rebuilt if needed again
 LimitsClass.addBackgroundModels(voigtian=True,logy=False,fixAfterControl=IFCONTROL)
+loader.release()
 
 LimitsClass.addSignalModels(fit=False, yFitFuncFP="DCB", yFitFuncPP="DCB", isKinFit=True)
+loader.release()
 LimitsClass.addData(asimov=True)
 
 LimitsClass.setupDatacard()
@@ -14,6 +14,7 @@ ROOT.gROOT.SetBatch()
 import CombineLimits.Limits.Models as Models
 from CombineLimits.Limits.Limits import Limits
 from CombineLimits.Limits.utilities import *
+from CombineLimits.Limits.InputLoader import InputLoader
 
 from HaaLimitsNew import *
 
@@ -24,259 +25,33 @@ HMASSES = [125,300,750]
 subdirectoryName='DevVersion_mumu_SEP2_TH1_x' + str(XRANGE[0]) + 'to' + str(XRANGE[1]) + '/'
 name = 'mmmt_mm_parametric'
 IFCONTROL = True
-
-def getDataset(ds,weight='w',selection='1',xRange=[],yRange=[]):
-   args = ds.get()
-   if xRange: 
-     args.find('x').setRange(*xRange)
-   ds = ROOT.RooDataSet(ds.GetName(),ds.GetTitle(),ds,args,selection,weight)
-   return ds
-
-def getTH1F(hist, dic, xMin=0, xMax=30, shift='', name='', region='PP'):
-   print type(hist), name, shift
-   width = hist.GetBinWidth(3)
-   binedge = 0
-   newHist = ROOT.TH1F(hist.GetName(), hist.GetTitle(), hist.GetNbinsX(), hist.GetXaxis().GetXmin(), hist.GetXaxis().GetXmax())
-   newHist.SetDirectory(0)
-   newHist.AddDirectory(False)
-   for i in range(hist.GetNbinsX() ):
-      upperEdge = hist.GetBinCenter(i) + width/2
-      lowerEdge = hist.GetBinCenter(i) - width/2
-      if upperEdge > xMin and lowerEdge < xMax: 
-         newHist.SetBinContent(i, hist.GetBinContent(i) )
-         newHist.SetBinError(i,   hist.GetBinError(i) )
-      else:
-         newHist.SetBinContent(i,0)
-         newHist.SetBinError(i, 0)
-   dic[region][shift][name] = newHist
-     	
-
-def GetPPData(dictionary,xRange=[],yRange=[],rooDataSet=True):
-   f_FRC = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_AFromB_Plots.root")
-   f_FRD = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_AFromBDOWN_Plots.root")
-   f_FRU = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_AFromBUP_Plots.root")
-   
-   if rooDataSet: 
-      SingleMu_FakeRateCentral = f_FRC.Get("mumumass_dataset")
-      SingleMu_FakeRateDOWN    = f_FRD.Get("mumumass_dataset")
-      SingleMu_FakeRateUP      = f_FRU.Get("mumumass_dataset")
-      getDataset(SingleMu_FakeRateCentral, selection='x <= ' + str(XRANGE[1]) + ' && x >= ' + str(XRANGE[0]), xRange=xRange, yRange=yRange)
-      getDataset(SingleMu_FakeRateDOWN,    selection='x <= ' + str(XRANGE[1]) + ' && x >= ' + str(XRANGE[0]), xRange=xRange, yRange=yRange)
-      getDataset(SingleMu_FakeRateUP,      selection='x <= ' + str(XRANGE[1]) + ' && x >= ' + str(XRANGE[0]), xRange=xRange, yRange=yRange)
-      dictionary['PP']['']['data']         = SingleMu_FakeRateCentral
-      dictionary['PP']['FakeUp']['data']   = SingleMu_FakeRateUP
-      dictionary['PP']['FakeDown']['data'] = SingleMu_FakeRateDOWN
-      dictionary['PP']['']['dataNoSig']         = SingleMu_FakeRateCentral
-      dictionary['PP']['FakeUp']['dataNoSig']   = SingleMu_FakeRateUP
-      dictionary['PP']['FakeDown']['dataNoSig'] = SingleMu_FakeRateDOWN
-   else: 
-      SingleMu_FakeRateCentral = f_FRC.Get("mumu_Mass")
-      SingleMu_FakeRateDOWN    = f_FRD.Get("mumu_Mass")
-      SingleMu_FakeRateUP      = f_FRC.Get("mumu_Mass")
-      getTH1F(SingleMu_FakeRateCentral, xMin=XRANGE[0], xMax=XRANGE[1], shift='',         name='data', dic=dictionary, region='PP')
-      getTH1F(SingleMu_FakeRateDOWN,    xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeDown', name='data', dic=dictionary, region='PP')
-      getTH1F(SingleMu_FakeRateUP,      xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeUp',   name='data', dic=dictionary, region='PP')
-      getTH1F(SingleMu_FakeRateCentral, xMin=XRANGE[0], xMax=XRANGE[1], shift='',         name='dataNoSig', dic=dictionary, region='PP')
-      getTH1F(SingleMu_FakeRateDOWN,    xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeDown', name='dataNoSig', dic=dictionary, region='PP')
-      getTH1F(SingleMu_FakeRateUP,      xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeUp',   name='dataNoSig', dic=dictionary, region='PP')
-
-def GetPPSignal(dictionary,xRange=[],yRange=[], rooDataSet=False):
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_AllTH1Fs_AllShapes_MedIsoMu2_TauDMMedIso_SEP2.root")
-
-  for hMass in HMASSES:
-     for aMass in AMASSES:
-       if (str(hMass) == "300" or str(hMass) == "750") and (str(aMass) == "3p6" or str(aMass) == "4" or str(aMass) == "6"): continue
-       h_Central    = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_Central")
-       h_IDDOWN     = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_IDDOWN")
-       h_IDUP       = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_IDUP")
-       h_IsoDOWN    = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_IsoDOWN")
-       h_IsoUP      = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_IsoUP")
-       h_BTagDOWN   = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_BTagDOWN")
-       h_BTagUP     = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_BTagUP")
-       h_PileupDOWN = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_PileupDOWN")
-       h_PileupUP   = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMMedIso_SEP2_PileupUP")
-       print aMass, hMass
-
-       if not rooDataSet:
-          getTH1F(h_Central,    xMin=0, xMax=30, shift='',           name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_IDDOWN,     xMin=0, xMax=30, shift='IDDown',     name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_IDUP,       xMin=0, xMax=30, shift='IDUp',       name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_IsoDOWN,    xMin=0, xMax=30, shift='IsoDown',    name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_IsoUP,      xMin=0, xMax=30, shift='IsoUp',      name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_BTagDOWN,   xMin=0, xMax=30, shift='BTagDown',   name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_BTagUP,     xMin=0, xMax=30, shift='BTagUp',     name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_PileupDOWN, xMin=0, xMax=30, shift='PileupDown', name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-          getTH1F(h_PileupUP,   xMin=0, xMax=30, shift='PileupUp',   name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='PP')
-       else:
-          h_Central   = getDataset(h_Central,    selection='', xRange=[0,30], yRange=yRange)
-          h_IDDOWN    = getDataset(h_IDDOWN,     selection='', xRange=[0,30], yRange=yRange)
-          h_IDUP      = getDataset(h_IDUP,       selection='', xRange=[0,30], yRange=yRange)
-          h_IsoDOWN   = getDataset(h_IsoDOWN,    selection='', xRange=[0,30], yRange=yRange)
-          h_IsoUP     = getDataset(h_IsoUP,      selection='', xRange=[0,30], yRange=yRange)
-          h_BTagDOWN  = getDataset(h_BTagDOWN,   selection='', xRange=[0,30], yRange=yRange)
-          h_BTagUP    = getDataset(h_BTagUP,     selection='', xRange=[0,30], yRange=yRange)
-          h_PileupDOWN= getDataset(h_PileupDOWN, selection='', xRange=[0,30], yRange=yRange)
-          h_PileupUP  = getDataset(h_PileupUP,   selection='', xRange=[0,30], yRange=yRange)
-          dictionary['PP']['']["HToAAH" + str(hMass) + "A" + str(aMass)]           = h_Central
-          dictionary['PP']['IDUp']["HToAAH" + str(hMass) + "A" + str(aMass)]       = h_IDUP
-          dictionary['PP']['IDDown']["HToAAH" + str(hMass) + "A" + str(aMass)]     = h_IDDOWN
-          dictionary['PP']['IsoUp']["HToAAH" + str(hMass) + "A" + str(aMass)]      = h_IsoUP
-          dictionary['PP']['IsoDown']["HToAAH" + str(hMass) + "A" + str(aMass)]    = h_IsoDOWN
-          dictionary['PP']['BTagUp']["HToAAH" + str(hMass) + "A" + str(aMass)]     = h_BTagUP
-          dictionary['PP']['BTagDown']["HToAAH" + str(hMass) + "A" + str(aMass)]   = h_BTagDOWN
-          dictionary['PP']['PileupUp']["HToAAH" + str(hMass) + "A" + str(aMass)]   = h_PileupUP
-          dictionary['PP']['PileupDown']["HToAAH" + str(hMass) + "A" + str(aMass)] = h_PileupDOWN
-
-
-def GetFPData(dictionary,xRange=[],yRange=[], rooDataSet=False):
-
-   f_FakeRateRegionB = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_BItself_Plots.root")
-   if rooDataSet:
-      SingleMu_RegionB = f_FakeRateRegionB.Get("mumumass_dataset")
-      SingleMu_RegionB = getDataset(SingleMu_RegionB, selection='x <= ' + str(XRANGE[1]) + ' && x >= ' + str(XRANGE[0]), xRange=xRange, yRange=yRange)
-      dictionary['FP']['']['data']         = SingleMu_RegionB
-      dictionary['FP']['FakeUp']['data']   = SingleMu_RegionB
-      dictionary['FP']['FakeDown']['data'] = SingleMu_RegionB
-      dictionary['FP']['']['dataNoSig']         = SingleMu_RegionB
-      dictionary['FP']['FakeUp']['dataNoSig']   = SingleMu_RegionB
-      dictionary['FP']['FakeDown']['dataNoSig'] = SingleMu_RegionB
-   else:
-      SingleMu_RegionB = f_FakeRateRegionB.Get("mumu_Mass")
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='',         name='data', dic=dictionary, region='FP')
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeUp',   name='data', dic=dictionary, region='FP')
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeDown', name='data', dic=dictionary, region='FP')
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='',         name='dataNoSig', dic=dictionary, region='FP')
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeUp',   name='dataNoSig', dic=dictionary, region='FP')
-      getTH1F(SingleMu_RegionB, xMin=XRANGE[0], xMax=XRANGE[1], shift='FakeDown', name='dataNoSig', dic=dictionary, region='FP')
-
-   print  dictionary['FP']['']['data'],  dictionary['FP']['']['data'].GetName()
-
-def GetFPSignal(dictionary,xRange=[],yRange=[], rooDataSet=False):
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/FINAL_AllTH1Fs_AllShapes_MedIsoMu2_TauDMAntiMedIso_SEP2.root")
-   
-  for hMass in HMASSES: 
-     for aMass in AMASSES:
-       if (str(hMass) == "300" or str(hMass) == "750") and (str(aMass) == "3p6" or str(aMass) == "4" or str(aMass) == "6"): continue
-       h_Central    = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_Central")
-       h_IDDOWN     = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_IDDOWN")
-       h_IDUP       = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_IDUP")
-       h_IsoDOWN    = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_IsoDOWN")
-       h_IsoUP      = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_IsoUP")
-       h_BTagDOWN   = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_BTagDOWN")
-       h_BTagUP     = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_BTagUP")
-       h_PileupDOWN = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_PileupDOWN")
-       h_PileupUP   = f.Get("SIG_h" + str(hMass) + "a" + str(aMass) + "_MedIsoMu2_TauDMAntiMedIso_SEP2_PileupUP")
-
-       if not rooDataSet:
-           getTH1F(h_Central,    xMin=0, xMax=30, shift='',           name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_IDDOWN,     xMin=0, xMax=30, shift='IDDown',     name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_IDUP,       xMin=0, xMax=30, shift='IDUp',       name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_IsoDOWN,    xMin=0, xMax=30, shift='IsoDown',    name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_IsoUP,      xMin=0, xMax=30, shift='IsoUp',      name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_BTagDOWN,   xMin=0, xMax=30, shift='BTagDown',   name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_BTagUP,     xMin=0, xMax=30, shift='BTagUp',     name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_PileupDOWN, xMin=0, xMax=30, shift='PileupDown', name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-           getTH1F(h_PileupUP,   xMin=0, xMax=30, shift='PileupUp',   name="HToAAH" + str(hMass) + "A" + str(aMass), dic=dictionary, region='FP')
-       else:
-          h_Central    = getDataset(h_Central,    selection='', xRange=[0,30], yRange=yRange)
-          h_IDDOWN     = getDataset(h_IDDOWN,     selection='', xRange=[0,30], yRange=yRange)
-          h_IDUP       = getDataset(h_IDUP,       selection='', xRange=[0,30], yRange=yRange)
-          h_IsoDOWN    = getDataset(h_IsoDOWN,    selection='', xRange=[0,30], yRange=yRange)
-          h_IsoUP      = getDataset(h_IsoUP,      selection='', xRange=[0,30], yRange=yRange)
-          h_BTagDOWN   = getDataset(h_BTagDOWN,   selection='', xRange=[0,30], yRange=yRange)
-          h_BTagUP     = getDataset(h_BTagUP,     selection='', xRange=[0,30], yRange=yRange)
-          h_PileupDOWN = getDataset(h_PileupDOWN, selection='', xRange=[0,30], yRange=yRange)
-          h_PileupUP   = getDataset(h_PileupUP,   selection='', xRange=[0,30], yRange=yRange)
-          dictionary['FP']['']["HToAAH" + str(hMass) + "A" + str(aMass)]           = h_Central
-          dictionary['FP']['IDUp']["HToAAH" + str(hMass) + "A" + str(aMass)]       = h_IDUP
-          dictionary['FP']['IDDown']["HToAAH" + str(hMass) + "A" + str(aMass)]     = h_IDDOWN
-          dictionary['FP']['IsoUp']["HToAAH" + str(hMass) + "A" + str(aMass)]      = h_IsoUP
-          dictionary['FP']['IsoDown']["HToAAH" + str(hMass) + "A" + str(aMass)]    = h_IsoDOWN
-          dictionary['FP']['BTagUp']["HToAAH" + str(hMass) + "A" + str(aMass)]     = h_BTagUP
-          dictionary['FP']['BTagDown']["HToAAH" + str(hMass) + "A" + str(aMass)]   = h_BTagDOWN
-          dictionary['FP']['PileupUp']["HToAAH" + str(hMass) + "A" + str(aMass)]   = h_PileupUP
-          dictionary['FP']['PileupDown']["HToAAH" + str(hMass) + "A" + str(aMass)] = h_PileupDOWN
-
-
-if not IFCONTROL:
-  dictionary = {'PP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {},
-                   'FakeUp' : {},
-                   'FakeDown' : {}
-                       },
-                'FP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {},
-                   'FakeUp' : {},
-                   'FakeDown' : {}
-                       }
-               }
-else:
-  dictionary = {'PP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {},
-                   'FakeUp' : {},
-                   'FakeDown' : {}
-                       },
-                'FP' : {
-                   '' : {},
-                   'BTagUp' : {},
-                   'BTagDown' : {},
-                   'IDUp' : {},
-                   'IDDown' : {},
-                   'PileupUp' : {},
-                   'PileupDown' : {},
-                   'IsoUp' : {},
-                   'IsoDown' : {},
-                   'FakeUp' : {},
-                   'FakeDown' : {}
-                       },
-                'control': {'' :{} }
-               }
-  
-  f = ROOT.TFile.Open("/eos/cms/store/user/ktos/ShapeDifferences/control.root")
-  control = f.Get("mmMass")
-  dictionary['control']['']['data'] = control
-  dictionary['control']['']['dataNoSig'] = control
-
-
-
-
-print "check1"
-GetPPSignal(dictionary, rooDataSet=False)
-print"check2"
-GetPPData(dictionary, rooDataSet=False)
-print"check3"
-GetFPData(dictionary, rooDataSet=False)
-print"check4"
-GetFPSignal(dictionary, rooDataSet=False)
-print "check5"
-
+NUMCPU = 1 # processes evaluating the likelihood in the fits
+
+EOS = '/eos/cms/store/user/ktos/ShapeDifferences/'
+POINTS = [{'h': h, 'a': a} for h in HMASSES for a in AMASSES if not (h in [300,750] and str(a) in ['3p6','4','6'])]
+SIGNALSHIFTS = {'': 'Central', 'IDUp': 'IDUP', 'IDDown': 'IDDOWN', 'IsoUp': 'IsoUP', 'IsoDown': 'IsoDOWN', 'PileupUp': 'PileupUP', 'PileupDown': 'PileupDOWN', 'BTagUp': 'BTagUP', 'BTagDown': 'BTagDOWN'}
+# FakeUp reads the central file, as it always has for the histograms
+FAKESHIFTS = {'': 'AFromB', 'FakeUp': 'AFromB', 'FakeDown': 'AFromBDOWN'}
+
+manifest = [
+  {'region': 'PP', 'process': 'HToAAH{h}A{a}', 'file': EOS+'FINAL_AllTH1Fs_AllShapes_MedIsoMu2_TauDMMedIso_SEP2.root',
+   'object': 'SIG_h{h}a{a}_MedIsoMu2_TauDMMedIso_SEP2_{shift}', 'shifts': SIGNALSHIFTS, 'points': POINTS, 'type': 'hist', 'xRange': [0,30]},
+  {'region': 'PP', 'process': ['data','dataNoSig'], 'file': EOS+'MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_{shift}_Plots.root',
+   'object': 'mumu_Mass', 'shifts': FAKESHIFTS, 'type': 'hist', 'xRange': XRANGE},
+  {'region': 'FP', 'process': ['data','dataNoSig'], 'file': EOS+'MiniAOD_SingleMu_MedIsoMu2_TauDMAntiMedIso_SEP2_BItself_Plots.root',
+   'object': 'mumu_Mass', 'shifts': {'': '', 'FakeUp': '', 'FakeDown': ''}, 'type': 'hist', 'xRange': XRANGE},
+  {'region': 'FP', 'process': 'HToAAH{h}A{a}', 'file': EOS+'FINAL_AllTH1Fs_AllShapes_MedIsoMu2_TauDMAntiMedIso_SEP2.root',
+   'object': 'SIG_h{h}a{a}_MedIsoMu2_TauDMAntiMedIso_SEP2_{shift}', 'shifts': SIGNALSHIFTS, 'points': POINTS, 'type': 'hist', 'xRange': [0,30]},
+]
+if IFCONTROL:
+  manifest += [{'region': 'control', 'process': ['data','dataNoSig'], 'file': EOS+'control.root', 'object': 'mmMass', 'type': 'object'}]
+
+loader = InputLoader(manifest)
+dictionary = loader.load()
 
 LimitsClass = HaaLimits(dictionary, tag='DevVersion_mumu_SEP2_TH1_x' + str(XRANGE[0]) + 'to' + str(XRANGE[1]))
 LimitsClass.XRANGE = XRANGE
+LimitsClass.NUMCPU = NUMCPU
 LimitsClass.UPSILONRANGE = UPSILONRANGE
 LimitsClass.SHIFTS = ['Pileup','ID','Iso','BTag', 'Fake']
 LimitsClass.BACKGROUNDSHIFTS = ['Fake']
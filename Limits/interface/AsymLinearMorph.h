@@ -0,0 +1,50 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A constant with asymmetric linear shifts in nuisance parameters           *
+ *****************************************************************************/
+
+#ifndef MY_AsymLinear_Morph
+#define MY_AsymLinear_Morph
+
+#include <vector>
+
+#include "RooAbsReal.h"
+#include "RooListProxy.h"
+
+// central + sum_i max(0,nuisance_i)*up_i + min(0,nuisance_i)*down_i
+// with constant central, up_i and down_i, the compiled equivalent of the Models.Param formula.
+// The coefficients are plain numbers rather than RooConstVars, and the derivative with
+// respect to each nuisance is available analytically.
+class AsymLinearMorph : public RooAbsReal {
+public:
+  AsymLinearMorph() {} ;
+  AsymLinearMorph(const char *name, const char *title,
+	      double _central,
+	      const RooArgList& _nuisances,
+	      const double *_ups,
+	      const double *_downs); // one up and one down per nuisance
+  AsymLinearMorph(const AsymLinearMorph& other, const char* name=0) ;
+  virtual TObject* clone(const char* newname) const { return new AsymLinearMorph(*this,newname); }
+  inline virtual ~AsymLinearMorph() { }
+
+  // d value / d nuisance, the up slope at nuisance>=0 and the down slope below,
+  // zero if nuisance is not one of the shifts
+  Double_t partialDerivative(const RooAbsArg& nuisance) const ;
+
+protected:
+
+  RooListProxy nuisances ;
+
+  Double_t evaluate() const ;
+
+private:
+
+  double central;
+  std::vector<double> ups;
+  std::vector<double> downs;
+
+  ClassDef(AsymLinearMorph,1) // A constant with asymmetric linear shifts in nuisance parameters
+};
+
+#endif
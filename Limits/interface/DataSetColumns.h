@@ -0,0 +1,27 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * Copies between a RooDataSet and contiguous columns of doubles             *
+ *****************************************************************************/
+
+#ifndef MY_DataSet_Columns
+#define MY_DataSet_Columns
+
+#include "RooArgList.h"
+#include "RooDataSet.h"
+
+// The columns are stored one after the other, n values each: one column for each
+// variable of vars, in order, followed by the weights.
+// Used by the DatasetCache to store reduced datasets as arrays and to rebuild them
+// without reading a tree or evaluating a selection.
+class DataSetColumns {
+public:
+  // copy the values of vars and the weights of the n entries of data to columns
+  static void extract(const RooDataSet& data, const RooArgList& vars, double *columns);
+  // a new dataset of vars with n entries taken from columns, weighted by weightVar if given
+  static RooDataSet* fill(const char *name, const char *title,
+                          const RooArgList& vars, RooRealVar *weightVar,
+                          unsigned int n, const double *columns);
+};
+
+#endif
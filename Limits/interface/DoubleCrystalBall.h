@@ -15,7 +15,7 @@
  
 class DoubleCrystalBall : public RooAbsPdf {
 public:
-  DoubleCrystalBall() {} ; 
+  DoubleCrystalBall() : cacheValid(false) {} ; 
   DoubleCrystalBall(const char *name, const char *title,
 	      RooAbsReal& _x,
 	      RooAbsReal& _mean,
@@ -28,6 +28,12 @@ public:
   virtual TObject* clone(const char* newname) const { return new DoubleCrystalBall(*this,newname); }
   inline virtual ~DoubleCrystalBall() { }
 
+  // Evaluate the (unnormalized) pdf at n values of x with the current parameters
+  void evaluateArray(const double *xs, double *out, unsigned int n) const ;
+
+  Int_t getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* rangeName=0) const ;
+  Double_t analyticalIntegral(Int_t code, const char* rangeName=0) const ;
+
 protected:
 
   RooRealProxy x ;
@@ -42,6 +48,13 @@ protected:
 
 private:
 
+  // the tail constants, recomputed only when a1, n1, a2 or n2 change
+  void updateConstants() const ;
+  double shape(double u) const ;
+  mutable bool cacheValid ;                    //! not persisted
+  mutable double cache_a1, cache_n1, cache_a2, cache_n2 ; //!
+  mutable double A1, A2, B1, B2 ;              //!
+
   ClassDef(DoubleCrystalBall,1) // Your description goes here...
 };
  
@@ -31,7 +31,7 @@
  
 class DoubleSidedGaussian : public RooAbsPdf {
 public:
-  DoubleSidedGaussian() {} ; 
+  DoubleSidedGaussian() : cacheValid(false) {} ; 
   DoubleSidedGaussian(const char *name, const char *title,
 	      RooAbsReal& _x,
 	      RooAbsReal& _mean,
@@ -42,6 +42,12 @@ public:
   virtual TObject* clone(const char* newname) const { return new DoubleSidedGaussian(*this,newname); }
   inline virtual ~DoubleSidedGaussian() { }
 
+  // Evaluate the (unnormalized) pdf at n values of x with the current parameters
+  void evaluateArray(const double *xs, double *out, unsigned int n) const ;
+
+  Int_t getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* rangeName=0) const ;
+  Double_t analyticalIntegral(Int_t code, const char* rangeName=0) const ;
+
 protected:
 
   RooRealProxy x ;
@@ -52,6 +58,13 @@ protected:
 
 private:
 
+  // the parameter only constants, recomputed only when mean, sig1 or sig2 change
+  void updateConstants() const ;
+  double shape(double xv) const ;
+  mutable bool cacheValid ;                    //! not persisted
+  mutable double cache_mean, cache_sig1, cache_sig2 ; //!
+  mutable double mode, norm1, norm2, inv1, inv2 ; //!
+
   Double_t yMax;
   ClassDef(DoubleSidedGaussian,1) // Your description goes here...
 };
@@ -25,7 +25,7 @@
  
 class DoubleSidedVoigtian : public RooAbsPdf {
 public:
-  DoubleSidedVoigtian() {} ; 
+  DoubleSidedVoigtian() : cacheValid(false) {} ; 
   DoubleSidedVoigtian(const char *name, const char *title,
 	      RooAbsReal& _x,
 	      RooAbsReal& _mean,
@@ -38,6 +38,9 @@ public:
   virtual TObject* clone(const char* newname) const { return new DoubleSidedVoigtian(*this,newname); }
   inline virtual ~DoubleSidedVoigtian() { }
 
+  // Evaluate the (unnormalized) pdf at n values of x with the current parameters
+  void evaluateArray(const double *xs, double *out, unsigned int n) const ;
+
 protected:
 
   RooRealProxy x ;
@@ -50,6 +53,13 @@ protected:
 
 private:
 
+  // the parameter only constants, recomputed only when sig1, sig2, wid1 or wid2 change
+  void updateConstants() const ;
+  double shape(double xv) const ;
+  mutable bool cacheValid ;                    //! not persisted
+  mutable double cache_sig1, cache_sig2, cache_wid1, cache_wid2 ; //!
+  mutable double C1, C2, A1, A2, sigRatio ;    //!
+
   Double_t yMax;
   ClassDef(DoubleSidedVoigtian,1) // Your description goes here...
 };
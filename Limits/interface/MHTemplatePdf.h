@@ -0,0 +1,62 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A pdf in x tabulated on a uniform grid in MH and x                       *
+ *****************************************************************************/
+
+#ifndef MY_MH_TemplatePdf
+#define MY_MH_TemplatePdf
+
+#include <vector>
+
+#include "RooAbsPdf.h"
+#include "RooRealProxy.h"
+#include "RooAbsReal.h"
+
+// A pdf in x given by its values on a uniform (MH, x) grid, stored as floats.
+// Between the grid points the values are interpolated bilinearly; outside the grid
+// MH and x are clamped to its edges. At the MH of the grid evaluation is a table lookup.
+// The integral over x is analytical (the interpolation is piecewise linear in x),
+// so the normalization needs no numerical integration.
+class MHTemplatePdf : public RooAbsPdf {
+public:
+  MHTemplatePdf() : cacheValid(false) {} ;
+  MHTemplatePdf(const char *name, const char *title,
+	      RooAbsReal& _x,
+	      RooAbsReal& _mh,
+	      unsigned int _nmh, double _mhmin, double _mhmax,
+	      unsigned int _nx, double _xmin, double _xmax,
+	      const float *_values); // _nmh rows of _nx values
+  MHTemplatePdf(const MHTemplatePdf& other, const char* name=0) ;
+  virtual TObject* clone(const char* newname) const { return new MHTemplatePdf(*this,newname); }
+  inline virtual ~MHTemplatePdf() { }
+
+  Int_t getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* rangeName=0) const ;
+  Double_t analyticalIntegral(Int_t code, const char* rangeName=0) const ;
+
+protected:
+
+  RooRealProxy x ;
+  RooRealProxy mh ;
+
+  Double_t evaluate() const ;
+
+private:
+
+  void locateMH(double &t, unsigned int &i) const ;
+  double rowIntegral(unsigned int row, double a, double b) const ;
+  double rowPrimitive(unsigned int row, double u) const ;
+
+  unsigned int nmh;
+  double mhmin, mhmax;
+  unsigned int nx;
+  double xmin, xmax;
+  std::vector<float> values;
+
+  mutable bool cacheValid;               //! not persisted
+  mutable std::vector<double> cumulative; //! integral of each row up to each x grid point
+
+  ClassDef(MHTemplatePdf,1) // A pdf in x tabulated on a uniform grid in MH and x
+};
+
+#endif
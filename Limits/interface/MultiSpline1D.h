@@ -0,0 +1,82 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * Several natural cubic splines on a common knot grid                       *
+ *****************************************************************************/
+
+#ifndef MY_MULTI_Spline1D
+#define MY_MULTI_Spline1D
+
+#include <vector>
+
+#include "RooAbsReal.h"
+#include "RooRealProxy.h"
+
+// Natural cubic splines of several outputs over the same knots in xvar.
+// The knot search and the evaluation of all outputs are done once per xvar value
+// and cached; each output is exposed to pdfs as a MultiSpline1DOutput.
+// The values agree with RooSpline1D (CSPLINE) inside the knots,
+// outside the knots the end polynomials are extended.
+class MultiSpline1D : public RooAbsReal {
+public:
+  MultiSpline1D() : cacheValid(false) {} ;
+  MultiSpline1D(const char *name, const char *title,
+	      RooAbsReal& _xvar,
+	      unsigned int _npoints,
+	      unsigned int _noutputs,
+	      const double *_xvals,
+	      const double *_yvals); // _noutputs blocks of _npoints values
+  MultiSpline1D(const MultiSpline1D& other, const char* name=0) ;
+  virtual TObject* clone(const char* newname) const { return new MultiSpline1D(*this,newname); }
+  inline virtual ~MultiSpline1D() { }
+
+  unsigned int outputs() const { return noutputs; }
+  Double_t evaluateOutput(unsigned int i) const ;
+
+protected:
+
+  RooRealProxy xvar ;
+  Double_t evaluate() const ;
+
+private:
+
+  void computeSecondDerivatives() ;
+  void update(double x) const ;
+
+  unsigned int npoints;
+  unsigned int noutputs;
+  std::vector<double> xvals;
+  std::vector<double> yvals;
+  std::vector<double> d2vals; // second derivatives at the knots
+
+  mutable bool cacheValid;               //! not persisted
+  mutable double cacheX;                 //!
+  mutable unsigned int cacheInterval;    //!
+  mutable std::vector<double> cacheVals; //!
+
+  ClassDef(MultiSpline1D,1) // Natural cubic splines of several outputs over common knots
+};
+
+// One output of a MultiSpline1D
+class MultiSpline1DOutput : public RooAbsReal {
+public:
+  MultiSpline1DOutput() {} ;
+  MultiSpline1DOutput(const char *name, const char *title,
+	      MultiSpline1D& _spline,
+	      unsigned int _index);
+  MultiSpline1DOutput(const MultiSpline1DOutput& other, const char* name=0) ;
+  virtual TObject* clone(const char* newname) const { return new MultiSpline1DOutput(*this,newname); }
+  inline virtual ~MultiSpline1DOutput() { }
+
+protected:
+
+  RooRealProxy spline ;
+  Double_t evaluate() const ;
+
+private:
+
+  unsigned int index;
+  ClassDef(MultiSpline1DOutput,1) // One output of a MultiSpline1D
+};
+
+#endif
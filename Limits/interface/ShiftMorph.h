@@ -0,0 +1,43 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A central value with piecewise linear shifts in nuisance parameters       *
+ *****************************************************************************/
+
+#ifndef MY_Shift_Morph
+#define MY_Shift_Morph
+
+#include "RooAbsReal.h"
+#include "RooRealProxy.h"
+#include "RooListProxy.h"
+
+// central + sum_i max(0,nuisance_i)*up_i + min(0,nuisance_i)*down_i
+// where up_i and down_i are the (positive) up and down effects of nuisance i,
+// the compiled equivalent of the TMath::Max/Min RooFormulaVar of Models.Spline.
+class ShiftMorph : public RooAbsReal {
+public:
+  ShiftMorph() {} ;
+  ShiftMorph(const char *name, const char *title,
+	      RooAbsReal& _central,
+	      const RooArgList& _nuisances,
+	      const RooArgList& _ups,
+	      const RooArgList& _downs);
+  ShiftMorph(const ShiftMorph& other, const char* name=0) ;
+  virtual TObject* clone(const char* newname) const { return new ShiftMorph(*this,newname); }
+  inline virtual ~ShiftMorph() { }
+
+protected:
+
+  RooRealProxy central ;
+  RooListProxy nuisances ;
+  RooListProxy ups ;
+  RooListProxy downs ;
+
+  Double_t evaluate() const ;
+
+private:
+
+  ClassDef(ShiftMorph,1) // A central value with piecewise linear shifts in nuisance parameters
+};
+
+#endif
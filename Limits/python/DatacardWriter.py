@@ -0,0 +1,67 @@
+class DatacardWriter(object):
+    '''
+    DatacardWriter
+
+    Write the text of a datacard. Verbatim lines (header, shapes, params)
+    are added with line() and the tabular part (observations, processes,
+    nuisances) with row(), where the first entry of a row is its label.
+
+    The width of each column is tracked as rows are added, so that the
+    aligned layout pads every column only to its own widest entry and the
+    file is written in one buffered pass on close(). In compact mode the
+    columns are separated by a single space and every line is written
+    to the file as soon as it is added.
+    '''
+
+    def __init__(self,filename,compact=False,lineWidth=80):
+        self.filename = filename
+        self.compact = compact
+        self.lineWidth = lineWidth
+        self.items = []       # buffered lines/rows for the aligned layout
+        self.firstWidth = 0   # width of the label column
+        self.widths = []      # width of the remaining columns
+        self.f = open(filename,'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def line(self,text=''):
+        '''Add a line that is written as is.'''
+        if self.compact:
+            self.f.write(text+'\n')
+        else:
+            self.items += [text]
+
+    def separator(self):
+        '''Add a separator line.'''
+        self.line('-'*self.lineWidth)
+
+    def row(self,row):
+        '''Add a row of the table.'''
+        cells = [str(r).strip() for r in row]
+        # drop trailing empty cells from skipped columns
+        while len(cells)>1 and not cells[-1]: cells.pop()
+        if self.compact:
+            self.f.write(' '.join([c for c in cells if c])+'\n')
+            return
+        self.firstWidth = max(self.firstWidth,len(cells[0]))
+        for i,c in enumerate(cells[1:]):
+            if i<len(self.widths):
+                self.widths[i] = max(self.widths[i],len(c))
+            else:
+                self.widths += [len(c)]
+        self.items += [cells]
+
+    def getline(self,cells):
+        cols = [cells[0].ljust(self.firstWidth)] + [c.ljust(self.widths[i]) for i,c in enumerate(cells[1:])]
+        return ' '.join(cols).rstrip()
+
+    def close(self):
+        if self.f.closed: return
+        if not self.compact:
+            self.f.writelines([(item if isinstance(item,basestring) else self.getline(item))+'\n' for item in self.items])
+            self.items = []
+        self.f.close()
@@ -0,0 +1,122 @@
+import os
+import logging
+import hashlib
+import pickle
+
+import numpy as np
+
+import ROOT
+from CombineLimits.Limits.utilities import *
+
+class DatasetCache(object):
+    '''
+    DatasetCache
+
+    A persistent cache of reduced datasets, stored as columns of doubles.
+    Each dataset is a .npy file with one row per variable followed by a row of weights,
+    and a pickle with the name, title and variables (name, title, range and bins).
+    Datasets are addressed by a hash of the source file (path, size and modification time),
+    the name of the object and the selection, weight, ranges and renames applied to it.
+    The size and modification time of remote (e.g. root://) files are read with ROOT;
+    datasets of a file whose version cannot be found are not cached.
+    The columns are memory-mapped when read back and the dataset is filled from them
+    in compiled code, without reading the source tree or evaluating the selection.
+    '''
+
+    def __init__(self,directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.versions = {}
+        python_mkdir(self.directory)
+
+    def version(self,path):
+        '''Return (size, modification time) of the source file path, or None if it cannot be opened.'''
+        if os.path.exists(path):
+            st = os.stat(path)
+            return st.st_size, st.st_mtime
+        if path not in self.versions:
+            # remote files, opened once per run
+            tfile = ROOT.TFile.Open(path)
+            if not tfile or tfile.IsZombie():
+                self.versions[path] = None
+            else:
+                self.versions[path] = (tfile.GetSize(), tfile.GetModificationDate().AsSQLString())
+                tfile.Close()
+        return self.versions[path]
+
+    def key(self,path,name,**options):
+        '''Return the key for the object name of the file path reduced with options, or None if it should not be cached.'''
+        version = self.version(path)
+        if version is None:
+            logging.warning('Cannot get the size and modification time of {}, {} not cached'.format(path,name))
+            return None
+        h = hashlib.sha1()
+        h.update('{} {}'.format(path,name))
+        # a rewritten source gives a new key
+        h.update('{} {!r}'.format(*version))
+        for k in sorted(options):
+            h.update('{}={!r}'.format(k,options[k]))
+        return h.hexdigest()
+
+    def __path(self,key,ext):
+        return '{}/{}.{}'.format(self.directory,key,ext)
+
+    def get(self,key):
+        '''Return the cached dataset, or None if it has not been stored.'''
+        path = self.__path(key,'pkl')
+        if not os.path.exists(path):
+            self.misses += 1
+            logging.debug('Dataset cache miss {}'.format(key))
+            return None
+        try:
+            with open(path,'rb') as f:
+                meta = pickle.load(f)
+            # copy on write, the file is never modified
+            columns = np.load(self.__path(key,'npy'),mmap_mode='c')
+        except (IOError,OSError,ValueError):
+            self.misses += 1
+            logging.warning('Dataset cache entry {} cannot be read'.format(key))
+            return None
+        reals = [] # kept until the dataset, which copies them, is filled
+        variables = ROOT.RooArgList()
+        for name, title, vmin, vmax, bins in meta['variables']:
+            var = ROOT.RooRealVar(name,title,vmin,vmax)
+            var.setBins(bins)
+            variables.add(var)
+            reals += [var]
+        weightVar = ROOT.RooRealVar(meta['weight'],meta['weight'],1.) if meta['weight'] else ROOT.nullptr
+        data = ROOT.DataSetColumns.fill(meta['name'],meta['title'],variables,weightVar,columns.shape[1],columns)
+        ROOT.SetOwnership(data,True)
+        self.hits += 1
+        logging.debug('Dataset cache hit {}'.format(key))
+        return data
+
+    def put(self,key,data):
+        '''Store a dataset.'''
+        weight = data.weightVar().GetName() if data.isWeighted() and data.weightVar() else ''
+        row = data.get()
+        names = [name for name in row.contentsString().split(',') if name and name!=weight]
+        variables = ROOT.RooArgList()
+        meta = {'name': data.GetName(), 'title': data.GetTitle(), 'weight': weight, 'variables': []}
+        for name in names:
+            var = row.find(name)
+            if not isinstance(var,ROOT.RooRealVar):
+                logging.warning('Dataset {} has a non real variable {}, not cached'.format(data.GetName(),name))
+                return
+            variables.add(var)
+            meta['variables'] += [(name,var.GetTitle(),var.getMin(),var.getMax(),var.getBins())]
+        columns = np.empty((len(names)+1,data.numEntries()))
+        ROOT.DataSetColumns.extract(data,variables,columns)
+        # write and rename so that other processes never read a partial entry, the pickle last
+        for ext, write in [('npy', lambda f: np.save(f,columns)), ('pkl', lambda f: pickle.dump(meta,f))]:
+            tmp = '{}.{}.tmp'.format(self.__path(key,ext),os.getpid())
+            with open(tmp,'wb') as f:
+                write(f)
+            os.rename(tmp,self.__path(key,ext))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def logStats(self):
+        logging.info('Dataset cache {}: {} hits, {} misses'.format(self.directory,self.hits,self.misses))
@@ -0,0 +1,156 @@
+import os
+import glob
+import logging
+import hashlib
+import pickle
+
+import numpy as np
+
+import ROOT
+from CombineLimits.Limits.utilities import *
+
+class FitCache(object):
+    '''
+    FitCache
+
+    A persistent cache of fit results, one pickle file per result.
+    Results are addressed by a hash of everything that determines the fit:
+    the contents of the dataset, the definition of the model (its components
+    and their formulas, parameter ranges and initial values, and the ranges
+    of the observables) and any extra arguments such as the fit ranges. A changed input or model gives a new key, so stale
+    results are never reused.
+    Once the cache exceeds maxSize bytes the least recently used results are evicted.
+    '''
+
+    def __init__(self,directory,maxSize=500*1024*1024):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        python_mkdir(self.directory)
+
+    def __hashData(self,h,data):
+        '''Add the contents of a histogram or RooFit dataset to the hash.'''
+        h.update(data.ClassName())
+        if isinstance(data,ROOT.TH1):
+            for axis in [data.GetXaxis(),data.GetYaxis(),data.GetZaxis()]:
+                h.update(repr([axis.GetBinLowEdge(b) for b in range(1,axis.GetNbins()+2)]))
+            h.update(repr([data.GetBinContent(b) for b in range(data.GetNcells())]))
+            h.update(repr([data.GetBinError(b) for b in range(data.GetNcells())]))
+            return
+        argset = data.get()
+        names = sorted(argset.contentsString().split(','))
+        h.update(repr(names))
+        if isinstance(data,ROOT.RooDataSet) and all([isinstance(argset.find(n),ROOT.RooAbsReal) for n in names]):
+            # the columns and weights, copied in compiled code
+            variables = ROOT.RooArgList()
+            for n in names:
+                variables.add(argset.find(n))
+            columns = np.empty((len(names)+1,data.numEntries()))
+            ROOT.DataSetColumns.extract(data,variables,columns)
+            h.update(columns.tobytes())
+        else:
+            for i in range(data.numEntries()):
+                row = data.get(i)
+                h.update(repr([row.getRealValue(n) for n in names]+[data.weight()]))
+
+    def __hashModel(self,h,pdf,observables):
+        '''
+        Add the structure, formulas, parameter ranges and current (initial) values of a pdf to the hash.
+        The values of the observables are left out, they are whatever the last fit or plot set.
+        '''
+        components = pdf.getComponents()
+        for name in sorted(components.contentsString().split(',')):
+            comp = components.find(name)
+            h.update('{} {} {}'.format(comp.ClassName(),name,comp.getVariables().contentsString()))
+            if hasattr(comp,'expression'):
+                h.update(str(comp.expression()))
+            elif hasattr(comp,'formula'):
+                h.update(comp.formula().GetTitle())
+        variables = pdf.getVariables()
+        for name in sorted(variables.contentsString().split(',')):
+            var = variables.find(name)
+            if not isinstance(var,ROOT.RooRealVar): continue
+            if name in observables:
+                h.update('{} {!r} {!r}'.format(name,var.getMin(),var.getMax()))
+                continue
+            h.update('{} {!r} {!r} {!r} {}'.format(name,var.getVal(),var.getMin(),var.getMax(),var.isConstant()))
+
+    def key(self,data,pdf,observables=[],**kwargs):
+        '''
+        Return the key for fitting pdf to data. Additional kwargs (fit ranges, options) are included in the key.
+        observables names the observables of a histogram, those of a RooFit dataset are found from the pdf.
+        '''
+        h = hashlib.sha1()
+        self.__hashData(h,data)
+        observables = set(observables)
+        if isinstance(data,ROOT.RooAbsData):
+            observables |= set(pdf.getObservables(data).contentsString().split(','))
+        self.__hashModel(h,pdf,observables)
+        for k in sorted(kwargs):
+            h.update('{}={!r}'.format(k,kwargs[k]))
+        return h.hexdigest()
+
+    def __path(self,key):
+        return '{}/{}.pkl'.format(self.directory,key)
+
+    def get(self,key):
+        '''Return the cached result, or None if the fit has not been done.'''
+        path = self.__path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            logging.debug('Fit cache miss {}'.format(key))
+            return None
+        try:
+            with open(path,'rb') as f:
+                result = pickle.load(f)
+            os.utime(path,None) # mark as recently used
+        except (IOError,OSError):
+            # evicted by another process
+            self.misses += 1
+            return None
+        self.hits += 1
+        logging.debug('Fit cache hit {}'.format(key))
+        return result
+
+    def put(self,key,result):
+        '''Store a result and evict old results if needed.'''
+        # write and rename so that other processes never read a partial file
+        tmp = '{}.{}.tmp'.format(self.__path(key),os.getpid())
+        with open(tmp,'wb') as f:
+            pickle.dump(result,f)
+        os.rename(tmp,self.__path(key))
+        self.evict()
+
+    def evict(self):
+        '''Remove the least recently used results until the cache is below maxSize.'''
+        files = []
+        for f in glob.glob('{}/*.pkl'.format(self.directory)):
+            try:
+                files += [(os.path.getmtime(f),os.path.getsize(f),f)]
+            except OSError:
+                pass # removed by another process
+        total = sum([size for mtime,size,f in files])
+        for mtime,size,f in sorted(files):
+            if total<=self.maxSize: break
+            logging.debug('Fit cache evicting {}'.format(f))
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+            total -= size
+
+    def restore(self,pdf,vals,errs):
+        '''Set the parameters of a pdf to the values and errors of a cached fit.'''
+        variables = pdf.getVariables()
+        for param in vals:
+            var = variables.find(param)
+            if not var: continue
+            var.setVal(vals[param])
+            var.setError(errs[param])
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def logStats(self):
+        logging.info('Fit cache {}: {} hits, {} misses'.format(self.directory,self.hits,self.misses))
@@ -0,0 +1,111 @@
+import time
+import logging
+
+import ROOT
+
+class ImportRegistry(object):
+    '''
+    ImportRegistry
+
+    The objects already imported into one workspace, by name and structural signature
+    (class, title, the names of the direct servers and the import arguments).
+    Importing an object whose name and signature are already registered is skipped
+    without calling RooWorkspace::import, which would otherwise walk the whole server
+    tree again only to recycle every node. An object with a registered name but a
+    different signature is passed on to RooWorkspace::import, which reports the conflict.
+    Objects that are neither RooAbsArgs nor RooAbsData are always passed on.
+    A registry does not hold its workspace: it only keeps the name for the logs,
+    so a dropped workspace is freed. Its registry is dropped with release.
+    '''
+
+    registries = {}
+
+    @staticmethod
+    def key(workspace):
+        # a copy of a (read back) workspace has the same uuid, the address tells them apart;
+        # a new workspace at the address of a freed one has a new uuid
+        return (workspace.uuid().AsString(), ROOT.AddressOf(workspace)[0])
+
+    @classmethod
+    def get(cls,workspace):
+        '''The registry of a workspace, created on first use.'''
+        key = cls.key(workspace)
+        if key not in cls.registries:
+            cls.registries[key] = cls(workspace)
+        return cls.registries[key]
+
+    @classmethod
+    def release(cls,workspace):
+        '''Drop the registry of a workspace that is no longer used.'''
+        cls.registries.pop(cls.key(workspace),None)
+
+    @classmethod
+    def logAllStats(cls):
+        for registry in cls.registries.values():
+            registry.logStats()
+
+    def __init__(self,workspace):
+        self.name = workspace.GetName()
+        self.signatures = {}
+        self.imports = 0
+        self.skipped = 0
+        self.conflicts = 0
+        self.time = 0.
+
+    def __servers(self,obj):
+        names = []
+        it = obj.serverIterator()
+        server = it.Next()
+        while server:
+            names += [server.GetName()]
+            server = it.Next()
+        return sorted(names)
+
+    def signature(self,obj,cmds):
+        '''Return (name in the workspace, signature) of an object, or (None, None) if it is not tracked.'''
+        if isinstance(obj,ROOT.RooAbsArg):
+            structure = self.__servers(obj)
+        elif isinstance(obj,ROOT.RooAbsData):
+            structure = [obj.numEntries(), obj.get().contentsString()]
+        else:
+            return None, None
+        name = obj.GetName()
+        options = []
+        for cmd in cmds:
+            if not isinstance(cmd,ROOT.RooCmdArg): return None, None
+            if cmd.GetName()=='Rename': name = cmd.getString(0)
+            if cmd.GetName(): options += [(cmd.GetName(), cmd.getString(0), cmd.getInt(0))]
+        return name, (obj.ClassName(), obj.GetTitle(), tuple(structure), tuple(options))
+
+    def wsimport(self,workspace,*args):
+        '''Import into the workspace of the registry unless an identical object was already imported. Returns the RooWorkspace::import status.'''
+        name, signature = self.signature(args[0],args[1:])
+        if name is not None and name in self.signatures:
+            if self.signatures[name]==signature:
+                self.skipped += 1
+                logging.debug('Skipping import of {}, already in {}'.format(name,self.name))
+                return False
+            self.conflicts += 1
+            logging.warning('Importing {} into {} with a different structure than before'.format(name,self.name))
+        if len(args) < 2 :
+            # Useless RooCmdArg: https://sft.its.cern.ch/jira/browse/ROOT-6785
+            args += (ROOT.RooCmdArg(),)
+        start = time.time()
+        # getattr since import is special in python
+        # NB RooWorkspace clones object
+        result = getattr(workspace, 'import')(*args)
+        self.time += time.time()-start
+        self.imports += 1
+        if name is not None and not result:
+            self.signatures[name] = signature
+        return result
+
+    def stats(self):
+        return {'imports': self.imports, 'skipped': self.skipped, 'conflicts': self.conflicts, 'time': self.time}
+
+    def logStats(self):
+        logging.info('Workspace {} imports: {} imported in {:.2f} s, {} skipped, {} conflicts'.format(self.name,self.imports,self.time,self.skipped,self.conflicts))
+
+def wsimport(ws,*args):
+    '''Import args into ws through its ImportRegistry.'''
+    return ImportRegistry.get(ws).wsimport(ws,*args)
@@ -0,0 +1,265 @@
+import logging
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+import ROOT
+
+from CombineLimits.Limits.Selection import select
+
+def getDataset(ds,weight='w',selection='1',xRange=[],yRange=[],rename={}):
+    '''Return a copy of the dataset ds with the selection and weight applied, the variables in rename renamed and the x and y ranges set.'''
+    args = ds.get()
+    for old, new in rename.iteritems():
+        if args.find(old):
+            args.find(old).SetName(new)
+            args.find(new).SetTitle(new)
+    if xRange:
+        args.find('x').setRange(*xRange)
+    if yRange:
+        args.find('y').setRange(*yRange)
+    return select(ds,selection,args,weight)
+
+def histArrays(hist):
+    '''Return the bin contents and the sums of squared weights of a 1D histogram, including under/overflow, as arrays.'''
+    ncells = hist.GetNbinsX()+2
+    contents = None
+    for cls,dtype in [('TH1D',np.float64),('TH1F',np.float32),('TH1I',np.int32),('TH1S',np.int16),('TH1C',np.int8)]:
+        if isinstance(hist,getattr(ROOT,cls)):
+            buf = hist.GetArray()
+            if hasattr(buf,'SetSize'): buf.SetSize(ncells)
+            contents = np.frombuffer(buf,dtype=dtype,count=ncells).astype(np.float64)
+            break
+    if contents is None:
+        contents = np.array([hist.GetBinContent(b) for b in range(ncells)],dtype=np.float64)
+    if hist.GetSumw2N():
+        buf = hist.GetSumw2().GetArray()
+        if hasattr(buf,'SetSize'): buf.SetSize(ncells)
+        sumw2 = np.frombuffer(buf,dtype=np.float64,count=ncells).copy()
+    else:
+        sumw2 = np.abs(contents)
+    return contents, sumw2
+
+def getTH1F(hist,xMin=0,xMax=30,rebin=1):
+    '''
+    Return a detached copy of hist with the bins outside [xMin,xMax] emptied, merging groups of rebin bins.
+    A bin is kept if it overlaps the range. The underflow and overflow count as bins extending
+    to -inf and +inf, so they are kept only if the range goes beyond the axis.
+    '''
+    nbins = hist.GetNbinsX()
+    if nbins % rebin:
+        logging.error('Cannot merge the {} bins of {} in groups of {}'.format(nbins,hist.GetName(),rebin))
+        raise ValueError('Cannot merge the {} bins of {} in groups of {}'.format(nbins,hist.GetName(),rebin))
+    axis = hist.GetXaxis()
+    if axis.IsVariableBinSize():
+        buf = axis.GetXbins().GetArray()
+        if hasattr(buf,'SetSize'): buf.SetSize(nbins+1)
+        edges = np.frombuffer(buf,dtype=np.float64,count=nbins+1).copy()
+    else:
+        edges = np.linspace(axis.GetXmin(),axis.GetXmax(),nbins+1)
+    lowerEdges = np.concatenate([[-np.inf],edges])
+    upperEdges = np.concatenate([edges,[np.inf]])
+    keep = (upperEdges>xMin) & (lowerEdges<xMax)
+    contents, sumw2 = histArrays(hist)
+    contents = np.where(keep,contents,0.)
+    sumw2 = np.where(keep,sumw2,0.)
+    if rebin>1:
+        contents = np.concatenate([contents[:1],contents[1:-1].reshape(-1,rebin).sum(axis=1),contents[-1:]])
+        sumw2 = np.concatenate([sumw2[:1],sumw2[1:-1].reshape(-1,rebin).sum(axis=1),sumw2[-1:]])
+        edges = edges[::rebin]
+    if axis.IsVariableBinSize():
+        newHist = ROOT.TH1F(hist.GetName(), hist.GetTitle(), len(edges)-1, array('d',edges))
+    else:
+        newHist = ROOT.TH1F(hist.GetName(), hist.GetTitle(), len(edges)-1, edges[0], edges[-1])
+    newHist.SetDirectory(0)
+    newHist.AddDirectory(False)
+    newHist.Sumw2()
+    newHist.SetContent(contents)
+    newHist.SetError(np.sqrt(sumw2))
+    newHist.SetEntries(hist.GetEntries())
+    return newHist
+
+class Lazy(object):
+    '''A value of a LazyMap that is produced by calling load when it is accessed.'''
+
+    def __init__(self,load):
+        self.load = load
+
+class LazyMap(dict):
+    '''
+    A dict whose Lazy values are loaded on every access.
+    The map does not keep the results, so that whatever loads them decides how long they stay in memory.
+    '''
+
+    def __getitem__(self,key):
+        value = dict.__getitem__(self,key)
+        if isinstance(value,Lazy):
+            value = value.load()
+        return value
+
+    def get(self,key,default=None):
+        return self[key] if key in self else default
+
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def values(self):
+        return list(self.itervalues())
+
+class InputLoader(object):
+    '''
+    InputLoader
+
+    Builds the histMap[region][shift][process] structure used by the HaaLimits classes
+    from a manifest, a list of entries of the form
+
+        {
+            'region'   : 'PP',
+            'process'  : 'HToAAH{h}A{a}',   # or a list of processes sharing the object
+            'file'     : '/path/to/file.root',
+            'object'   : 'SIG_h{h}a{a}_{shift}_Plots',
+            'shifts'   : {'': 'Central', 'IDUp': 'IDUP', 'IDDown': 'IDDOWN'},
+            'points'   : [{'h': 125, 'a': 5}, {'h': 125, 'a': 7}],
+            'type'     : 'dataset',        # 'dataset', 'hist' or 'object'
+            'selection': 'x<25',
+            'xRange'   : [0,30],
+        }
+
+    The process, file, object and selection are formatted with the point and, for the
+    file and object, with shift set to the value of each entry of shifts.
+    A point can also override any of the options (selection, weight, xRange, yRange, rename).
+    'dataset' entries are passed through getDataset, 'hist' entries through getTH1F
+    (with xRange as the bin range) and 'object' entries are used as they are read.
+
+    Each file is opened once, and its keys are read up front so that a missing object
+    is reported before anything is fitted. The objects themselves are only read, and the
+    datasets only built, when histMap[region][shift][process] is accessed.
+    Identical requests (the same object with the same options) share the built object.
+
+    With maxResident, at most that many built objects are kept; the least recently used
+    is dropped first, and freed once its consumers no longer hold it. A dropped object
+    is rebuilt if it is accessed again. release() drops all of them, for example once
+    the fits using them are done. The source datasets read from the files are freed as
+    soon as they are reduced.
+
+    With a DatasetCache, reduced datasets are stored the first time they are built and
+    later runs fill them from the cache instead of reading and reducing the source.
+    '''
+
+    OPTIONS = [('selection','1'), ('weight','w'), ('xRange',[]), ('yRange',[]), ('rename',{})]
+
+    def __init__(self,manifest,maxResident=None,cache=None):
+        self.manifest = manifest
+        self.maxResident = maxResident
+        self.cache = cache
+        self.files = {}   # path: TFile, kept open since the objects read from them are owned by the file
+        self.keys = {}    # path: names of the objects in the file
+        self.objects = {} # (path, name): histogram or object read from the file
+        self.built = OrderedDict() # request: built object, least recently used first
+        self.reads = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def __file(self,path):
+        if path not in self.files:
+            tfile = ROOT.TFile.Open(path)
+            if not tfile or tfile.IsZombie():
+                logging.error('Cannot open {}'.format(path))
+                raise ValueError('Cannot open {}'.format(path))
+            self.files[path] = tfile
+            self.keys[path] = set([key.GetName() for key in tfile.GetListOfKeys()])
+        return self.files[path]
+
+    def __object(self,path,name):
+        if (path,name) not in self.objects:
+            self.objects[(path,name)] = self.__file(path).Get(name)
+            self.reads += 1
+        return self.objects[(path,name)]
+
+    def __dataset(self,path,name):
+        '''A dataset read from a file, owned by python so that it is freed once reduced.'''
+        ds = self.__file(path).Get(name)
+        ROOT.SetOwnership(ds,True)
+        self.reads += 1
+        return ds
+
+    def __reduce(self,request):
+        kind, path, name, selection, weight, xRange, yRange, rename = request
+        key = self.cache.key(path,name,selection=selection,weight=weight,xRange=xRange,yRange=yRange,rename=rename) if self.cache else None
+        ds = self.cache.get(key) if key else None
+        if ds is None:
+            ds = getDataset(self.__dataset(path,name),weight=weight,selection=selection,xRange=list(xRange),yRange=list(yRange),rename=dict(rename))
+            if key: self.cache.put(key,ds)
+        return ds
+
+    def __build(self,request):
+        if request in self.built:
+            obj = self.built.pop(request)
+        else:
+            kind, path, name, selection, weight, xRange, yRange, rename = request
+            logging.debug('Loading {} from {}'.format(name,path))
+            if kind=='dataset':
+                obj = self.__reduce(request)
+            elif kind=='hist':
+                obj = self.__object(path,name)
+                obj = getTH1F(obj,*xRange) if xRange else getTH1F(obj)
+            else:
+                obj = self.__object(path,name)
+            self.builds += 1
+        self.built[request] = obj
+        while self.maxResident is not None and len(self.built)>self.maxResident:
+            self.built.popitem(last=False)
+            self.evictions += 1
+        return obj
+
+    def resident(self):
+        return len(self.built)
+
+    def release(self):
+        '''Drop all built objects.'''
+        self.evictions += len(self.built)
+        self.built.clear()
+
+    def load(self,histMap=None):
+        '''Add the entries of the manifest to histMap (a new one if None) and return it.'''
+        if histMap is None: histMap = {}
+        for entry in self.manifest:
+            kind = entry.get('type','dataset')
+            if kind not in ['dataset','hist','object']:
+                logging.error('Unknown input type {}'.format(kind))
+                raise ValueError('Unknown input type {}'.format(kind))
+            processes = entry['process'] if isinstance(entry['process'],list) else [entry['process']]
+            shifts = entry.get('shifts',{'':''})
+            for point in entry.get('points',[{}]):
+                options = dict([(key, point.get(key,entry.get(key,default))) for key, default in self.OPTIONS])
+                for shift, shiftName in shifts.iteritems():
+                    path = entry['file'].format(shift=shiftName,**point)
+                    name = entry['object'].format(shift=shiftName,**point)
+                    self.__file(path)
+                    if '/' not in name and name not in self.keys[path]:
+                        logging.error('No {} in {}'.format(name,path))
+                        raise ValueError('No {} in {}'.format(name,path))
+                    request = (kind, path, name,
+                        options['selection'].format(**point), options['weight'],
+                        tuple(options['xRange']), tuple(options['yRange']), tuple(sorted(options['rename'].items())))
+                    shiftMap = histMap.setdefault(entry['region'],{}).setdefault(shift,LazyMap())
+                    if not isinstance(shiftMap,LazyMap):
+                        shiftMap = histMap[entry['region']][shift] = LazyMap(shiftMap)
+                    for process in processes:
+                        shiftMap[process.format(**point)] = Lazy(lambda request=request: self.__build(request))
+        return histMap
+
+    def stats(self):
+        return {'files': len(self.files), 'reads': self.reads, 'builds': self.builds, 'evictions': self.evictions, 'resident': len(self.built)}
+
+    def logStats(self):
+        logging.info('Input loader: {} files opened, {} objects read, {} built, {} evicted, {} resident'.format(len(self.files),self.reads,self.builds,self.evictions,len(self.built)))
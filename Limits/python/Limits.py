@@ -3,9 +3,12 @@ import sys
 import logging
 import numbers
 
+import numpy as np
 import ROOT
 
 from CombineLimits.Limits.Models import Model, ModelSpline
+from CombineLimits.Limits.DatacardWriter import DatacardWriter
+from CombineLimits.Limits.ImportRegistry import ImportRegistry, wsimport
 from utilities import *
 
 class Limits(object):
@@ -26,9 +29,13 @@ class Limits(object):
         self.models = {}      # models to add
         self.expected = {}    # expected yield, one per process/era/analysis/chanel combination
         self.systematics = {} # systematic uncertainties
+        self.systematic_index = {} # resolved (systname,process,bin) lookup for systematics
+        self.systematic_order = [] # order systematics were added, later additions take precedence
+        self.systematic_rank = {}  # systname: position in systematic_order
         self.param_systematics = {}
         self.rates = {}
         self.shapes = {}
+        self.unwrapped = {}   # unrolled 2D histograms, keyed by the id of the source histogram
         self.name = name
         self.workspace = self.buildWorkspace(self.name)
 
@@ -36,26 +43,50 @@ class Limits(object):
         return ROOT.RooWorkspace(name)
 
     def wsimport(self, *args) :
-        # getattr since import is special in python
-        # NB RooWorkspace clones object
-        if len(args) < 2 :
-            # Useless RooCmdArg: https://sft.its.cern.ch/jira/browse/ROOT-6785
-            args += (ROOT.RooCmdArg(),)
-        return getattr(self.workspace, 'import')(*args)
+        # repeated imports of the same object are skipped by the registry of the workspace
+        return wsimport(self.workspace,*args)
+
+    def __histArray(self,hist,ncells):
+        '''Return the bin contents of a histogram, including under/overflow, as an array.'''
+        dtypes = [('TH2D',np.float64),('TH2F',np.float32),('TH2I',np.int32),('TH2S',np.int16),('TH2C',np.int8)]
+        for cls,dtype in dtypes:
+            if isinstance(hist,getattr(ROOT,cls)):
+                buf = hist.GetArray()
+                if hasattr(buf,'SetSize'): buf.SetSize(ncells)
+                return np.frombuffer(buf,dtype=dtype,count=ncells).astype(np.float64)
+        return np.array([hist.GetBinContent(b) for b in range(ncells)],dtype=np.float64)
 
     def __unwrap(self,hist):
-        '''Convert 2D histogram to 1D'''
-        nbins = hist.GetNbinsX()*hist.GetNbinsY()
+        '''
+        Convert 2D histogram to 1D, with x running fastest.
+        The result is cached for each source histogram, so repeated lookups
+        (e.g. when writing several cards) return the same unrolled histogram.
+        '''
+        key = id(hist)
+        if key in self.unwrapped and self.unwrapped[key][0] is hist:
+            return self.unwrapped[key][1]
+        nx = hist.GetNbinsX()
+        ny = hist.GetNbinsY()
+        nbins = nx*ny
+        ncells = (nx+2)*(ny+2)
+        contents = self.__histArray(hist,ncells)
+        if hist.GetSumw2N():
+            buf = hist.GetSumw2().GetArray()
+            if hasattr(buf,'SetSize'): buf.SetSize(ncells)
+            errors = np.sqrt(np.frombuffer(buf,dtype=np.float64,count=ncells))
+        else:
+            errors = np.sqrt(np.abs(contents))
+        values = np.zeros(nbins+2)
+        valueErrors = np.zeros(nbins+2)
+        values[1:-1] = contents.reshape(ny+2,nx+2)[1:-1,1:-1].ravel()
+        valueErrors[1:-1] = errors.reshape(ny+2,nx+2)[1:-1,1:-1].ravel()
+        values[0], valueErrors[0] = contents[0], errors[0]
+        values[-1], valueErrors[-1] = contents[nbins+1], errors[nbins+1]
         result = ROOT.TH1F(hist.GetName(),hist.GetTitle(),nbins,0,nbins)
-        result.SetBinContent(0,hist.GetBinContent(0))
-        result.SetBinError(0,hist.GetBinError(0))
-        result.SetBinContent(nbins+1,hist.GetBinContent(nbins+1))
-        result.SetBinError(nbins+1,hist.GetBinError(nbins+1))
-        for nx in range(hist.GetNbinsX()):
-            for ny in range(hist.GetNbinsY()):
-                b = hist.GetBin(nx+1,ny+1)
-                result.SetBinContent(b,hist.GetBinContent(b))
-                result.SetBinError(b,hist.GetBinError(b))
+        result.SetContent(values)
+        result.SetError(valueErrors)
+        result.SetEntries(hist.GetEntries())
+        self.unwrapped[key] = (hist,result)
         return result
 
     def addVar(self, var, varMin, varMax, unit='', label='', **kwargs):
@@ -95,6 +126,8 @@ class Limits(object):
             logging.warning('Bin {0} already added.'.format(b))
         else:
             self.bins += [b]
+            for syst in self.systematic_order:
+                self.__indexSystematic(syst,bins=[b])
 
     def addProcess(self,proc,signal=False):
         '''
@@ -113,6 +146,8 @@ class Limits(object):
                 self.signals += [proc]
             else:
                 self.backgrounds += [proc]
+            for syst in self.systematic_order:
+                self.__indexSystematic(syst,processes=[proc])
 
     def addSystematic(self,systname,mode,systematics={}):
         '''
@@ -158,6 +193,31 @@ class Limits(object):
                         'mode'  : mode,
                         'values': systematics,
                     }
+                    self.systematic_rank[systname] = len(self.systematic_order)
+                    self.systematic_order += [systname]
+                    self.__indexSystematic(systname)
+
+    def __indexSystematic(self,systname,processes=[],bins=[]):
+        '''
+        Resolve the values of a systematic into the lookup index keyed by
+        (expanded systematic name, process, bin). 'all' is expanded to the
+        currently known processes/bins, so this is called again when a new
+        process or bin is added (restricted to that process or bin).
+        '''
+        rank = self.systematic_rank[systname]
+        for v,syst_vals in enumerate(self.systematics[systname]['values']):
+            s_processes, s_bins = syst_vals
+            value = self.systematics[systname]['values'][syst_vals]
+            procs = self.processes.keys() if 'all' in s_processes else s_processes
+            bs = self.bins if 'all' in s_bins else s_bins
+            if processes: procs = [p for p in procs if p in processes]
+            if bins: bs = [b for b in bs if b in bins]
+            for process in procs:
+                for bin in bs:
+                    key = (systname.format(process=process,bin=bin),process,bin)
+                    # keep the value from the most recently added systematic
+                    if key in self.systematic_index and self.systematic_index[key][0]>(rank,v): continue
+                    self.systematic_index[key] = ((rank,v),value)
 
     def addGroup(self,groupname,*systnames):
         '''Add a group name for a list of systematics'''
@@ -185,18 +245,8 @@ class Limits(object):
 
     def getSystematic(self,systname,process,bin):
         '''Return the systematic value for a given systematic/process/bin combination.'''
-        # make sure it exists:
-        result = 1.
-        for syst in self.systematics:
-            fullSystName = syst.format(process=process,bin=bin)
-            if fullSystName != systname: continue
-            # check if there is a systematic value for this combination
-            for syst_vals in self.systematics[syst]['values']:
-                s_processes, s_bins = syst_vals
-                if process not in s_processes and 'all' not in s_processes: continue
-                if bin not in s_bins and 'all' not in s_bins: continue
-                # return the value
-                result = self.systematics[syst]['values'][syst_vals]
+        key = (systname,process,bin)
+        result = self.systematic_index[key][1] if key in self.systematic_index else 1.
         if isinstance(result,ROOT.TH2):
             result = self.__unwrap(result)
         if isinstance(result,tuple) or isinstance(result,list):
@@ -301,19 +351,25 @@ class Limits(object):
         logging.debug('Getting expected {} {} {}'.format(process,bin,val))
         return val
 
-    def printCard(self,filename,bins=['all'],processes=['all'],blind=True,addSignal=False,saveWorkspace=False,suffix=''):
+    def printCard(self,filename,bins=['all'],processes=['all'],blind=True,addSignal=False,saveWorkspace=False,suffix='',shareCards=True,compact=False):
         '''
         Print a datacard to file.
         Select the bins you want to include.
         Each will correspond to one bin in the datacard.
+        If processes is a dictionary, one datacard is written per key.
+        With shareCards the bins, observations and the expected/systematic
+        values of each process are only computed once for all of these cards.
+        With compact the columns are separated by a single space instead of
+        being aligned.
         '''
 
-        shapes = self._printMultipleCards(filename,bins,processes,blind,addSignal,saveWorkspace,suffix)
+        shapes = self._printMultipleCards(filename,bins,processes,blind,addSignal,saveWorkspace,suffix,shareCards,compact)
 
         # shape file
         if saveWorkspace or shapes:
             outname = filename+'.root'
             if saveWorkspace:
+                ImportRegistry.get(self.workspace).logStats()
                 self.workspace.Print()
                 self.workspace.SaveAs(outname)
                 outfile = ROOT.TFile.Open(outname,'UPDATE')
@@ -324,33 +380,52 @@ class Limits(object):
             outfile.Write()
             outfile.Close()
 
-    def _printMultipleCards(self,filename,bins,processes,blind,addSignal,saveWorkspace,suffix):
+    def _printMultipleCards(self,filename,bins,processes,blind,addSignal,saveWorkspace,suffix,shareCards=False,compact=False):
         shapes = []
         if isinstance(bins,dict):
             for k,v in bins.iteritems():
-                shapes += self._printMultipleCards(filename,v,processes,blind,addSignal,saveWorkspace,'{0}_{1}'.format(suffix,k))
+                shapes += self._printMultipleCards(filename,v,processes,blind,addSignal,saveWorkspace,'{0}_{1}'.format(suffix,k),shareCards,compact)
+        elif isinstance(processes,dict) and shareCards and not any([isinstance(v,dict) for v in processes.values()]):
+            allProcesses = []
+            for k,v in processes.iteritems():
+                if v==['all']: v = self.processes.keys()
+                allProcesses += [p for p in v if p not in allProcesses]
+            card = self._prepareCard(filename,bins,allProcesses,blind,addSignal,saveWorkspace)
+            if card is None: return shapes
+            for k,v in processes.iteritems():
+                self._writeCard(filename,'{0}_{1}'.format(suffix,k),card,v,saveWorkspace,compact)
+            shapes += card['shapes']
         elif isinstance(processes,dict):
             for k,v in processes.iteritems():
-                shapes += self._printMultipleCards(filename,bins,v,blind,addSignal,saveWorkspace,'{0}_{1}'.format(suffix,k))
+                shapes += self._printMultipleCards(filename,bins,v,blind,addSignal,saveWorkspace,'{0}_{1}'.format(suffix,k),shareCards,compact)
         else:
-            shapes += self._printSingleCard(filename,bins,processes,blind,addSignal,saveWorkspace,suffix)
+            shapes += self._printSingleCard(filename,bins,processes,blind,addSignal,saveWorkspace,suffix,compact)
             
         return shapes
 
+    def _printSingleCard(self,filename,bins,processes,blind,addSignal,saveWorkspace,suffix,compact=False):
+        if processes==['all']: processes = self.processes.keys()
+        card = self._prepareCard(filename,bins,processes,blind,addSignal,saveWorkspace)
+        if card is None: return []
+        self._writeCard(filename,suffix,card,processes,saveWorkspace,compact)
+        return card['shapes']
 
-
-
-    def _printSingleCard(self,filename,bins,processes,blind,addSignal,saveWorkspace,suffix):
-        logging.info('Preparing {0}{1}.txt'.format(filename,suffix))
+    def _prepareCard(self,filename,bins,processes,blind,addSignal,saveWorkspace):
+        '''
+        Compute the contents of a datacard for the given bins and processes.
+        The result can be written for any subset of the processes with _writeCard.
+        '''
+        logging.info('Preparing {0}'.format(filename))
         goodToPrint = True
         goodToPrint = goodToPrint and self.__checkBins(bins)
         if not goodToPrint: return
 
         if bins==['all']: bins = self.bins
-        if processes==['all']: processes = self.processes.keys()
         signals = [x for x in self.signals if x in processes]
         backgrounds = [x for x in self.backgrounds if x in processes]
+        processesOrdered = signals + backgrounds
         shapes = []
+        named = {}
 
         # setup bins
         binRows = ['bin']
@@ -363,8 +438,7 @@ class Limits(object):
             label = 'data_obs_{0}'.format(blabel)
             if isinstance(obs,ROOT.TH1):
                 logging.debug('{0}: {1}'.format(label,obs.Integral()))
-                obs.SetName(label)
-                obs.SetTitle(label)
+                obs = self.__nameShape(obs,label,named)
                 shapes += [obs]
                 if saveWorkspace:
                     datahist = ROOT.RooDataHist(label, label, ROOT.RooArgList(self.workspace.var("x")), obs)
@@ -377,19 +451,9 @@ class Limits(object):
                 logging.debug('{0}: {1}'.format(label,obs))
             # TODO: unbinned data handling
             observations += ['{0}'.format(obs)]
-        imax = len(binRows)-1
 
         # setup processes
-        jmax = len(processes)-1
-
-        totalColumns = len(bins)*len(processes)
-        processesOrdered = signals + backgrounds
-        binsForRates = ['bin','']+['']*totalColumns
-        processNames = ['process','']+['']*totalColumns
-        processNumbers = ['process','']+['']*totalColumns
-        rates = ['rate','']+['']*totalColumns
-        norms = []
-        colpos = 2
+        rates = {}
         toSkip = []
         for bin in bins:
             for process in processesOrdered:
@@ -398,14 +462,10 @@ class Limits(object):
                     toSkip += [(bin,process)]
                     logging.debug('Skipping {} {}'.format(process,bin))
                     continue
-                binsForRates[colpos] = binName.format(bin=bin)
-                processNames[colpos] = process
-                processNumbers[colpos] = '{0:<10}'.format(processesOrdered.index(process)-len(signals)+1)
-                label = '{0}_{1}'.format(processNames[colpos],binsForRates[colpos])
+                label = '{0}_{1}'.format(process,binName.format(bin=bin))
                 if isinstance(exp,ROOT.TH1): # it is a histogram (for shape analysis)
                     logging.debug('{0}: {1}'.format(label,exp.Integral()))
-                    exp.SetName(label)
-                    exp.SetTitle(label)
+                    exp = self.__nameShape(exp,label,named)
                     shapes += [exp]
                     if saveWorkspace:
                         datahist = ROOT.RooDataHist(label, label, ROOT.RooArgList(self.workspace.var("x")), exp)
@@ -423,16 +483,8 @@ class Limits(object):
                     logging.error('Failed to understand: {} {}'.format(bin,process))
                     print exp
                     raise
-                rates[colpos] = '{0:<10.4g}'.format(exp)
+                rates[(bin,process)] = '{0:<10.4g}'.format(exp)
                 # TODO: unbinned handling
-                colpos += 1
-
-        # other rateParams
-        for ratename in self.rates:
-            b = self.rates[ratename]['bin']
-            p = self.rates[ratename]['process']
-            if b in bins and p in processes:
-                norms += [[ratename,'rateParam',b,p,'{}.root:{}'.format(filename,self.name)]]
 
         # setup nuissances
         logging.debug('Systs available: {0}'.format([str(x) for x in sorted(self.systematics.keys())]))
@@ -443,66 +495,58 @@ class Limits(object):
             keys += [key]
             systs[key] = {}
             for syst in self.systematics:
-                systs[key].update(self.__getSystematicRows(syst,processes,bin))
-
+                systs[key].update(self.__getSystematicRows(syst,processesOrdered,bin))
 
         combinedSysts = self.__combineSystematics(*[systs[key] for key in systs])
         logging.debug('Systs to add: {0}'.format([str(x) for x in sorted(combinedSysts.keys())]))
-        systRows = []
-        for syst in sorted(combinedSysts.keys()):
-            thisRow = [syst,combinedSysts[syst]['mode']]
-            for bin in bins:
-                for process in processesOrdered:
-                    key = (bin,process)
-                    if key in toSkip: continue
+        systNames = {} # the systematic names (and modes) each column contributes to the card
+        systCells = {} # the formatted systematic values, keyed by (bin,process,systname)
+        for syst in combinedSysts:
+            for key in combinedSysts[syst]['systs']:
+                systNames.setdefault(key,{})[syst] = combinedSysts[syst]['mode']
+                if key in toSkip: continue
+                bin, process = key
+                s = combinedSysts[syst]['systs'][key]
+                if s==1:
                     s = '-'
-                    if key in combinedSysts[syst]['systs']:
-                        s = combinedSysts[syst]['systs'][key]
-                        if s==1:
-                            s = '-'
-                        elif isinstance(s,ROOT.TH1):
-                            label = '{0}_{1}_{2}'.format(process,binName.format(bin=bin),syst)
-                            s.SetName(label)
-                            s.SetTitle(label)
-                            shapes += [s]
-                            if saveWorkspace:
-                                datahist = ROOT.RooDataHist(label, label, ROOT.RooArgList(self.workspace.var("x")), s)
-                                logging.debug('Importing {}'.format(label))
-                                self.wsimport(datahist)
-                            s = '1'
-                        elif isinstance(s,basestring):
-                            label = '{0}_{1}_{2}'.format(process,binName.format(bin=bin),syst)
-                            s = '1'
-                        elif (isinstance(s,tuple) or isinstance(s,list)) and len(s)==2:
-                            if isinstance(s[0],ROOT.TH1):
-                                label_up = '{0}_{1}_{2}Up'.format(process,binName.format(bin=bin),syst)
-                                label_down = '{0}_{1}_{2}Down'.format(process,binName.format(bin=bin),syst)
-                                s[0].SetName(label_up)
-                                s[0].SetTitle(label_up)
-                                s[1].SetName(label_down)
-                                s[1].SetTitle(label_down)
-                                shapes += s
-                                if saveWorkspace:
-                                    datahist_up = ROOT.RooDataHist(label_up, label_up, ROOT.RooArgList(self.workspace.var("x")), s[0])
-                                    datahist_down = ROOT.RooDataHist(label_down, label_down, ROOT.RooArgList(self.workspace.var("x")), s[1])
-                                    logging.debug('Importing {}'.format(label_up))
-                                    self.wsimport(datahist_up)
-                                    logging.debug('Importing {}'.format(label_down))
-                                    self.wsimport(datahist_down)
-                                s = '1'
-                            elif isinstance(s[0],basestring):
-                                label_up = '{0}_{1}_{2}Up'.format(process,binName.format(bin=bin),syst)
-                                label_down = '{0}_{1}_{2}Down'.format(process,binName.format(bin=bin),syst)
-                                s = '1'
-                            elif isinstance(s[0],numbers.Number):
-                                s = '{0:>4.4g}/{1:<4.4g}'.format(*s)
-                            else:
-                                logging.error('Do not know how to handle {0}'.format(s))
-                                raise
-                        elif isinstance(s,numbers.Number):
-                            s = '{0:<10.4g}'.format(s)
-                    thisRow += [s]
-            systRows += [thisRow]
+                elif isinstance(s,ROOT.TH1):
+                    label = '{0}_{1}_{2}'.format(process,binName.format(bin=bin),syst)
+                    s = self.__nameShape(s,label,named)
+                    shapes += [s]
+                    if saveWorkspace:
+                        datahist = ROOT.RooDataHist(label, label, ROOT.RooArgList(self.workspace.var("x")), s)
+                        logging.debug('Importing {}'.format(label))
+                        self.wsimport(datahist)
+                    s = '1'
+                elif isinstance(s,basestring):
+                    label = '{0}_{1}_{2}'.format(process,binName.format(bin=bin),syst)
+                    s = '1'
+                elif (isinstance(s,tuple) or isinstance(s,list)) and len(s)==2:
+                    if isinstance(s[0],ROOT.TH1):
+                        label_up = '{0}_{1}_{2}Up'.format(process,binName.format(bin=bin),syst)
+                        label_down = '{0}_{1}_{2}Down'.format(process,binName.format(bin=bin),syst)
+                        s = [self.__nameShape(s[0],label_up,named),self.__nameShape(s[1],label_down,named)]
+                        shapes += s
+                        if saveWorkspace:
+                            datahist_up = ROOT.RooDataHist(label_up, label_up, ROOT.RooArgList(self.workspace.var("x")), s[0])
+                            datahist_down = ROOT.RooDataHist(label_down, label_down, ROOT.RooArgList(self.workspace.var("x")), s[1])
+                            logging.debug('Importing {}'.format(label_up))
+                            self.wsimport(datahist_up)
+                            logging.debug('Importing {}'.format(label_down))
+                            self.wsimport(datahist_down)
+                        s = '1'
+                    elif isinstance(s[0],basestring):
+                        label_up = '{0}_{1}_{2}Up'.format(process,binName.format(bin=bin),syst)
+                        label_down = '{0}_{1}_{2}Down'.format(process,binName.format(bin=bin),syst)
+                        s = '1'
+                    elif isinstance(s[0],numbers.Number):
+                        s = '{0:>4.4g}/{1:<4.4g}'.format(*s)
+                    else:
+                        logging.error('Do not know how to handle {0}'.format(s))
+                        raise
+                elif isinstance(s,numbers.Number):
+                    s = '{0:<10.4g}'.format(s)
+                systCells[(bin,process,syst)] = s
 
         logging.debug('Params systs to add: {0}'.format([str(x) for x in sorted(self.param_systematics.keys())]))
         paramRows = []
@@ -514,90 +558,148 @@ class Limits(object):
                 values = self.param_systematics[param]['values']
                 paramRows += [[param,mode]+values]
 
+        return {
+            'bins'        : bins,
+            'binRows'     : binRows,
+            'observations': observations,
+            'rates'       : rates,
+            'toSkip'      : toSkip,
+            'systNames'   : systNames,
+            'systCells'   : systCells,
+            'paramRows'   : paramRows,
+            'shapes'      : shapes,
+        }
+
+    def __nameShape(self,shape,label,named):
+        '''
+        Name a shape for the card. Unrolled and user provided histograms can be
+        shared between processes, so clone it if it was already given another name.
+        '''
+        if id(shape) in named and named[id(shape)]!=label:
+            shape = shape.Clone(label)
+        shape.SetName(label)
+        shape.SetTitle(label)
+        named[id(shape)] = label
+        return shape
+
+    def _writeCard(self,filename,suffix,card,processes,saveWorkspace,compact=False):
+        '''Write a datacard prepared by _prepareCard for the given processes.'''
+        if processes==['all']: processes = self.processes.keys()
+        bins = card['bins']
+        binRows = card['binRows']
+        observations = card['observations']
+        toSkip = card['toSkip']
+        shapes = card['shapes']
+        signals = [x for x in self.signals if x in processes]
+        backgrounds = [x for x in self.backgrounds if x in processes]
+        binName = '{bin}'
+
+        imax = len(binRows)-1
+
+        # setup processes
+        jmax = len(processes)-1
+
+        totalColumns = len(bins)*len(processes)
+        processesOrdered = signals + backgrounds
+        binsForRates = ['bin','']+['']*totalColumns
+        processNames = ['process','']+['']*totalColumns
+        processNumbers = ['process','']+['']*totalColumns
+        rates = ['rate','']+['']*totalColumns
+        norms = []
+        colpos = 2
+        for bin in bins:
+            for process in processesOrdered:
+                if (bin,process) in toSkip: continue
+                binsForRates[colpos] = binName.format(bin=bin)
+                processNames[colpos] = process
+                processNumbers[colpos] = '{0:<10}'.format(processesOrdered.index(process)-len(signals)+1)
+                rates[colpos] = card['rates'][(bin,process)]
+                colpos += 1
+
+        # other rateParams
+        for ratename in self.rates:
+            b = self.rates[ratename]['bin']
+            p = self.rates[ratename]['process']
+            if b in bins and p in processes:
+                norms += [[ratename,'rateParam',b,p,'{}.root:{}'.format(filename,self.name)]]
+
+        # setup nuissances
+        systModes = {}
+        for bin in bins:
+            for process in processesOrdered:
+                systModes.update(card['systNames'].get((bin,process),{}))
+        systRows = []
+        for syst in sorted(systModes.keys()):
+            thisRow = [syst,systModes[syst]]
+            for bin in bins:
+                for process in processesOrdered:
+                    key = (bin,process)
+                    if key in toSkip: continue
+                    thisRow += [card['systCells'].get((bin,process,syst),'-')]
+            systRows += [thisRow]
+
+        paramRows = card['paramRows']
+
         kmax = len(systRows)
 
         # now write to file
         logging.info('Writing {0}{1}.txt'.format(filename,suffix))
         python_mkdir(os.path.dirname(filename))
-        with open(filename+suffix+'.txt','w') as f:
-            allRows = [binRows,observations,binsForRates,processNames,processNumbers,rates]+systRows
-            lineWidth = 80
-            firstWidth = max([len(x[0]) for x in allRows])
-            restWidth = max([max([len(y) for y in x[1:]]) for x in allRows])
-            def getline(row):
-                try:
-                    return '{0} {1}\n'.format(row[0][:firstWidth]+' '*max(0,firstWidth-len(row[0])), ''.join([r[:restWidth]+' '*max(0,restWidth-len(r)) for r in row[1:]]))
-                except:
-                    print row
-                    e = sys.exc_info()[0]
-                    print e
-                    raise
-
-            def getparamline(row):
-                try:
-                    return ' '.join([str(x) for x in row])+'\n'
-                except:
-                    print row
-                    e = sys.exc_info()[0]
-                    print e
-                    raise
-
+        with DatacardWriter(filename+suffix+'.txt',compact=compact) as writer:
             # header
-            f.write('imax {0} number of bins\n'.format(imax))
-            #f.write('jmax {0} number of processes\n'.format(jmax))
-            f.write('jmax * number of processes\n')
-            f.write('kmax * number of nuissances\n')
-            f.write('-'*lineWidth+'\n')
+            writer.line('imax {0} number of bins'.format(imax))
+            #writer.line('jmax {0} number of processes'.format(jmax))
+            writer.line('jmax * number of processes')
+            writer.line('kmax * number of nuissances')
+            writer.separator()
 
             # shape information
             if saveWorkspace or shapes:
                 for b in binRows[1:]:
                     procString = '$PROCESS_{0}'.format(b)
                     if saveWorkspace: procString = '{0}:{1}'.format(self.name,procString)
-                    f.write('shapes * {0} {1}.root {2} {2}_$SYSTEMATIC\n'.format(b,filename,procString))
+                    writer.line('shapes * {0} {1}.root {2} {2}_$SYSTEMATIC'.format(b,filename,procString))
                     for proc in processesOrdered:
                         key = (b,proc)
                         if key in self.shapes:
                             procString = self.shapes[key]
                             if saveWorkspace: procString = '{}:{}'.format(self.name,procString)
-                            f.write('shapes {0} {1} {2}.root {3} {3}_$SYSTEMATIC\n'.format(proc,b,filename,procString))
+                            writer.line('shapes {0} {1} {2}.root {3} {3}_$SYSTEMATIC'.format(proc,b,filename,procString))
 
             else:
-                f.write('shapes * * FAKE\n')
-            f.write('-'*lineWidth+'\n')
+                writer.line('shapes * * FAKE')
+            writer.separator()
             
             # observation
-            f.write(getline(binRows))
-            f.write(getline(observations))
-            f.write('-'*lineWidth+'\n')
+            writer.row(binRows)
+            writer.row(observations)
+            writer.separator()
 
             # process definition
             logging.debug('Bins: {0}'.format([str(x) for x in binsForRates]))
-            f.write(getline(binsForRates))
-            f.write(getline(processNames))
-            f.write(getline(processNumbers))
+            writer.row(binsForRates)
+            writer.row(processNames)
+            writer.row(processNumbers)
             logging.debug('Rates: {0}'.format([str(x) for x in rates]))
-            f.write(getline(rates))
-            f.write('-'*lineWidth+'\n')
+            writer.row(rates)
+            writer.separator()
 
             # nuissances
             for systRow in systRows:
                 logging.debug('Systematic row: {0}'.format([str(x) for x in systRow]))
-                f.write(getline(systRow))
-            f.write('-'*lineWidth+'\n')
+                writer.row(systRow)
+            writer.separator()
 
             # rateParams
             for norm in norms:
                 logging.debug('Rate param: {0}'.format([str(x) for x in norm]))
-                f.write(getparamline(norm))
+                writer.line(' '.join([str(x) for x in norm]))
 
             # other params
             for paramRow in paramRows:
                 logging.debug('Param: {}'.format([str(x) for x in paramRow]))
-                f.write(getparamline(paramRow))
+                writer.line(' '.join([str(x) for x in paramRow]))
 
             # nuissance categories
             for group in self.groups:
-                f.write('{0} group = {1}'.format(group,' '.join(self.groups[group])))
-
-        return shapes
+                writer.line('{0} group = {1}'.format(group,' '.join(self.groups[group])))
@@ -0,0 +1,139 @@
+import logging
+
+import ROOT
+from CombineLimits.Limits.ImportRegistry import wsimport
+from CombineLimits.Limits.utilities import *
+
+class ModelGraph(object):
+    '''
+    ModelGraph
+
+    A declarative graph of models. Models are added with the label they are
+    built as, but nothing is put in a workspace until build() is called with
+    the top level pdfs. The graph is then:
+        validated:    everything a model uses is declared or already in the workspace, and there are no cycles
+        de-duplicated: repeated identical declarations of a label are merged, conflicting ones are an error
+        pruned:       models the top level pdfs do not use are dropped
+    and the remaining models are made directly from their RooFit classes
+    (see Model.make) and imported in one pass, without parsing factory strings.
+    Models that cannot be made directly are built with their build method.
+    '''
+
+    def __init__(self):
+        self.models = {}
+        self.labels = [] # declaration order
+        self.duplicates = 0
+
+    def __contains__(self,label):
+        return label in self.models
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __signature(self,model):
+        return (model.__class__.__name__, sorted([(k,v) for k,v in vars(model).iteritems() if k not in ['name','params']]))
+
+    def add(self,model,label=''):
+        '''Declare a model to be built as label (default the model name) and return the label.'''
+        label = label or model.name
+        if label in self.models:
+            if self.__signature(self.models[label])!=self.__signature(model):
+                logging.error('Conflicting declarations of {}'.format(label))
+                raise ValueError('Conflicting declarations of {}'.format(label))
+            self.duplicates += 1
+            return label
+        self.models[label] = model
+        self.labels += [label]
+        return label
+
+    def __owners(self):
+        '''Map the name of every object declared in the graph to the label of the model that makes it.'''
+        owners = {}
+        for label in self.labels:
+            owners[label] = label
+            for name in self.models[label].variables(label):
+                owners.setdefault(name,label)
+        return owners
+
+    def resolve(self,tops,ws=None):
+        '''
+        Return the labels needed for the top level pdfs, dependencies first.
+        Raises ValueError for an object that is neither declared nor in ws, and for cycles.
+        '''
+        owners = self.__owners()
+        order = []
+        state = {} # 1: being visited, 2: done
+
+        def visit(name,user):
+            if name not in owners:
+                if ws and ws.arg(name): return
+                logging.error('{} uses {}, which is not declared or in the workspace'.format(user,name))
+                raise ValueError('Undeclared object {} used by {}'.format(name,user))
+            label = owners[name]
+            if state.get(label)==2: return
+            if state.get(label)==1:
+                logging.error('Cycle in model graph at {}'.format(label))
+                raise ValueError('Cycle in model graph at {}'.format(label))
+            state[label] = 1
+            for dep in self.models[label].dependencies(label):
+                visit(dep,label)
+            state[label] = 2
+            order.append(label)
+
+        for top in tops:
+            visit(top,'build')
+        return order
+
+    def __variable(self,name,r):
+        if len(r)==1:
+            var = ROOT.RooRealVar(name,name,r[0])
+        elif len(r)==2: # value in the middle of the range, as the factory does
+            var = ROOT.RooRealVar(name,name,r[0],r[1])
+        else:
+            var = ROOT.RooRealVar(name,name,*r[:3])
+        return var
+
+    def __import(self,ws,objects):
+        for obj in objects:
+            wsimport(ws,obj,ROOT.RooFit.RecycleConflictNodes())
+
+    def build(self,ws,tops):
+        '''Materialize the models used by the top level pdfs (a label or a list of labels) in the workspace.'''
+        if isinstance(tops,basestring): tops = [tops]
+        labels = self.resolve(tops,ws)
+        logging.debug('Model graph: building {} of {} models ({} duplicate declarations)'.format(len(labels),len(self.labels),self.duplicates))
+
+        made = {}      # name -> object made in this pass, not yet imported
+        variables = [] # variables made in this pass
+        pdfs = []      # labels made in this pass
+        used = set()   # labels used by other models made in this pass
+
+        def arg(name):
+            return made[name] if name in made else ws.arg(name)
+
+        for label in labels:
+            model = self.models[label]
+            if ws.arg(label):
+                # already built, e.g. a component shared with a region built before
+                model.params = model.parameters(label)
+                continue
+            for name, r in sorted(model.variables(label).iteritems()):
+                if name in made or ws.arg(name): continue
+                made[name] = self.__variable(name,r)
+                variables += [made[name]]
+            dependencies = model.dependencies(label)
+            args = dict([(name,arg(name)) for name in dependencies+model.variables(label).keys()])
+            obj = model.make(args,label)
+            if obj is None:
+                # everything made so far has to be in the workspace first
+                self.__import(ws,variables+[made[l] for l in pdfs if l not in used])
+                variables, pdfs, used, made = [], [], set(), {}
+                model.build(ws,label)
+                continue
+            made[label] = obj
+            model.params = model.parameters(label)
+            pdfs += [label]
+            used.update(dependencies)
+
+        # the variables, then each tree of new pdfs once from its top
+        self.__import(ws,variables+[made[l] for l in pdfs if l not in used])
@@ -1,12 +1,26 @@
 import logging
+import time
 
 from array import array
 
 import ROOT
 from CombineLimits.Limits.utilities import *
+from CombineLimits.Limits.PlotQueue import PlotQueue
+from CombineLimits.Limits.ImportRegistry import wsimport
+
+def _argList(objects):
+    arglist = ROOT.RooArgList()
+    for obj in objects:
+        arglist.add(obj)
+    return arglist
 
 class Model(object):
 
+    # for models made directly by make(): the RooFit class,
+    # and the (kwarg, name prefix, default) of its parameters in constructor order
+    ROOCLASS = ''
+    PARAMS = []
+
     def __init__(self,name,**kwargs):
         self.name = name
         self.x = kwargs.pop('x','x')
@@ -15,12 +29,8 @@ class Model(object):
         self.kwargs = kwargs
 
     def wsimport(self, ws, *args) :
-        # getattr since import is special in python
-        # NB RooWorkspace clones object
-        if len(args) < 2 :
-            # Useless RooCmdArg: https://sft.its.cern.ch/jira/browse/ROOT-6785
-            args += (ROOT.RooCmdArg(),)
-        return getattr(ws, 'import')(*args)
+        # repeated imports of the same object are skipped by the registry of ws
+        return wsimport(ws, *args)
 
     def update(self,**kwargs):
         '''Update the floating parameters'''
@@ -30,125 +40,210 @@ class Model(object):
         '''Dummy method to add model to workspace'''
         logging.debug('Building {}'.format(label))
 
-    def fit(self,ws,hist,name,save=False,doErrors=False,saveDir='', xFitRange=[0,30]):
-        '''Fit the model to a histogram and return the fit values'''
+    def paramSpecs(self):
+        return self.PARAMS
+
+    def parameters(self,label):
+        '''Names of the parameters of the model built as label.'''
+        names = []
+        for key, prefix, default in self.paramSpecs():
+            value = self.kwargs.get(key,default)
+            names += [value if isinstance(value,str) else '{0}_{1}'.format(prefix,label)]
+        return names
+
+    def variables(self,label):
+        '''Variables created for the model built as label, as {name: [value,min,max]}.'''
+        variables = {}
+        for (key, prefix, default), name in zip(self.paramSpecs(),self.parameters(label)):
+            value = self.kwargs.get(key,default)
+            if not isinstance(value,str): variables[name] = value
+        return variables
+
+    def dependencies(self,label):
+        '''Names of the existing objects the model built as label uses.'''
+        variables = self.variables(label)
+        return [self.x] + [name for name in self.parameters(label) if name not in variables]
+
+    def makeArgs(self,args,label):
+        return [args[self.x]] + [args[name] for name in self.parameters(label)]
+
+    def make(self,args,label):
+        '''
+        Make the pdf for label from args (name: object for the dependencies and variables)
+        without adding it to a workspace, for a ModelGraph.
+        Returns None for models that can only be built with build().
+        '''
+        if not self.ROOCLASS: return None
+        logging.debug('Making {}'.format(label))
+        return getattr(ROOT,self.ROOCLASS)(label,label,*self.makeArgs(args,label))
+
+    def fit(self,ws,hist,name,save=False,doErrors=False,saveDir='', xFitRange=[0,30], cache=None, plots=None, binThreshold=0, fitBins=1000, validationEntries=0, numCPU=1):
+        '''
+        Fit the model to a histogram and return the fit values.
+        If a FitCache is given, a previous result for the same data, model
+        and initial values is reused instead of fitting.
+        If save, the fit is plotted. If a PlotQueue is given, the plot is added
+        to it to be drawn later, otherwise it is drawn immediately.
+        If binThreshold, a RooDataSet with more events is binned in fitBins
+        bins per dimension before the fit (see binDataset).
+        With numCPU>1 the likelihood evaluation is split over numCPU processes.
+        '''
+
+        model = ws.pdf(name)
+        binData = binThreshold and isinstance(hist,ROOT.RooDataSet) and hist.numEntries()>binThreshold
+        binArgs = {'fitBins': fitBins} if binData else {}
+        key = cache.key(hist,model,observables=[self.x],model=self.__class__.__name__,kwargs=sorted(self.kwargs.items()),xFitRange=xFitRange,**binArgs) if cache else None
+        cached = cache.get(key) if cache else None
 
         if isinstance(hist,ROOT.TH1):
             dhname = 'dh_{0}'.format(name)
             hist = ROOT.RooDataHist(dhname, dhname, ROOT.RooArgList(ws.var(self.x)), hist)
         #self.build(ws,name)
-        model = ws.pdf(name)
        
-        #ws.var('x').setRange('xRange', xFitRange[0], xFitRange[1])
-        fr = model.fitTo(hist,ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True))#, ROOT.RooFit.Range('xRange'))
-        pars = fr.floatParsFinal()
-        vals = {}
-        errs = {}
-        for p in range(pars.getSize()):
-            vals[pars.at(p).GetName()] = pars.at(p).getValV()
-            errs[pars.at(p).GetName()] = pars.at(p).getError()
+        if cached:
+            vals, errs = cached
+            cache.restore(model,vals,errs)
+        else:
+            #ws.var('x').setRange('xRange', xFitRange[0], xFitRange[1])
+            data = self.binDataset(ws,hist,name,[self.x],fitBins,validationEntries) if binData else hist
+            fitArgs = [ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True)]
+            if numCPU>1: fitArgs += [ROOT.RooFit.NumCPU(numCPU)]
+            start = time.time()
+            fr = model.fitTo(data,*fitArgs)#, ROOT.RooFit.Range('xRange'))
+            self.logFit(name,fr,time.time()-start)
+            pars = fr.floatParsFinal()
+            vals = {}
+            errs = {}
+            for p in range(pars.getSize()):
+                vals[pars.at(p).GetName()] = pars.at(p).getValV()
+                errs[pars.at(p).GetName()] = pars.at(p).getError()
+            if cache: cache.put(key,(vals,errs))
 
         if save:
             if saveDir: python_mkdir(saveDir)
             savename = '{}/{}_{}'.format(saveDir,self.name,name) if saveDir else '{}_{}'.format(self.name,name)
-            x = ws.var(self.x)
-            xFrame = x.frame()
-            xFrame.SetTitle('')
-            hist.plotOn(xFrame)
-            model.plotOn(xFrame)
-            chi2Line = "Chi2: " + str(xFrame.chiSquare()) # Adding chi2 info
-            pt = ROOT.TPaveText(.72,.1,.90,.2, "brNDC") # Adding chi2 info
-            pt.AddText(chi2Line ) # Adding chi2 info
-            model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-            canvas = ROOT.TCanvas(savename,savename,800,800)
-            canvas.SetRightMargin(0.3)
-            xFrame.Draw()
-            pt.Draw()
-            prims = canvas.GetListOfPrimitives()
-            for prim in prims:
-                if 'paramBox' in prim.GetName():
-                    prim.SetTextSize(0.02)
-            canvas.Print('{0}.png'.format(savename))
+            queue = plots if plots is not None else PlotQueue()
+            queue.add(ws,name,hist,savename,dims=[self.x])
+            if plots is None: queue.render()
 
         if doErrors:
             return vals, errs
         return vals
 
-    def fit2D(self,ws,hist,name,save=False,doErrors=False,saveDir='', xFitRange=[0,30], yFitRange=[0,30], logy=False):
-        '''Fit the model to a histogram and return the fit values'''
+    def fit2D(self,ws,hist,name,save=False,doErrors=False,saveDir='', xFitRange=[0,30], yFitRange=[0,30], logy=False, cache=None, plots=None, binThreshold=0, fitBins=1000, validationEntries=0, numCPU=1):
+        '''
+        Fit the model to a histogram and return the fit values.
+        If a FitCache is given, a previous result for the same data, model
+        and initial values is reused instead of fitting.
+        If save, the fit is plotted. If a PlotQueue is given, the plot is added
+        to it to be drawn later, otherwise it is drawn immediately.
+        If binThreshold, a RooDataSet with more events is binned in fitBins
+        bins per dimension before the fit (see binDataset).
+        With numCPU>1 the likelihood evaluation is split over numCPU processes.
+        '''
+
+        model = ws.pdf(name)
+        binData = binThreshold and isinstance(hist,ROOT.RooDataSet) and hist.numEntries()>binThreshold
+        binArgs = {'fitBins': fitBins} if binData else {}
+        key = cache.key(hist,model,observables=[self.x,self.y],model=self.__class__.__name__,kwargs=sorted(self.kwargs.items()),xFitRange=xFitRange,yFitRange=yFitRange,**binArgs) if cache else None
+        cached = cache.get(key) if cache else None
 
         if isinstance(hist,ROOT.TH1):
             dhname = 'dh_{0}'.format(name)
             hist = ROOT.RooDataHist(dhname, dhname, ROOT.RooArgList(ws.var(self.x),ws.var(self.y)), hist)
         #self.build(ws,name)
-        model = ws.pdf(name)
-        #ws.var('x').setRange('xRange', xFitRange[0], xFitRange[1])
-        #ws.var('y').setRange('yRange', yFitRange[0], yFitRange[1])
-        #print ("X_FIT_RANGE=", xFitRange, "\tY_FIT_RANGE=", yFitRange)
-        fr = model.fitTo(hist,ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True))#, ROOT.RooFit.Range('yRange'), ROOT.RooFit.Range('xRange') )
-        pars = fr.floatParsFinal()
-        vals = {}
-        errs = {}
-        for p in range(pars.getSize()):
-            vals[pars.at(p).GetName()] = pars.at(p).getValV()
-            errs[pars.at(p).GetName()] = pars.at(p).getError()
+        if cached:
+            vals, errs = cached
+            cache.restore(model,vals,errs)
+        else:
+            #ws.var('x').setRange('xRange', xFitRange[0], xFitRange[1])
+            #ws.var('y').setRange('yRange', yFitRange[0], yFitRange[1])
+            #print ("X_FIT_RANGE=", xFitRange, "\tY_FIT_RANGE=", yFitRange)
+            data = self.binDataset(ws,hist,name,[self.x,self.y],fitBins,validationEntries) if binData else hist
+            fitArgs = [ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True)]
+            if numCPU>1: fitArgs += [ROOT.RooFit.NumCPU(numCPU)]
+            start = time.time()
+            fr = model.fitTo(data,*fitArgs)#, ROOT.RooFit.Range('yRange'), ROOT.RooFit.Range('xRange') )
+            self.logFit(name,fr,time.time()-start)
+            pars = fr.floatParsFinal()
+            vals = {}
+            errs = {}
+            for p in range(pars.getSize()):
+                vals[pars.at(p).GetName()] = pars.at(p).getValV()
+                errs[pars.at(p).GetName()] = pars.at(p).getError()
+            if cache: cache.put(key,(vals,errs))
 
         if save:
             if saveDir: python_mkdir(saveDir)
             savename = '{}/{}_{}'.format(saveDir,self.name,name) if saveDir else '{}_{}'.format(self.name,name)
-            x = ws.var(self.x)
-            xFrame = x.frame()
-            xFrame.SetTitle('')
-            hist.plotOn(xFrame)
-            model.plotOn(xFrame)
-            chi2Linex = "Chi2: " +  str(xFrame.chiSquare()) # Adding chi2 info
-            ptx = ROOT.TPaveText(.72,.1,.90,.2, "brNDC") # Adding chi2 info
-            ptx.AddText(chi2Linex) # Adding chi2 info
-            model.paramOn(xFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-            canvas = ROOT.TCanvas(savename,savename,800,800)
-            canvas.SetRightMargin(0.3)
-            xFrame.Draw()
-            ptx.Draw()
-            prims = canvas.GetListOfPrimitives()
-            for prim in prims:
-                if 'paramBox' in prim.GetName():
-                    prim.SetTextSize(0.02)
-            canvas.Print('{0}_xproj.png'.format(savename))
-
-            y = ws.var(self.y)
-            yFrame = y.frame()
-            yFrame.SetTitle('')
-            hist.plotOn(yFrame)
-            model.plotOn(yFrame)
-            chi2Liney = "Chi2: " + str(yFrame.chiSquare()) # Adding chi2 info
-            pty = ROOT.TPaveText(.72,.1,.90,.2, "brNDC") # Adding chi2 info            
-            pty.AddText(chi2Liney ) # Adding chi2 info
-            model.paramOn(yFrame,ROOT.RooFit.Layout(0.72,0.98,0.90))
-            if logy: canvas.SetLogy()
-            yFrame.Draw()
-            pty.Draw()
-            prims = canvas.GetListOfPrimitives()
-            for prim in prims:
-                if 'paramBox' in prim.GetName():
-                    prim.SetTextSize(0.02)
-            canvas.Print('{0}_yproj.png'.format(savename))
-
-            histM = model.createHistogram('x,y',100,100)
-            histM.SetLineColor(ROOT.kBlue)
-            histM.Draw('surf')
-            canvas.Print('{0}_model.png'.format(savename))
-
-            if isinstance(hist,ROOT.RooDataSet):
-                histD = hist.createHistogram(x,y,20,20,'1','{}_hist'.format(savename))
-                histD.SetLineColor(ROOT.kBlack)
-                histD.Draw('surf')
-                canvas.Print('{0}_dataset.png'.format(savename))
-
+            queue = plots if plots is not None else PlotQueue()
+            queue.add(ws,name,hist,savename,dims=[self.x,self.y],logy=logy)
+            if plots is None: queue.render()
 
         if doErrors:
             return vals, errs
         return vals
 
+    def logFit(self,name,fr,elapsed):
+        '''Log and store in fitStats the status, edm, number of function calls and wall time of a fit.'''
+        # the call count is only available from the (default) TMinuit minimizer
+        calls = ROOT.gMinuit.fNfcn if ROOT.gMinuit else -1
+        self.fitStats = getattr(self,'fitStats',{})
+        self.fitStats[name] = {'status': fr.status(), 'edm': fr.edm(), 'calls': calls, 'time': elapsed}
+        logging.info('Fit {}: status {}, edm {:.3g}, {} calls, {:.2f} s'.format(name,fr.status(),fr.edm(),calls,elapsed))
+
+    def binDataset(self,ws,data,name,dims,fitBins=1000,validationEntries=0):
+        '''
+        Bin a large dataset before the fit, so that the likelihood is evaluated
+        per bin instead of per event. fitBins is the number of bins in each of
+        the dims, or a list with one entry per dimension.
+        If validationEntries, the bias introduced by the binning is reported by
+        fitting the first validationEntries events both unbinned and binned.
+        '''
+        if not isinstance(fitBins,list): fitBins = [fitBins]*len(dims)
+        variables = [ws.var(d) for d in dims]
+        oldBins = [v.getBins() for v in variables]
+        for v,b in zip(variables,fitBins): v.setBins(b)
+        argset = ROOT.RooArgSet(*variables)
+        dhname = 'dh_{}_binned'.format(name)
+        binned = ROOT.RooDataHist(dhname, dhname, argset, data)
+        logging.info('Binned {} events of {} into {} bins for the fit'.format(data.numEntries(),name,binned.numEntries()))
+        if validationEntries:
+            self.binningBias = getattr(self,'binningBias',{})
+            self.binningBias[name] = self.__binningBias(ws.pdf(name),data,argset,name,validationEntries)
+        for v,b in zip(variables,oldBins): v.setBins(b)
+        return binned
+
+    def __binningBias(self,model,data,argset,name,validationEntries):
+        '''Fit a subset unbinned and binned from the same initial values and return the shift of each parameter in units of its unbinned error.'''
+        subset = data.reduce(ROOT.RooFit.EventRange(0,validationEntries))
+        dhname = 'dh_{}_validation'.format(name)
+        binnedSubset = ROOT.RooDataHist(dhname, dhname, argset, subset)
+        params = model.getParameters(data)
+        initial = {}
+        for p in params.contentsString().split(','):
+            var = params.find(p)
+            if isinstance(var,ROOT.RooRealVar) and not var.isConstant(): initial[p] = (var.getVal(),var.getError())
+        results = []
+        for d in [subset,binnedSubset]:
+            for p,(val,err) in initial.iteritems():
+                params.find(p).setVal(val)
+                params.find(p).setError(err)
+            fr = model.fitTo(d,ROOT.RooFit.Save(),ROOT.RooFit.SumW2Error(True))
+            pars = fr.floatParsFinal()
+            results += [dict([(pars.at(p).GetName(),(pars.at(p).getValV(),pars.at(p).getError())) for p in range(pars.getSize())])]
+        for p,(val,err) in initial.iteritems():
+            params.find(p).setVal(val)
+            params.find(p).setError(err)
+
+        unbinned, binned = results
+        bias = {}
+        for p in sorted(unbinned):
+            val, err = unbinned[p]
+            bias[p] = (binned[p][0]-val)/err if err else 0.
+            logging.info('Binning bias {} {}: unbinned {:.6g} +/- {:.3g}, binned {:.6g} ({:+.3f} sigma)'.format(name,p,val,err,binned[p][0],bias[p]))
+        return bias
+
     def setIntegral(self,integral):
         self.integral = integral
 
@@ -162,10 +257,34 @@ class Model(object):
 
 class ModelSpline(Model):
 
+    # build the shape parameters as the outputs of one MultiSpline1D instead of one RooSpline1D each
+    MULTISPLINE = True
+
     def __init__(self,name,**kwargs):
         self.MH = kwargs.pop('MH','MH')
         super(ModelSpline,self).__init__(name,**kwargs)
 
+    def buildSplines(self,ws,label,names,values):
+        '''
+        Add splines in MH of the parameters names, with values at the masses, to the workspace.
+        With MULTISPLINE they share a single MultiSpline1D, so the knot search
+        is done once per MH value for all of them.
+        '''
+        masses = self.kwargs.get('masses', [])
+        for name, vals in zip(names,values):
+            if len(vals)!=len(masses):
+                logging.error('{} has {} values for {} masses'.format(name,len(vals),len(masses)))
+                raise ValueError('Spline {} does not match the masses'.format(name))
+        if self.MULTISPLINE:
+            splineName = 'splines_{0}'.format(label)
+            spline = ROOT.MultiSpline1D(splineName, splineName, ws.var('MH'), len(masses), len(names), array('d',masses), array('d',[v for vals in values for v in vals]))
+            splines = [ROOT.MultiSpline1DOutput(name, name, spline, i) for i, name in enumerate(names)]
+        else:
+            splines = [ROOT.RooSpline1D(name, name, ws.var('MH'), len(masses), array('d',masses), array('d',vals)) for name, vals in zip(names,values)]
+        # import
+        for spline in splines:
+            wsimport(ws, spline, ROOT.RooFit.RecycleConflictNodes())
+
     def setIntegral(self,masses,integrals):
         self.masses = masses
         self.integrals = integrals
@@ -178,7 +297,7 @@ class ModelSpline(Model):
         if not hasattr(self,'integrals'): return 
         integralSpline  = ROOT.RooSpline1D(label,  label,  ws.var(self.MH), len(self.masses), array('d',self.masses), array('d',self.integrals))
         # import to workspace
-        getattr(ws, "import")(integralSpline, ROOT.RooFit.RecycleConflictNodes())
+        wsimport(ws, integralSpline, ROOT.RooFit.RecycleConflictNodes())
 
 class Param(object):
 
@@ -192,18 +311,17 @@ class Param(object):
         value = self.kwargs.get('value', 0)
         shifts = self.kwargs.get('shifts', {})
         uncertainty = self.kwargs.get('uncertainty',0.00)
-        args = ROOT.TList()
-        shiftFormula = '{}'.format(value)
+        nuisances, ups, downs = [], [], []
         for shift in shifts:
             up = shifts[shift]['up'] - value
             down = value - shifts[shift]['down']
             if abs(up/value)>uncertainty or abs(down/value)>uncertainty:
                 ws.factory('{}[0,-10,10]'.format(shift))
-                shiftFormula += ' + TMath::Max(0,@{shift})*{up} + TMath::Min(0,@{shift})*{down}'.format(shift=len(args),up=up,down=down)
-                args.Add(ws.var(shift))
-        arglist = ROOT.RooArgList(args)
-        param = ROOT.RooFormulaVar(paramName, paramName, shiftFormula, arglist)
-        getattr(ws, "import")(param, ROOT.RooFit.RecycleConflictNodes())
+                nuisances += [ws.var(shift)]
+                ups += [up]
+                downs += [down]
+        param = ROOT.AsymLinearMorph(paramName, paramName, value, _argList(nuisances), array('d',ups), array('d',downs))
+        wsimport(ws, param, ROOT.RooFit.RecycleConflictNodes())
 
 class Spline(object):
 
@@ -212,6 +330,14 @@ class Spline(object):
         self.mh = kwargs.pop('MH','MH')
         self.kwargs = kwargs
 
+    def __spline(self,ws,name,values,built):
+        '''A RooSpline1D of values in MH, reusing an identical one already made for this parameter.'''
+        key = tuple(values)
+        if key not in built:
+            masses = self.kwargs.get('masses', [])
+            built[key] = ROOT.RooSpline1D(name, name, ws.var(self.mh), len(masses), array('d',masses), array('d',values))
+        return built[key]
+
     def build(self,ws,label):
         logging.debug('Building {}'.format(label))
         masses = self.kwargs.get('masses', [])
@@ -220,11 +346,10 @@ class Spline(object):
         uncertainty = self.kwargs.get('uncertainty',0.00)
         splineName = label
         if shifts:
-            args = ROOT.TList()
+            built = {}
             centralName = '{0}_central'.format(label)
-            splineCentral = ROOT.RooSpline1D(centralName,  centralName,  ws.var(self.mh), len(masses), array('d',masses), array('d',values))
-            shiftFormula = '@0'
-            args.Add(splineCentral)
+            splineCentral = self.__spline(ws,centralName,values,built)
+            nuisances, ups, downs = [], [], []
             for shift in shifts:
                 up = [u-c for u,c in zip(shifts[shift]['up'],values)]
                 down = [c-d for d,c in zip(shifts[shift]['down'],values)]
@@ -234,17 +359,14 @@ class Spline(object):
                     logging.warning('Zero value for {}: {}'.format(splineName, ' '.join(['{}'.format(v) for v in values])))
                 if any([abs(u/v)>uncertainty if v else u for u,v in zip(up,values)]) or any([abs(d/v)>uncertainty if v else d for d,v in zip(down,values)]):
                     ws.factory('{}[0,-10,10]'.format(shift))
-                    splineUp   = ROOT.RooSpline1D(upName,  upName,  ws.var(self.mh), len(masses), array('d',masses), array('d',up))
-                    splineDown = ROOT.RooSpline1D(downName,downName,ws.var(self.mh), len(masses), array('d',masses), array('d',down))
-                    shiftFormula += ' + TMath::Max(0,@{shift})*@{up} + TMath::Min(0,@{shift})*@{down}'.format(shift=len(args),up=len(args)+1,down=len(args)+2)
-                    args.Add(ws.var(shift))
-                    args.Add(splineUp)
-                    args.Add(splineDown)
-            arglist = ROOT.RooArgList(args)
-            spline = ROOT.RooFormulaVar(splineName, splineName, shiftFormula, arglist)
+                    nuisances += [ws.var(shift)]
+                    # symmetric shifts share one spline for both sides
+                    ups += [self.__spline(ws,upName,up,built)]
+                    downs += [self.__spline(ws,downName,down,built)]
+            spline = ROOT.ShiftMorph(splineName, splineName, splineCentral, _argList(nuisances), _argList(ups), _argList(downs))
         else:
             spline = ROOT.RooSpline1D(splineName,  splineName,  ws.var(self.mh), len(masses), array('d',masses), array('d',values))
-        getattr(ws, "import")(spline, ROOT.RooFit.RecycleConflictNodes())
+        wsimport(ws, spline, ROOT.RooFit.RecycleConflictNodes())
 
 class Polynomial(Model):
 
@@ -278,7 +400,7 @@ class PolynomialSpline(ModelSpline):
             ps = self.kwargs.get('p{}'.format(o), [])
             paramName = 'p{}_{}'.format(o,label)
             paramSplines[o] = ROOT.RooSpline1D(paramName, paramName, ws.var('MH'), len(masses), array('d',masses), array('d',ps))
-            getattr(ws, "import")(paramSplines[o], ROOT.RooFit.RecycleConflictNodes())
+            wsimport(ws, paramSplines[o], ROOT.RooFit.RecycleConflictNodes())
             params += [paramName]
         ws.factory('Polynomial::{}({}, {{ {} }})'.format(label, self.x, ', '.join(['{}[0, -10, 10]'.format(p) for p in params])))
         self.params = params
@@ -296,6 +418,13 @@ class Chebychev(Model):
         ws.factory('Chebychev::{}({}, {{ {} }})'.format(label, self.x, ', '.join(['{}[{}]'.format(p,','.join([str(r) for r in rs])) for p,rs in zip(params,ranges)])))
         self.params = params
 
+    def paramSpecs(self):
+        return [('p{}'.format(o),'p{}'.format(o),[0,-1,1]) for o in range(self.kwargs.get('order',1))]
+
+    def make(self,args,label):
+        logging.debug('Making {}'.format(label))
+        return ROOT.RooChebychev(label,label,args[self.x],_argList([args[name] for name in self.parameters(label)]))
+
 class ChebychevSpline(ModelSpline):
 
     def __init__(self,name,**kwargs):
@@ -304,20 +433,19 @@ class ChebychevSpline(ModelSpline):
     def build(self,ws,label):
         logging.debug('Building {}'.format(label))
         order = self.kwargs.get('order',1)
-        masses = self.kwargs.get('masses',[])
-        paramSplines = {}
-        params = []
-        for o in range(order):
-            ps = self.kwargs.get('p{}'.format(o), [])
-            paramName = 'p{}_{}'.format(o,label)
-            paramSplines[o] = ROOT.RooSpline1D(paramName, paramName, ws.var('MH'), len(masses), array('d',masses), array('d',ps))
-            getattr(ws, "import")(paramSplines[o], ROOT.RooFit.RecycleConflictNodes())
-            params += [paramName]
+        params = ['p{}_{}'.format(o,label) for o in range(order)]
+        self.buildSplines(ws,label,params,[self.kwargs.get('p{}'.format(o), []) for o in range(order)])
         ws.factory('Chebychev::{}({}, {{ {} }})'.format(label, self.x, ', '.join(['{}[0, -10, 10]'.format(p) for p in params])))
         self.params = params
 
 class Gaussian(Model):
 
+    ROOCLASS = 'RooGaussian'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('sigma', 'sigma', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(Gaussian,self).__init__(name,**kwargs)
 
@@ -347,17 +475,19 @@ class GaussianSpline(ModelSpline):
         meanName  = 'mean_{0}'.format(label)
         sigmaName = 'sigma_{0}'.format(label)
         # splines
-        meanSpline  = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        sigmaSpline = ROOT.RooSpline1D(sigmaName, sigmaName, ws.var('MH'), len(masses), array('d',masses), array('d',sigmas))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigmaSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[meanName,sigmaName],[means,sigmas])
         # build model
         ws.factory("Gaussian::{0}({1}, {2}, {3})".format(label,self.x,meanName,sigmaName))
         self.params = [meanName,sigmaName]
 
 class BreitWigner(Model):
 
+    ROOCLASS = 'RooBreitWigner'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('width', 'width', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(BreitWigner,self).__init__(name,**kwargs)
 
@@ -387,17 +517,20 @@ class BreitWignerSpline(ModelSpline):
         meanName  = 'mean_{0}'.format(label)
         widthName = 'width_{0}'.format(label)
         # splines
-        meanSpline  = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        widthSpline = ROOT.RooSpline1D(widthName, widthName, ws.var('MH'), len(masses), array('d',masses), array('d',widths))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(widthSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[meanName,widthName],[means,widths])
         # build model
         ws.factory("BreitWigner::{0}({1}, {2}, {3})".format(label,self.x,meanName,widthName))
         self.params = [meanName,widthName]
 
 class Voigtian(Model):
 
+    ROOCLASS = 'RooVoigtian'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('width', 'width', [1,0,100]),
+        ('sigma', 'sigma', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(Voigtian,self).__init__(name,**kwargs)
 
@@ -432,19 +565,21 @@ class VoigtianSpline(ModelSpline):
         widthName = 'width_{0}'.format(label)
         sigmaName = 'sigma_{0}'.format(label)
         # splines
-        meanSpline  = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        widthSpline = ROOT.RooSpline1D(widthName, widthName, ws.var('MH'), len(masses), array('d',masses), array('d',widths))
-        sigmaSpline = ROOT.RooSpline1D(sigmaName, sigmaName, ws.var('MH'), len(masses), array('d',masses), array('d',sigmas))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(widthSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigmaSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[meanName,widthName,sigmaName],[means,widths,sigmas])
         # build model
         ws.factory("Voigtian::{0}({1}, {2}, {3}, {4})".format(label,self.x,meanName,widthName,sigmaName))
         self.params = [meanName,widthName,sigmaName]
 
 class CrystalBall(Model):
 
+    ROOCLASS = 'RooCBShape'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('sigma', 'sigma', [1,0,100]),
+        ('a', 'a', [1,0,100]),
+        ('n', 'n', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(CrystalBall,self).__init__(name,**kwargs)
 
@@ -485,21 +620,23 @@ class CrystalBallSpline(ModelSpline):
         aName     = 'a_{0}'.format(label)
         nName     = 'n_{0}'.format(label)
         # splines
-        meanSpline  = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        sigmaSpline = ROOT.RooSpline1D(sigmaName, sigmaName, ws.var('MH'), len(masses), array('d',masses), array('d',sigmas))
-        aSpline =     ROOT.RooSpline1D(aName, aName, ws.var('MH'), len(masses), array('d',masses), array('d',a_s))
-        nSpline =     ROOT.RooSpline1D(nName, nName, ws.var('MH'), len(masses), array('d',masses), array('d',n_s))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigmaSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(aSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(nSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[meanName,sigmaName,aName,nName],[means,sigmas,a_s,n_s])
         # build model
         ws.factory("RooCBShape::{0}({1}, {2}, {3}, {4}, {5})".format(label,self.x,meanName,sigmaName,aName,nName))
         self.params = [meanName,sigmaName,aName,nName]
 
 class DoubleCrystalBall(Model):
 
+    ROOCLASS = 'DoubleCrystalBall'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('sigma', 'sigma', [1,0,100]),
+        ('a1', 'a1', [1,0,100]),
+        ('n1', 'n1', [1,0,100]),
+        ('a2', 'a2', [1,0,100]),
+        ('n2', 'n2', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(DoubleCrystalBall,self).__init__(name,**kwargs)
         
@@ -553,20 +690,7 @@ class DoubleCrystalBallSpline(ModelSpline):
         a2Name    = 'a2_{0}'.format(label)
         n2Name    = 'n2_{0}'.format(label)
         # splines
-        meanSpline  = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        sigmaSpline = ROOT.RooSpline1D(sigmaName, sigmaName, ws.var('MH'), len(masses), array('d',masses), array('d',sigmas))
-        a1Spline    = ROOT.RooSpline1D(a1Name, a1Name, ws.var('MH'), len(masses), array('d',masses), array('d',a1s))
-        n1Spline    = ROOT.RooSpline1D(n1Name, n1Name, ws.var('MH'), len(masses), array('d',masses), array('d',n1s))
-        a2Spline    = ROOT.RooSpline1D(a2Name, a2Name, ws.var('MH'), len(masses), array('d',masses), array('d',a2s))
-        n2Spline    = ROOT.RooSpline1D(n2Name, n2Name, ws.var('MH'), len(masses), array('d',masses), array('d',n2s))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigmaSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(a1Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(n1Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(a2Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(n2Spline, ROOT.RooFit.RecycleConflictNodes())
-
+        self.buildSplines(ws,label,[meanName,sigmaName,a1Name,n1Name,a2Name,n2Name],[means,sigmas,a1s,n1s,a2s,n2s])
         # build model
         doubleCB = ROOT.DoubleCrystalBall(label, label, ws.arg(self.x), ws.arg(meanName), ws.arg(sigmaName), 
                    ws.arg(a1Name), ws.arg(n1Name), ws.arg(a2Name), ws.arg(n2Name) )
@@ -575,6 +699,11 @@ class DoubleCrystalBallSpline(ModelSpline):
 
 class PowerLaw(Model):
 
+    ROOCLASS = 'PowerLaw'
+    PARAMS = [
+        ('c', 'c', [0.5,0,1]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(PowerLaw,self).__init__(name,**kwargs)
 
@@ -590,6 +719,13 @@ class PowerLaw(Model):
 
 class DoubleSidedGaussian(Model):
 
+    ROOCLASS = 'DoubleSidedGaussian'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('sigma1', 'sigma1', [1,0,100]),
+        ('sigma2', 'sigma2', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(DoubleSidedGaussian,self).__init__(name,**kwargs)
         
@@ -613,6 +749,10 @@ class DoubleSidedGaussian(Model):
         self.wsimport(ws, doubleG)
         self.params = [meanName,sigma1Name,sigma2Name]
 
+    def make(self,args,label):
+        logging.debug('Making {}'.format(label))
+        return ROOT.DoubleSidedGaussian(label,label,*self.makeArgs(args,label)+[self.kwargs.get('yMax',9999999)])
+
 class DoubleSidedGaussianSpline(ModelSpline):
 
     def __init__(self,name,**kwargs):
@@ -629,14 +769,7 @@ class DoubleSidedGaussianSpline(ModelSpline):
         sigma1Name = 'sigma1_{0}'.format(label)
         sigma2Name = 'sigma2_{0}'.format(label)
         # splines
-        meanSpline   = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        sigma1Spline = ROOT.RooSpline1D(sigma1Name, sigma1Name, ws.var('MH'), len(masses), array('d',masses), array('d',sigma1s))
-        sigma2Spline = ROOT.RooSpline1D(sigma2Name, sigma2Name, ws.var('MH'), len(masses), array('d',masses), array('d',sigma2s))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigma1Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigma2Spline, ROOT.RooFit.RecycleConflictNodes())
-
+        self.buildSplines(ws,label,[meanName,sigma1Name,sigma2Name],[means,sigma1s,sigma2s])
         # build model
         doubleG = ROOT.DoubleSidedGaussian(label, label, ws.arg(self.x), ws.arg(meanName), ws.arg(sigma1Name), ws.arg(sigma2Name), yMax )
         self.wsimport(ws, doubleG)
@@ -644,6 +777,15 @@ class DoubleSidedGaussianSpline(ModelSpline):
 
 class DoubleSidedVoigtian(Model):
 
+    ROOCLASS = 'DoubleSidedVoigtian'
+    PARAMS = [
+        ('mean', 'mean', [1,0,1000]),
+        ('sigma1', 'sigma1', [1,0,100]),
+        ('sigma2', 'sigma2', [1,0,100]),
+        ('width1', 'width1', [1,0,100]),
+        ('width2', 'width2', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(DoubleSidedVoigtian,self).__init__(name,**kwargs)
         
@@ -673,6 +815,10 @@ class DoubleSidedVoigtian(Model):
         self.wsimport(ws, doubleV)
         self.params = [meanName,sigma1Name,sigma2Name,width1Name,width2Name]
 
+    def make(self,args,label):
+        logging.debug('Making {}'.format(label))
+        return ROOT.DoubleSidedVoigtian(label,label,*self.makeArgs(args,label)+[self.kwargs.get('yMax')])
+
 class DoubleSidedVoigtianSpline(ModelSpline):
 
     def __init__(self,name,**kwargs):
@@ -693,18 +839,7 @@ class DoubleSidedVoigtianSpline(ModelSpline):
         width1Name = 'width1_{0}'.format(label)
         width2Name = 'width2_{0}'.format(label)
         # splines
-        meanSpline   = ROOT.RooSpline1D(meanName,  meanName,  ws.var('MH'), len(masses), array('d',masses), array('d',means))
-        sigma1Spline = ROOT.RooSpline1D(sigma1Name, sigma1Name, ws.var('MH'), len(masses), array('d',masses), array('d',sigma1s))
-        sigma2Spline = ROOT.RooSpline1D(sigma2Name, sigma2Name, ws.var('MH'), len(masses), array('d',masses), array('d',sigma2s))
-        width1Spline = ROOT.RooSpline1D(width1Name, width1Name, ws.var('MH'), len(masses), array('d',masses), array('d',width1s))
-        width2Spline = ROOT.RooSpline1D(width2Name, width2Name, ws.var('MH'), len(masses), array('d',masses), array('d',width2s))
-        # import
-        getattr(ws, "import")(meanSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigma1Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigma2Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(width1Spline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(width2Spline, ROOT.RooFit.RecycleConflictNodes())
-
+        self.buildSplines(ws,label,[meanName,sigma1Name,sigma2Name,width1Name,width2Name],[means,sigma1s,sigma2s,width1s,width2s])
         # build model
         doubleV = ROOT.DoubleSidedVoigtian(label, label, ws.arg(self.x), ws.arg(meanName), ws.arg(sigma1Name), ws.arg(sigma2Name), ws.arg(width1Name), ws.arg(width2Name), yMax )
         self.wsimport(ws, doubleV)
@@ -712,6 +847,11 @@ class DoubleSidedVoigtianSpline(ModelSpline):
 
 class Exponential(Model):
 
+    ROOCLASS = 'RooExponential'
+    PARAMS = [
+        ('lamb', 'lambda', [-1,-5,0]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(Exponential,self).__init__(name,**kwargs)
 
@@ -763,6 +903,11 @@ class PolynomialExpr(Model):
 
 class Erf(Model):
 
+    PARAMS = [
+        ('erfScale', 'erfScale', [1,0,10]),
+        ('erfShift', 'erfShift', [0,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(Erf,self).__init__(name,**kwargs)
 
@@ -781,6 +926,10 @@ class Erf(Model):
         )
         self.params = [erfScaleName,erfShiftName]
 
+    def make(self,args,label):
+        logging.debug('Making {}'.format(label))
+        return ROOT.RooGenericPdf(label,label,'0.5*(TMath::Erf(@1*(@0-@2))+1)',_argList(self.makeArgs(args,label)))
+
 class ErfSpline(ModelSpline):
         
     def __init__(self,name,**kwargs):
@@ -794,11 +943,7 @@ class ErfSpline(ModelSpline):
         erfScaleName = 'erfScale_{0}'.format(label)
         erfShiftName = 'erfShift_{0}'.format(label)
         # splines  
-        erfScaleSpline = ROOT.RooSpline1D(erfScaleName,  erfScaleName,  ws.var('MH'), len(masses), array('d',masses), array('d',erfScales))
-        erfShiftSpline = ROOT.RooSpline1D(erfShiftName, erfShiftName, ws.var('MH'), len(masses), array('d',masses), array('d',erfShifts))
-        # import
-        getattr(ws, "import")(erfScaleSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(erfShiftSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[erfScaleName,erfShiftName],[erfScales,erfShifts])
         # build model
         ws.factory("EXPR::{0}('0.5*(TMath::Erf({2}*({1}-{3}))+1)', {1}, {2}, {3})".format(
                    label,self.x,erfScaleName,erfShiftName)
@@ -807,6 +952,12 @@ class ErfSpline(ModelSpline):
 
 class Landau(Model):
 
+    ROOCLASS = 'RooLandau'
+    PARAMS = [
+        ('mu', 'mu', [1,0,10]),
+        ('sigma', 'sigma', [1,0,100]),
+    ]
+
     def __init__(self,name,**kwargs):
         super(Landau,self).__init__(name,**kwargs)
 
@@ -838,11 +989,7 @@ class LandauSpline(ModelSpline):
         muName    = 'mu_{0}'.format(label)
         sigmaName = 'sigma_{0}'.format(label)
         # splines  
-        muSpline    = ROOT.RooSpline1D(muName,    muName,    ws.var('MH'), len(masses), array('d',masses), array('d',mus))
-        sigmaSpline = ROOT.RooSpline1D(sigmaName, sigmaName, ws.var('MH'), len(masses), array('d',masses), array('d',sigmas))
-        # import
-        getattr(ws, "import")(muSpline, ROOT.RooFit.RecycleConflictNodes())
-        getattr(ws, "import")(sigmaSpline, ROOT.RooFit.RecycleConflictNodes())
+        self.buildSplines(ws,label,[muName,sigmaName],[mus,sigmas])
         # build model
         ws.factory("RooLandau::{0}({1}, {2}, {3})".format(
                    label,self.x,muName,sigmaName)
@@ -888,6 +1035,33 @@ class Sum(Model):
             ws.factory("SUM::{0}({1})".format(label, ', '.join(sumargs)))
         self.params = ['{}_frac'.format(pdf) for pdf in pdfs]
 
+    def parameters(self,label):
+        return ['{}_frac'.format(pdf) for pdf in sorted(self.kwargs)]
+
+    def variables(self,label):
+        return dict([('{}_frac'.format(pdf),r) for pdf, r in self.kwargs.iteritems() if len(r) in [2,3]])
+
+    def dependencies(self,label):
+        return sorted(self.kwargs)
+
+    def make(self,args,label):
+        logging.debug('Making {}'.format(label))
+        pdfs = sorted(self.kwargs)
+        sumpdfs = [pdf for pdf in pdfs if len(self.kwargs[pdf]) in [2,3]]
+        if self.doRecursive:
+            coefs = pdfs[:-1]
+        elif self.doExtended:
+            coefs = pdfs
+        else:
+            if len(sumpdfs)>1: logging.warning('This sum is not guaranteed to be positive because there are more than two arguments. Better to use the option recursive=True.')
+            pdfs = sumpdfs
+            coefs = sumpdfs[:-1]
+        return ROOT.RooAddPdf(label,label,
+            _argList([args[pdf] for pdf in pdfs]),
+            _argList([args['{}_frac'.format(pdf)] for pdf in coefs]),
+            self.doRecursive,
+        )
+
 class Prod(Model):
 
     def __init__(self,name,*args,**kwargs):
@@ -899,6 +1073,15 @@ class Prod(Model):
         ws.factory("PROD::{0}({1})".format(label, ', '.join(self.args)))
         self.params = []
 
+    def dependencies(self,label):
+        return [arg.split('|')[0].strip() for arg in self.args]
+
+    def make(self,args,label):
+        # conditional products are left to the factory
+        if any(['|' in arg for arg in self.args]): return None
+        logging.debug('Making {}'.format(label))
+        return ROOT.RooProdPdf(label,label,_argList([args[arg] for arg in self.args]))
+
 class ProdSpline(ModelSpline):
 
     def __init__(self,name,*args,**kwargs):
@@ -0,0 +1,419 @@
+'''
+NumPy versions of the Models shapes.
+
+The shape functions follow the evaluate methods of the RooFit classes the
+Models build (the RooFit built-ins and the classes in Limits/src) and are
+vectorized over their arguments, so the observables and the parameters can
+be arrays that broadcast together.
+The Evaluator evaluates Models objects from fitted parameter values without
+building a workspace. It does not import ROOT.
+'''
+import logging
+import math
+
+import numpy as np
+
+###################
+### Shape tools ###
+###################
+
+# Weideman's rational approximation of the Faddeeva function w(z) in the upper half plane
+FADDEEVAN = 32
+def _faddeevaCoefficients(N):
+    M = 2*N
+    k = np.arange(-M+1,M)
+    L = math.sqrt(N/math.sqrt(2))
+    t = L*np.tan(k*np.pi/M/2)
+    f = np.append(0,np.exp(-t**2)*(L**2+t**2))
+    a = np.real(np.fft.fft(np.fft.fftshift(f)))/(2*M)
+    return L, a[1:N+1][::-1]
+_FADDEEVAL, _FADDEEVACOEFS = _faddeevaCoefficients(FADDEEVAN)
+
+def faddeeva(z):
+    '''The Faddeeva function w(z) = exp(-z^2) erfc(-iz) for Im(z)>=0.'''
+    z = np.asarray(z,dtype=complex)
+    L = _FADDEEVAL
+    d = L-1j*z
+    p = np.polyval(_FADDEEVACOEFS,(L+1j*z)/d)
+    return 2*p/d**2 + 1/math.sqrt(math.pi)/d
+
+_erf = np.vectorize(math.erf,otypes=[float])
+
+def spline(masses,values,mh,d2=None):
+    '''
+    The natural cubic spline through (masses,values) at mh, as MultiSpline1D:
+    outside the knots the end polynomials are extended.
+    d2 are the second derivatives at the knots from splineDerivatives, computed if not given.
+    '''
+    xs = np.asarray(masses,dtype=float)
+    ys = np.asarray(values,dtype=float)
+    mh = np.asarray(mh,dtype=float)
+    if len(xs)<2: return np.full(mh.shape,ys[0] if len(xs) else 0.)
+    if d2 is None: d2 = splineDerivatives(xs,ys)
+    k = np.clip(np.searchsorted(xs,mh,side='right')-1,0,len(xs)-2)
+    h = xs[k+1]-xs[k]
+    a = (xs[k+1]-mh)/h
+    b = (mh-xs[k])/h
+    return a*ys[k] + b*ys[k+1] + ((a**3-a)*d2[k] + (b**3-b)*d2[k+1])*h**2/6
+
+def splineDerivatives(masses,values):
+    '''Second derivatives at the knots of the natural cubic spline through (masses,values).'''
+    xs = np.asarray(masses,dtype=float)
+    ys = np.asarray(values,dtype=float)
+    n = len(xs)
+    d2 = np.zeros(n)
+    if n<3: return d2
+    h = np.diff(xs)
+    slopes = np.diff(ys)/h
+    diag = 2*(h[:-1]+h[1:])
+    rhs = 6*np.diff(slopes)
+    for j in range(1,n-2):
+        w = h[j]/diag[j-1]
+        diag[j] -= w*h[j]
+        rhs[j] -= w*rhs[j-1]
+    for j in range(n-3,-1,-1):
+        d2[j+1] = (rhs[j]-h[j+1]*d2[j+2])/diag[j]
+    return d2
+
+##############
+### Shapes ###
+##############
+# Unnormalized, as the evaluate method of the corresponding RooFit class.
+
+def gaussian(x,mean,sigma):
+    u = (x-mean)/sigma
+    return np.exp(-0.5*u*u)
+
+def breitWigner(x,mean,width):
+    return 1./((x-mean)**2 + 0.25*width*width)
+
+def voigtian(x,mean,width,sigma):
+    c = 1./(math.sqrt(2)*np.abs(sigma))
+    a = 0.5*c*np.abs(width)
+    return c*faddeeva(c*(x-mean)+1j*a).real/math.sqrt(math.pi)
+
+def crystalBall(x,mean,sigma,a,n):
+    t = (x-mean)/sigma
+    t = np.where(a<0,-t,t)
+    absA = np.abs(a)
+    A = (n/absA)**n*np.exp(-0.5*absA*absA)
+    B = n/absA - absA
+    core = t>=-absA
+    return np.where(core,np.exp(-0.5*t*t),A/np.where(core,1.,B-t)**n)
+
+def doubleCrystalBall(x,mean,sigma,a1,n1,a2,n2):
+    u = (x-mean)/sigma
+    A1 = (n1/np.abs(a1))**n1*np.exp(-a1*a1/2)
+    A2 = (n2/np.abs(a2))**n2*np.exp(-a2*a2/2)
+    B1 = n1/np.abs(a1) - np.abs(a1)
+    B2 = n2/np.abs(a2) - np.abs(a2)
+    low = u<-a1
+    high = u>=a2
+    # keep the power law bases positive where the branch is not taken
+    left = A1*np.where(low,B1-u,1.)**-n1
+    right = A2*np.where(high,B2+u,1.)**-n2
+    return np.where(low,left,np.where(high,right,np.exp(-u*u/2)))
+
+def doubleSidedGaussian(x,mean,sigma1,sigma2):
+    sqrt2pi = math.sqrt(2*math.pi)
+    mode = mean - 2/sqrt2pi*(sigma2-sigma1)
+    scaleFactor = sigma2/sigma1
+    total = 0.5*(1+scaleFactor)
+    d = x-mode
+    left = np.exp(-d*d/(2*sigma1*sigma1))/(sigma1*sqrt2pi)/total
+    right = np.exp(-d*d/(2*sigma2*sigma2))/(sigma2*sqrt2pi)*scaleFactor/total
+    return np.where(x<mode,left,right)
+
+def doubleSidedVoigtian(x,mean,sigma1,sigma2,width1,width2):
+    C1 = 1./(math.sqrt(2)*sigma1)
+    C2 = 1./(math.sqrt(2)*sigma2)
+    voigt1 = faddeeva(C1*(x-mean)+1j*0.5*C1*width1).real
+    voigt2 = faddeeva(C2*(x-mean)+1j*0.5*C2*width2).real
+    scaleFactor = voigt1/voigt2*sigma2/sigma1
+    total = 0.5*(1+scaleFactor)
+    left = 0.5*C1*voigt1/math.sqrt(math.pi)/total
+    right = 0.5*C2*voigt2/math.sqrt(math.pi)*scaleFactor/total
+    return np.where(x<mean,left,right)
+
+def exponential(x,lamb):
+    return np.exp(lamb*x)
+
+def erf(x,erfScale,erfShift):
+    return 0.5*(_erf(erfScale*(x-erfShift))+1)
+
+# CERNLIB G110 (DENLAN) rational approximations, as ROOT::Math::landau_pdf
+_LANDAUP = [
+    [0.4259894875,-0.1249762550, 0.03984243700,-0.006298287635, 0.001511162253],
+    [0.1788541609, 0.1173957403, 0.01488850518,-0.001394989411, 0.0001283617211],
+    [0.1788544503, 0.09359161662,0.006325387654,0.00006611667319,-0.000002031049101],
+    [0.9874054407, 118.6723273,  849.2794360,  -743.7792444,     427.0262186],
+    [1.003675074,  167.5702434,  4789.711289,   21217.86767,    -22324.94910],
+    [1.000827619,  664.9143136,  62972.92665,   475554.6998,    -5743609.109],
+]
+_LANDAUQ = [
+    [1.0,-0.3388260629, 0.09594393323,-0.01608042283, 0.003778942063],
+    [1.0, 0.7428795082, 0.3153932961,  0.06694219548, 0.008790609714],
+    [1.0, 0.6097809921, 0.2560616665,  0.04746722384, 0.006957301675],
+    [1.0, 106.8615961,  337.6496214,   2016.712389,   1597.063511],
+    [1.0, 156.9424537,  3745.310488,   9834.698876,   66924.28357],
+    [1.0, 651.4101098,  56974.73333,   165917.4725,  -2815759.939],
+]
+_LANDAUA1 = [0.04166666667,-0.01996527778,0.02709538966]
+_LANDAUA2 = [-1.845568670,-4.284640743]
+
+def _landauRatio(i,v):
+    return np.polyval(_LANDAUP[i][::-1],v)/np.polyval(_LANDAUQ[i][::-1],v)
+
+def landau(x,mu,sigma):
+    '''TMath::Landau(x,mu,sigma) with norm=false, as RooLandau: not divided by sigma.'''
+    v = np.asarray((x-mu)/sigma,dtype=float)
+    with np.errstate(all='ignore'):
+        u = np.exp(v+1.)
+        far = np.where(u<1e-10,0.,0.3989422803*np.exp(-1/u)/np.sqrt(u)*(1+np.polyval(_LANDAUA1[::-1],u)*u))
+        u = np.exp(-v-1)
+        low = np.exp(-u)*np.sqrt(u)*_landauRatio(0,v)
+        u = 1/v
+        tail = v-v*np.log(v)/(v+1)
+        branches = [
+            (v<-5.5, far),
+            (v<-1,   low),
+            (v<1,    _landauRatio(1,v)),
+            (v<5,    _landauRatio(2,v)),
+            (v<12,   u*u*_landauRatio(3,u)),
+            (v<50,   u*u*_landauRatio(4,u)),
+            (v<300,  u*u*_landauRatio(5,u)),
+            (v>=300, (1+(_LANDAUA2[0]+_LANDAUA2[1]/tail)/tail)/tail**2),
+        ]
+    return np.select([c for c,b in branches],[b for c,b in branches])
+
+def chebychev(x,coefs,xmin,xmax):
+    '''1 + sum_i coefs[i] T_(i+1)(x) with x mapped from [xmin,xmax] to [-1,1], as RooChebychev.'''
+    t = -1 + 2*(x-xmin)/float(xmax-xmin)
+    result = 1.
+    prev, curr = 1., t
+    for c in coefs:
+        result = result + c*curr
+        prev, curr = curr, 2*t*curr-prev
+    return result
+
+def polynomial(x,coefs):
+    result = 0.
+    for i, c in enumerate(coefs):
+        result = result + c*x**i
+    return result
+
+# Models class: (shape, spline kwargs in the order of the shape parameters)
+SHAPES = {
+    'Gaussian'            : (gaussian,            []),
+    'BreitWigner'         : (breitWigner,         []),
+    'Voigtian'            : (voigtian,            []),
+    'CrystalBall'         : (crystalBall,         []),
+    'DoubleCrystalBall'   : (doubleCrystalBall,   []),
+    'DoubleSidedGaussian' : (doubleSidedGaussian, []),
+    'DoubleSidedVoigtian' : (doubleSidedVoigtian, []),
+    'Exponential'         : (exponential,         []),
+    'Erf'                 : (erf,                 []),
+    'Landau'              : (landau,              []),
+    'GaussianSpline'            : (gaussian,            ['means','sigmas']),
+    'BreitWignerSpline'         : (breitWigner,         ['means','widths']),
+    'VoigtianSpline'            : (voigtian,            ['means','widths','sigmas']),
+    'CrystalBallSpline'         : (crystalBall,         ['means','sigmas','a_s','n_s']),
+    'DoubleCrystalBallSpline'   : (doubleCrystalBall,   ['means','sigmas','a1s','n1s','a2s','n2s']),
+    'DoubleSidedGaussianSpline' : (doubleSidedGaussian, ['means','sigma1s','sigma2s']),
+    'DoubleSidedVoigtianSpline' : (doubleSidedVoigtian, ['means','sigma1s','sigma2s','width1s','width2s']),
+    'ErfSpline'                 : (erf,                 ['erfScales','erfShifts']),
+    'LandauSpline'              : (landau,              ['mus','sigmas']),
+}
+
+#################
+### Evaluator ###
+#################
+class Evaluator(object):
+    '''
+    Evaluator
+
+    Evaluate Models pdfs with numpy, vectorized over arrays of the observables and MH.
+    Models are added with the label they are built as, as for a ModelGraph,
+    and the parameters are taken from a dict of fitted values
+    (the vals of a fitParams json, or the dict itself), falling back
+    to the initial values of the models for parameters that are not given.
+    The pdfs are normalized over ranges ({observable: [min,max]}) numerically,
+    on a grid of NPOINTS points per observable.
+
+        evaluator = Evaluator({'x': [2.5,25]}, vals)
+        evaluator.add(Models.Voigtian('sigx', mean=[7,0,30], width=[0.1,0,5], sigma=[0.1,0,5]))
+        values = evaluator.evaluate('sigx', x=np.linspace(2.5,25,100))
+    '''
+
+    NPOINTS = 2001
+
+    def __init__(self,ranges,params=None):
+        self.ranges = ranges
+        self.models = {}
+        self.params = {}
+        self.defaults = {}
+        self.derivatives = {}
+        if params: self.setParams(params)
+
+    def __contains__(self,label):
+        return label in self.models
+
+    def add(self,model,label=''):
+        '''Add a model evaluated as label (default the model name) and return the label.'''
+        label = label or model.name
+        name = model.__class__.__name__
+        if name not in SHAPES and name not in ['Chebychev','ChebychevSpline','PolynomialExpr','Sum','Prod','ProdSpline']:
+            logging.error('No NumPy version of {}'.format(name))
+            raise ValueError('No NumPy version of {} ({})'.format(name,label))
+        self.models[label] = model
+        if name in SHAPES or name in ['Chebychev','Sum']:
+            for param, value in model.variables(label).iteritems():
+                self.defaults[param] = value[0]
+        return label
+
+    def setParams(self,params):
+        '''Set the parameter values from a dict, or from the vals of a fitParams json.'''
+        if 'vals' in params and isinstance(params['vals'],dict): params = params['vals']
+        self.params.update(params)
+
+    def value(self,name):
+        if name in self.params: return self.params[name]
+        if name in self.defaults: return self.defaults[name]
+        logging.error('No value for parameter {}'.format(name))
+        raise ValueError('No value for parameter {}'.format(name))
+
+    def observables(self,label):
+        '''The observables of the pdf label.'''
+        model = self.__model(label)
+        name = model.__class__.__name__
+        if name=='Sum': return self.observables(sorted(model.kwargs)[0])
+        if name in ['Prod','ProdSpline']:
+            observables = set()
+            for arg in model.args:
+                observables |= self.observables(arg)
+            return observables
+        return set([model.x])
+
+    def __model(self,label):
+        if label not in self.models:
+            logging.error('{} was not added'.format(label))
+            raise ValueError('{} was not added to the evaluator'.format(label))
+        return self.models[label]
+
+    def __dependsOnMH(self,label):
+        model = self.__model(label)
+        name = model.__class__.__name__
+        if name=='Sum': return any([self.__dependsOnMH(pdf) for pdf in model.kwargs])
+        if name in ['Prod','ProdSpline']: return any([self.__dependsOnMH(arg) for arg in model.args])
+        return name.endswith('Spline')
+
+    def __splineValues(self,label,key,coords):
+        model = self.models[label]
+        if model.MH not in coords:
+            logging.error('{} needs {}'.format(label,model.MH))
+            raise ValueError('{} depends on {}, which was not given'.format(label,model.MH))
+        masses = model.kwargs.get('masses',[])
+        values = model.kwargs.get(key,[])
+        if (label,key) not in self.derivatives:
+            self.derivatives[(label,key)] = splineDerivatives(masses,values)
+        return spline(masses,values,coords[model.MH],self.derivatives[(label,key)])
+
+    def shape(self,label,coords):
+        '''The unnormalized pdf label at coords ({variable: values}).'''
+        model = self.__model(label)
+        name = model.__class__.__name__
+        if name in SHAPES:
+            func, keys = SHAPES[name]
+            if keys:
+                params = [self.__splineValues(label,key,coords) for key in keys]
+            else:
+                params = [self.value(param) for param in model.parameters(label)]
+            return func(coords[model.x],*params)
+        if name=='Chebychev':
+            return chebychev(coords[model.x],[self.value(param) for param in model.parameters(label)],*self.ranges[model.x])
+        if name=='ChebychevSpline':
+            keys = ['p{}'.format(o) for o in range(model.kwargs.get('order',1))]
+            return chebychev(coords[model.x],[self.__splineValues(label,key,coords) for key in keys],*self.ranges[model.x])
+        if name=='PolynomialExpr':
+            order = model.kwargs.get('order',1)
+            coefs = []
+            for o in range(order+1):
+                p = model.kwargs.get('p{}'.format(o),[0,-1,1])
+                coefs += [self.value(p) if isinstance(p,str) else self.params.get('p{}_{}'.format(o,label),p[0])]
+            return polynomial(coords[model.x],coefs)
+        if name=='Sum':
+            return self.__sum(label,[self.shape(pdf,coords) for pdf in sorted(model.kwargs)])
+        if name in ['Prod','ProdSpline']:
+            self.__checkProd(label)
+            result = 1.
+            for arg in model.args:
+                result = result*self.shape(arg,coords)
+            return result
+
+    def __checkProd(self,label):
+        if any(['|' in arg for arg in self.models[label].args]):
+            logging.error('Conditional product {}'.format(label))
+            raise ValueError('Conditional products are not supported ({})'.format(label))
+
+    def __sum(self,label,values):
+        '''Combine the values of the components of a Sum, as the RooAddPdf of Sum.make.'''
+        model = self.models[label]
+        pdfs = sorted(model.kwargs)
+        fracs = [self.value('{}_frac'.format(pdf)) for pdf in pdfs]
+        if model.doRecursive:
+            result = values[-1]
+            for frac, value in reversed(zip(fracs[:-1],values[:-1])):
+                result = frac*value + (1-frac)*result
+            return result
+        if model.doExtended:
+            return sum([frac*value for frac, value in zip(fracs,values)])/sum(fracs)
+        summed = [(frac,value) for pdf, frac, value in zip(pdfs,fracs,values) if len(model.kwargs[pdf]) in [2,3]]
+        result = summed[-1][1]*(1-sum([frac for frac, value in summed[:-1]]))
+        for frac, value in summed[:-1]:
+            result = result + frac*value
+        return result
+
+    def __integral(self,label,variable,coords):
+        '''Integral of the shape of label over the range of variable, for each MH in coords.'''
+        lo, hi = self.ranges[variable]
+        grid = np.linspace(lo,hi,self.NPOINTS)
+        weights = np.full(self.NPOINTS,(hi-lo)/float(self.NPOINTS-1))
+        weights[[0,-1]] *= 0.5
+        model = self.models[label]
+        mhName = getattr(model,'MH','MH')
+        if not self.__dependsOnMH(label):
+            return np.dot(self.shape(label,{variable: grid}),weights)
+        # once per distinct MH
+        mhs, inverse = np.unique(np.asarray(coords[mhName],dtype=float),return_inverse=True)
+        values = self.shape(label,{variable: grid[np.newaxis,:], mhName: mhs[:,np.newaxis]})
+        return np.dot(values,weights)[inverse].reshape(np.shape(coords[mhName]))
+
+    def pdf(self,label,coords):
+        '''The pdf label at coords, normalized over the ranges of its observables.'''
+        model = self.__model(label)
+        name = model.__class__.__name__
+        if name=='Sum':
+            return self.__sum(label,[self.pdf(pdf,coords) for pdf in sorted(model.kwargs)])
+        observables = self.observables(label)
+        if name in ['Prod','ProdSpline']:
+            self.__checkProd(label)
+            components = [self.observables(arg) for arg in model.args]
+            if sum([len(c) for c in components])==len(observables):
+                # independent observables: the normalization factorizes
+                result = 1.
+                for arg in model.args:
+                    result = result*self.pdf(arg,coords)
+                return result
+        if len(observables)!=1:
+            logging.error('Cannot normalize {}'.format(label))
+            raise ValueError('{} shares more than one observable between its components'.format(label))
+        return self.shape(label,coords)/self.__integral(label,list(observables)[0],coords)
+
+    def evaluate(self,label,normalize=True,**coords):
+        '''
+        Evaluate the pdf label at the observables and MH given as keyword arguments,
+        e.g. evaluate('sig', x=xs, y=ys, MH=mhs). The arrays are broadcast together.
+        '''
+        coords = dict([(k,np.asarray(v,dtype=float)) for k,v in coords.iteritems()])
+        if normalize: return self.pdf(label,coords)
+        return self.shape(label,coords)
@@ -0,0 +1,130 @@
+import logging
+import multiprocessing
+
+import ROOT
+from CombineLimits.Limits.utilities import *
+
+# the PlotQueue being drawn by the worker processes, set before the pool is forked
+_renderQueue = None
+
+def _renderWorker(task):
+    '''Draw every n-th plot of the queue in a worker process.'''
+    start, step = task
+    for plot in _renderQueue.plots[start::step]:
+        _renderQueue.draw(plot)
+    return len(_renderQueue.plots[start::step])
+
+class PlotQueue(object):
+    '''
+    PlotQueue
+
+    Diagnostic plots of fits, drawn after the fits are done.
+    A fit adds a lightweight snapshot of its plot: a copy of the pdf with the
+    parameter values and errors after the fit, and the data binned in the
+    observables. The workspace and the dataset of the fit are not kept, so
+    they are freed as soon as the fit is done with them.
+    render() draws and prints the plots afterwards, optionally in a pool of
+    worker processes.
+    '''
+
+    def __init__(self):
+        self.plots = []
+
+    def __len__(self):
+        return len(self.plots)
+
+    def add(self,ws,pdfname,data,savename,dims=['x'],logy=False):
+        '''Add the plot of a fit of ws.pdf(pdfname) to data, to be printed as savename*.png.'''
+        # the copy owns its parameters and observables, which keep their fitted values and errors
+        pdf = ws.pdf(pdfname).cloneTree()
+        ROOT.SetOwnership(pdf,True)
+        observables = ROOT.RooArgList()
+        for dim in dims:
+            observables.add(ws.var(dim))
+        dhname = '{}_plotdata'.format(pdfname)
+        binned = ROOT.RooDataHist(dhname,dhname,observables,data)
+        histD = None
+        if len(dims)==2 and isinstance(data,ROOT.RooDataSet):
+            histD = data.createHistogram(ws.var(dims[0]),ws.var(dims[1]),20,20,'1','{}_hist'.format(savename))
+            histD.SetDirectory(0)
+        self.plots += [{
+            'pdf'     : pdf,
+            'data'    : binned,
+            'histD'   : histD,
+            'savename': savename,
+            'dims'    : dims,
+            'logy'    : logy,
+        }]
+
+    def clear(self):
+        self.plots = []
+
+    def __drawProjection(self,canvas,var,data,model):
+        frame = var.frame()
+        frame.SetTitle('')
+        data.plotOn(frame)
+        model.plotOn(frame)
+        chi2Line = "Chi2: " + str(frame.chiSquare()) # Adding chi2 info
+        pt = ROOT.TPaveText(.72,.1,.90,.2, "brNDC") # Adding chi2 info
+        pt.AddText(chi2Line) # Adding chi2 info
+        model.paramOn(frame,ROOT.RooFit.Layout(0.72,0.98,0.90))
+        frame.Draw()
+        pt.Draw()
+        prims = canvas.GetListOfPrimitives()
+        for prim in prims:
+            if 'paramBox' in prim.GetName():
+                prim.SetTextSize(0.02)
+        return frame, pt
+
+    def draw(self,plot):
+        '''Draw and print a single plot.'''
+        model = plot['pdf']
+        data = plot['data']
+        savename = plot['savename']
+        variables = model.getVariables()
+
+        canvas = ROOT.TCanvas(savename,savename,800,800)
+        canvas.SetRightMargin(0.3)
+        if len(plot['dims'])==1:
+            frame = self.__drawProjection(canvas,variables.find(plot['dims'][0]),data,model)
+            canvas.Print('{0}.png'.format(savename))
+        else:
+            x = variables.find(plot['dims'][0])
+            y = variables.find(plot['dims'][1])
+            xFrame = self.__drawProjection(canvas,x,data,model)
+            canvas.Print('{0}_xproj.png'.format(savename))
+
+            if plot['logy']: canvas.SetLogy()
+            yFrame = self.__drawProjection(canvas,y,data,model)
+            canvas.Print('{0}_yproj.png'.format(savename))
+
+            histM = model.createHistogram('{},{}'.format(*plot['dims']),100,100)
+            histM.SetLineColor(ROOT.kBlue)
+            histM.Draw('surf')
+            canvas.Print('{0}_model.png'.format(savename))
+
+            if plot['histD']:
+                histD = plot['histD']
+                histD.SetLineColor(ROOT.kBlack)
+                histD.Draw('surf')
+                canvas.Print('{0}_dataset.png'.format(savename))
+
+    def render(self,workers=1):
+        '''Draw all queued plots, in a pool of worker processes if workers>1, and empty the queue.'''
+        if not self.plots: return
+        workers = min(workers,len(self.plots))
+        logging.info('Drawing {} plots with {} workers'.format(len(self.plots),workers))
+        if workers>1:
+            global _renderQueue
+            _renderQueue = self
+            pool = multiprocessing.Pool(workers)
+            try:
+                pool.map(_renderWorker, [(i,workers) for i in range(workers)], chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+            _renderQueue = None
+        else:
+            for plot in self.plots:
+                self.draw(plot)
+        self.clear()
@@ -0,0 +1,210 @@
+import re
+import logging
+
+import numpy as np
+
+import ROOT
+
+class Cut(object):
+    '''
+    Cut
+
+    A selection expression, in the syntax of RooFit cuts, parsed once into a function
+    returning the mask of the entries that pass it, evaluated on arrays of the values
+    of the variables. Supports numbers, variables, + - * /, comparisons, && || !,
+    parentheses and abs, sqrt, exp and log (also as TMath::).
+    An expression that cannot be parsed raises a ValueError.
+    '''
+
+    TOKENS = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*(?:::\w+)?)|(&&|\|\||<=|>=|==|!=|[-+*/()<>!,]))')
+    FUNCTIONS = {'abs': np.abs, 'fabs': np.abs, 'TMath::Abs': np.abs, 'sqrt': np.sqrt, 'TMath::Sqrt': np.sqrt,
+                 'exp': np.exp, 'TMath::Exp': np.exp, 'log': np.log, 'TMath::Log': np.log}
+    COMPARISONS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal}
+    ARITHMETIC = {'+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide}
+
+    def __init__(self,expression):
+        self.expression = expression
+        self.variables = set()
+        self.tokens = self.__tokenize(expression)
+        if self.tokens:
+            self.function = self.__or()
+            if self.tokens:
+                raise ValueError('Unexpected {} in {}'.format(self.tokens[0][1],expression))
+        else:
+            self.function = lambda values: True # no selection
+        del self.tokens
+
+    def __tokenize(self,expression):
+        tokens = []
+        pos = 0
+        expression = expression.rstrip()
+        while pos<len(expression):
+            match = self.TOKENS.match(expression,pos)
+            if not match:
+                raise ValueError('Cannot parse {} at {}'.format(expression,pos))
+            number, name, op = match.groups()
+            if number is not None: tokens += [('number',float(number))]
+            elif name is not None: tokens += [('name',name)]
+            else:                  tokens += [('op',op)]
+            pos = match.end()
+        return tokens
+
+    def __peek(self,*ops):
+        return self.tokens and self.tokens[0][0]=='op' and self.tokens[0][1] in ops
+
+    def __take(self,op):
+        if not self.__peek(op):
+            raise ValueError('Expected {} in {}'.format(op,self.expression))
+        self.tokens.pop(0)
+
+    def __binary(self,operand,operators):
+        left = operand()
+        while self.__peek(*operators):
+            op = operators[self.tokens.pop(0)[1]]
+            right = operand()
+            left = (lambda op,left,right: lambda values: op(left(values),right(values)))(op,left,right)
+        return left
+
+    def __or(self):
+        return self.__binary(self.__and,{'||': np.logical_or})
+
+    def __and(self):
+        return self.__binary(self.__comparison,{'&&': np.logical_and})
+
+    def __comparison(self):
+        left = self.__sum()
+        if self.__peek(*self.COMPARISONS):
+            op = self.COMPARISONS[self.tokens.pop(0)[1]]
+            right = self.__sum()
+            return lambda values: op(left(values),right(values))
+        return left
+
+    def __sum(self):
+        return self.__binary(self.__product,dict([(op,self.ARITHMETIC[op]) for op in '+-']))
+
+    def __product(self):
+        return self.__binary(self.__unary,dict([(op,self.ARITHMETIC[op]) for op in '*/']))
+
+    def __unary(self):
+        # as in C, ! binds tighter than the comparisons: !x>3 is (!x)>3
+        if self.__peek('!'):
+            self.tokens.pop(0)
+            operand = self.__unary()
+            return lambda values: np.logical_not(operand(values))
+        if self.__peek('-','+'):
+            sign = self.tokens.pop(0)[1]
+            operand = self.__unary()
+            return (lambda values: np.negative(operand(values))) if sign=='-' else operand
+        return self.__atom()
+
+    def __atom(self):
+        if not self.tokens:
+            raise ValueError('Unexpected end of {}'.format(self.expression))
+        kind, value = self.tokens.pop(0)
+        if kind=='number':
+            return lambda values: value
+        if kind=='name':
+            if self.__peek('('):
+                if value not in self.FUNCTIONS:
+                    raise ValueError('Unknown function {} in {}'.format(value,self.expression))
+                function = self.FUNCTIONS[value]
+                self.__take('(')
+                argument = self.__or()
+                self.__take(')')
+                return lambda values: function(argument(values))
+            self.variables.add(value)
+            return lambda values: values[value]
+        if value=='(':
+            inner = self.__or()
+            self.__take(')')
+            return inner
+        raise ValueError('Unexpected {} in {}'.format(value,self.expression))
+
+    def mask(self,values,n):
+        '''The entries passing the cut, given the arrays of n values of its variables.'''
+        result = np.asarray(self.function(values))
+        if result.dtype!=np.bool_: result = result!=0
+        return np.broadcast_to(result,(n,))
+
+class CutCache(object):
+    '''
+    CutCache
+
+    Cuts parsed once per distinct expression. Expressions that cannot be parsed
+    are remembered as None, so that they go straight to RooFit.
+    '''
+
+    def __init__(self):
+        self.cuts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,expression):
+        '''The Cut for expression, or None if it is not supported.'''
+        if expression in self.cuts:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                self.cuts[expression] = Cut(expression)
+            except ValueError as e:
+                logging.debug('Selection {} left to RooFit: {}'.format(expression,e))
+                self.cuts[expression] = None
+        return self.cuts[expression]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def logStats(self):
+        logging.info('Cut cache: {} cuts, {} hits, {} misses'.format(len(self.cuts),self.hits,self.misses))
+
+cuts = CutCache()
+
+def columns(data,names):
+    '''The values of the variables names of the RooDataSet data, as a dict of arrays, and the weights.'''
+    row = data.get()
+    variables = ROOT.RooArgList()
+    for name in names:
+        variables.add(row.find(name))
+    values = np.empty((len(names)+1,data.numEntries()))
+    ROOT.DataSetColumns.extract(data,variables,values)
+    return dict(zip(names,values[:-1])), values[-1]
+
+def _reals(argset,names):
+    return all([isinstance(argset.find(name),ROOT.RooRealVar) for name in names])
+
+def select(data,selection='',variables=None,weight=''):
+    '''
+    Return the copy ROOT.RooDataSet(name,title,data,variables,selection,weight) of the RooDataSet data,
+    with the selection and the ranges of the variables applied as masks on the columns of data.
+    Falls back to RooFit when the selection is not supported or the variables are not all RooRealVars.
+    '''
+    if variables is None: variables = data.get()
+    names = [name for name in variables.contentsString().split(',') if name]
+    cut = cuts.get(selection)
+    if cut is None or (weight and weight not in names) or (data.isWeighted() and not weight) \
+            or not _reals(variables,names) or not _reals(data.get(),names+sorted(cut.variables)):
+        return ROOT.RooDataSet(data.GetName(),data.GetTitle(),data,variables,selection,weight)
+    needed = names+sorted(cut.variables-set(names))
+    values, weights = columns(data,needed)
+    mask = cut.mask(values,data.numEntries()).copy()
+    for name in names:
+        var = variables.find(name)
+        mask &= (values[name]>=var.getMin()) & (values[name]<=var.getMax())
+    observables = [name for name in names if name!=weight]
+    selected = np.vstack([values[name] for name in observables]+[values[weight] if weight else weights])[:,mask]
+    arglist = ROOT.RooArgList()
+    for name in observables:
+        arglist.add(variables.find(name))
+    weightVar = variables.find(weight) if weight else ROOT.nullptr
+    result = ROOT.DataSetColumns.fill(data.GetName(),data.GetTitle(),arglist,weightVar,selected.shape[1],np.ascontiguousarray(selected))
+    ROOT.SetOwnership(result,True)
+    return result
+
+def sumEntries(data,selection=''):
+    '''data.sumEntries(selection), with the selection applied as a mask on the columns of a RooDataSet.'''
+    cut = cuts.get(selection) if isinstance(data,ROOT.RooDataSet) else None
+    if cut is None or not _reals(data.get(),sorted(cut.variables)):
+        return data.sumEntries(selection)
+    values, weights = columns(data,sorted(cut.variables))
+    return float(weights[cut.mask(values,data.numEntries())].sum())
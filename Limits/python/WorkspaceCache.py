@@ -0,0 +1,65 @@
+import os
+import logging
+import hashlib
+import inspect
+
+import ROOT
+from CombineLimits.Limits.utilities import *
+
+class WorkspaceCache(object):
+    '''
+    WorkspaceCache
+
+    A persistent cache of built (unfitted) workspaces, one ROOT file per workspace.
+    Workspaces are addressed by a hash of the model configuration (ranges, labels,
+    regions and other settings) and of the source of the code that builds them,
+    so that a changed model never reattaches a stale workspace.
+    '''
+
+    def __init__(self,directory):
+        self.directory = directory
+        self.files = [] # keep the files open, the workspaces read from them are owned by ROOT
+        self.hits = 0
+        self.misses = 0
+        python_mkdir(self.directory)
+
+    def key(self,sources=[],**config):
+        '''Return the key for a configuration. sources are objects (modules, functions) whose source code is hashed.'''
+        h = hashlib.sha1()
+        for k in sorted(config):
+            h.update('{}={!r}'.format(k,config[k]))
+        for source in sources:
+            with open(inspect.getsourcefile(source)) as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    def __path(self,key):
+        return '{}/{}.root'.format(self.directory,key)
+
+    def get(self,key,name):
+        '''Return the cached workspace, or None if it has not been built.'''
+        path = self.__path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            logging.debug('Workspace cache miss {} {}'.format(name,key))
+            return None
+        tfile = ROOT.TFile.Open(path)
+        workspace = tfile.Get(name) if tfile else None
+        if not workspace:
+            self.misses += 1
+            logging.warning('Workspace cache entry {} has no workspace {}'.format(path,name))
+            return None
+        self.files += [tfile]
+        self.hits += 1
+        logging.info('Reattached workspace {} from {}'.format(name,path))
+        return workspace
+
+    def put(self,key,workspace):
+        '''Store a workspace.'''
+        # write and rename so that other processes never read a partial file
+        tmp = '{}.{}.tmp.root'.format(self.__path(key),os.getpid())
+        workspace.writeToFile(tmp)
+        os.rename(tmp,self.__path(key))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
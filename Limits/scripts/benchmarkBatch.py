@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import logging
+import argparse
+from array import array
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+import CombineLimits.Limits.Models as Models
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+PDFS = ['dcb','dg','dv']
+
+def buildWorkspace():
+    '''A workspace with the custom pdfs that have a batch evaluation.'''
+    ws = ROOT.RooWorkspace('bench')
+    ws.factory('x[0,30]')
+    models = {
+        'dcb': Models.DoubleCrystalBall('dcb',
+            mean  = [10,8,12],
+            sigma = [0.5,0.1,2],
+            a1    = [1.2,0.5,5],
+            n1    = [3,1.1,10],
+            a2    = [1.8,0.5,5],
+            n2    = [2,1.1,10],
+        ),
+        'dg': Models.DoubleSidedGaussian('dg',
+            mean   = [10,8,12],
+            sigma1 = [0.4,0.1,2],
+            sigma2 = [0.8,0.1,2],
+        ),
+        'dv': Models.DoubleSidedVoigtian('dv',
+            mean   = [10,8,12],
+            sigma1 = [0.4,0.1,2],
+            sigma2 = [0.8,0.1,2],
+            width1 = [0.1,0.01,1],
+            width2 = [0.2,0.01,1],
+        ),
+    }
+    for name in models:
+        models[name].build(ws,name)
+    return ws
+
+def perEvent(ws,name,xs):
+    x = ws.var('x')
+    pdf = ws.pdf(name)
+    values = []
+    start = time.time()
+    for xv in xs:
+        x.setVal(xv)
+        values += [pdf.getVal()]
+    return time.time()-start, values
+
+def batch(ws,name,xs):
+    pdf = ws.pdf(name)
+    xbuf = array('d',xs)
+    out = array('d',[0.]*len(xs))
+    start = time.time()
+    pdf.evaluateArray(xbuf,out,len(xs))
+    return time.time()-start, list(out)
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the batch evaluation of the custom pdfs against per-event getVal')
+
+    parser.add_argument('--events', type=int, default=100000, help='Number of x values evaluated')
+    parser.add_argument('--pdfs', nargs='+', default=PDFS, choices=PDFS, help='Pdfs to benchmark')
+    parser.add_argument('--tolerance', type=float, default=1e-12, help='Largest allowed relative difference of the values')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    ws = buildWorkspace()
+    x = ws.var('x')
+    xs = [x.getMin()+(x.getMax()-x.getMin())*(i+0.5)/args.events for i in range(args.events)]
+    status = 0
+    for name in args.pdfs:
+        # evaluate is unnormalized, so compare against getVal without a normalization set
+        eventTime, eventValues = perEvent(ws,name,xs)
+        batchTime, batchValues = batch(ws,name,xs)
+        maxDiff = max([abs(e-b)/max(abs(e),1e-300) for e,b in zip(eventValues,batchValues)])
+        logging.info('{}: per event {:.3g} events/s, batch {:.3g} events/s, speedup {:.1f}x, largest relative difference {:.3g}'.format(
+            name,
+            len(xs)/eventTime if eventTime else float('inf'),
+            len(xs)/batchTime if batchTime else float('inf'),
+            eventTime/batchTime if batchTime else float('inf'),
+            maxDiff))
+        if maxDiff>args.tolerance:
+            logging.error('{}: batch and per event values differ'.format(name))
+            status = 1
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import logging
+import argparse
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+import CombineLimits.Limits.Models as Models
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+RANGES = [(0,30),(5,15),(9,11),(10,25)]
+
+def buildWorkspace():
+    '''A workspace with the pdfs that have analytical integrals.'''
+    ws = ROOT.RooWorkspace('bench')
+    ws.factory('x[0,30]')
+    models = {
+        'dcb': Models.DoubleCrystalBall('dcb',
+            mean  = [10,8,12],
+            sigma = [0.5,0.1,2],
+            a1    = [1.2,0.5,5],
+            n1    = [3,1.1,10],
+            a2    = [1.8,0.5,5],
+            n2    = [2,1.1,10],
+        ),
+        'dg': Models.DoubleSidedGaussian('dg',
+            mean   = [10,8,12],
+            sigma1 = [0.4,0.1,2],
+            sigma2 = [0.8,0.1,2],
+        ),
+    }
+    for name in models:
+        models[name].build(ws,name)
+    for i,(lo,hi) in enumerate(RANGES):
+        ws.var('x').setRange('r{}'.format(i),lo,hi)
+    return ws
+
+def numericClone(pdf):
+    clone = pdf.clone('{}_numeric'.format(pdf.GetName()))
+    clone.forceNumInt(True)
+    return clone
+
+def compareNormalization(ws,name):
+    '''Return the largest relative difference between the analytical and numerical integrals over RANGES.'''
+    x = ws.var('x')
+    pdf = ws.pdf(name)
+    numeric = numericClone(pdf)
+    maxDiff = 0
+    for i in range(len(RANGES)):
+        rangeName = 'r{}'.format(i)
+        analytic = pdf.createIntegral(ROOT.RooArgSet(x),ROOT.RooFit.Range(rangeName)).getVal()
+        numerical = numeric.createIntegral(ROOT.RooArgSet(x),ROOT.RooFit.Range(rangeName)).getVal()
+        logging.debug('{} {}: analytical {} numerical {}'.format(name,RANGES[i],analytic,numerical))
+        maxDiff = max(maxDiff,abs(analytic-numerical)/numerical)
+    return maxDiff
+
+def timeFit(pdf,data,params,initial):
+    for param in params:
+        param.setVal(initial[param.GetName()])
+    start = time.time()
+    pdf.fitTo(data,ROOT.RooFit.Save(),ROOT.RooFit.PrintLevel(-1))
+    elapsed = time.time()-start
+    return elapsed, dict([(param.GetName(),param.getVal()) for param in params])
+
+def compareFits(ws,name,nevents):
+    '''Fit a toy dataset with analytical and numerical normalization, return the times and the largest difference of the results.'''
+    x = ws.var('x')
+    pdf = ws.pdf(name)
+    numeric = numericClone(pdf)
+    params = pdf.getParameters(ROOT.RooArgSet(x))
+    it = params.createIterator()
+    paramList = []
+    param = it.Next()
+    while param:
+        paramList += [param]
+        param = it.Next()
+    initial = dict([(param.GetName(),param.getVal()) for param in paramList])
+    data = pdf.generate(ROOT.RooArgSet(x),nevents)
+    analyticTime, analytic = timeFit(pdf,data,paramList,initial)
+    numericTime, numerical = timeFit(numeric,data,paramList,initial)
+    maxDiff = max([abs(analytic[p]-numerical[p])/max(abs(numerical[p]),1e-12) for p in analytic])
+    return analyticTime, numericTime, maxDiff
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the analytical integrals of the custom pdfs against numerical integration')
+
+    parser.add_argument('--events', type=int, default=20000, help='Number of events in the toy dataset')
+    parser.add_argument('--pdfs', nargs='+', default=['dcb','dg'], choices=['dcb','dg'], help='Pdfs to benchmark')
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='Largest allowed relative difference of the normalizations')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    ws = buildWorkspace()
+    status = 0
+    for name in args.pdfs:
+        normDiff = compareNormalization(ws,name)
+        logging.info('{}: largest relative normalization difference {:.3g}'.format(name,normDiff))
+        if normDiff>args.tolerance:
+            logging.error('{}: analytical and numerical normalizations differ'.format(name))
+            status = 1
+        analyticTime, numericTime, fitDiff = compareFits(ws,name,args.events)
+        logging.info('{}: fit with analytical integral {:.3f} s, numerical {:.3f} s, speedup {:.1f}x, largest relative parameter difference {:.3g}'.format(
+            name,analyticTime,numericTime,numericTime/analyticTime if analyticTime else float('inf'),fitDiff))
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
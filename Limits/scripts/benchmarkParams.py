@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+import CombineLimits.Limits.Models as Models
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+def getShifts(nshifts,value):
+    shifts = {}
+    for s in range(nshifts):
+        shifts['shift{}'.format(s)] = {'up': value*(1+random.uniform(0.01,0.2)), 'down': value*(1-random.uniform(0.01,0.2))}
+    return shifts
+
+def legacyParam(ws,label,value,shifts):
+    '''The RooFormulaVar built by Param before the compiled morphing.'''
+    args = ROOT.TList()
+    shiftFormula = '{}'.format(value)
+    for shift in shifts:
+        up = shifts[shift]['up'] - value
+        down = value - shifts[shift]['down']
+        ws.factory('{}[0,-10,10]'.format(shift))
+        shiftFormula += ' + TMath::Max(0,@{shift})*{up} + TMath::Min(0,@{shift})*{down}'.format(shift=len(args),up=up,down=down)
+        args.Add(ws.var(shift))
+    param = ROOT.RooFormulaVar(label, label, shiftFormula, ROOT.RooArgList(args))
+    getattr(ws, "import")(param, ROOT.RooFit.RecycleConflictNodes())
+
+def buildWorkspace(nparams,nshifts):
+    ws = ROOT.RooWorkspace('bench')
+    for p in range(nparams):
+        value = random.uniform(0.5,2)
+        shifts = getShifts(nshifts,value)
+        legacyParam(ws,'legacy{}'.format(p),value,shifts)
+        Models.Param('param{}'.format(p),value=value,shifts=shifts).build(ws,'param{}'.format(p))
+    return ws
+
+def minimizationLoop(ws,names,nuisances,steps):
+    '''Step one nuisance at a time, as a minimizer does for its gradient, and sum the parameters.'''
+    params = [ws.function(name) for name in names]
+    totals = []
+    start = time.time()
+    for step in steps:
+        for n,v in step:
+            ws.var(n).setVal(v)
+            totals += [sum([p.getVal() for p in params])]
+    return time.time()-start, totals
+
+def checkDerivatives(ws,names,nuisances,epsilon=1e-6):
+    '''Largest difference between the analytic derivatives and finite differences.'''
+    maxDiff = 0.
+    for name in names:
+        param = ws.function(name)
+        for n in nuisances:
+            var = ws.var(n)
+            v = var.getVal()
+            var.setVal(v+epsilon)
+            hi = param.getVal()
+            var.setVal(v)
+            numeric = (hi-param.getVal())/epsilon
+            maxDiff = max(maxDiff,abs(numeric-param.partialDerivative(var)))
+    return maxDiff
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the compiled Param morphing against the RooFormulaVar it replaces')
+
+    parser.add_argument('--params', type=int, default=50, help='Number of parameters')
+    parser.add_argument('--shifts', type=int, default=8, help='Number of shifts of each parameter')
+    parser.add_argument('--iterations', type=int, default=200, help='Number of minimizer iterations')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='Largest allowed relative difference of the values')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    random.seed(args.seed)
+    ws = buildWorkspace(args.params,args.shifts)
+    nuisances = ['shift{}'.format(s) for s in range(args.shifts)]
+    steps = [[(n,random.gauss(0,1)) for n in nuisances] for i in range(args.iterations)]
+
+    legacyTime, legacyTotals = minimizationLoop(ws,['legacy{}'.format(p) for p in range(args.params)],nuisances,steps)
+    compiledTime, compiledTotals = minimizationLoop(ws,['param{}'.format(p) for p in range(args.params)],nuisances,steps)
+    evaluations = args.params*args.shifts*args.iterations
+    maxDiff = max([abs(l-c)/max(abs(l),1e-300) for l,c in zip(legacyTotals,compiledTotals)])
+    logging.info('formula {:.3g} evaluations/s, compiled {:.3g} evaluations/s, speedup {:.1f}x, largest relative difference {:.3g}'.format(
+        evaluations/legacyTime if legacyTime else float('inf'),
+        evaluations/compiledTime if compiledTime else float('inf'),
+        legacyTime/compiledTime if compiledTime else float('inf'),
+        maxDiff))
+    derivDiff = checkDerivatives(ws,['param{}'.format(p) for p in range(args.params)],nuisances)
+    logging.info('largest difference of the analytic and numeric derivatives {:.3g}'.format(derivDiff))
+
+    status = 0
+    if maxDiff>args.tolerance:
+        logging.error('compiled and formula values differ')
+        status = 1
+    if derivDiff>1e-5:
+        logging.error('analytic and numeric derivatives differ')
+        status = 1
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import math
+import logging
+import argparse
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+import CombineLimits.Limits.Models as Models
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+PARAMS = ['mean','sigma','a1','n1','a2','n2']
+
+def buildWorkspace(masses):
+    '''A workspace with the same DoubleCrystalBallSpline built with per-parameter and with shared splines.'''
+    ws = ROOT.RooWorkspace('bench')
+    ws.factory('x[0,30]')
+    ws.factory('MH[{},{}]'.format(masses[0],masses[-1]))
+    kwargs = {
+        'masses': masses,
+        'means' : [0.99*m for m in masses],
+        'sigmas': [0.02*m+0.05*math.sin(m) for m in masses],
+        'a1s'   : [1.5+0.1*math.cos(m) for m in masses],
+        'n1s'   : [2+0.2*math.sin(2*m) for m in masses],
+        'a2s'   : [1.8+0.1*math.sin(m) for m in masses],
+        'n2s'   : [3+0.3*math.cos(2*m) for m in masses],
+    }
+    for label, multi in [('single',False),('multi',True)]:
+        model = Models.DoubleCrystalBallSpline('dcb_{}'.format(label),**kwargs)
+        model.MULTISPLINE = multi
+        model.build(ws,'dcb_{}'.format(label))
+    return ws
+
+def scan(ws,label,mhs,xs):
+    '''Evaluate the pdf and its parameters at every MH of the scan, return the time and values.'''
+    mh = ws.var('MH')
+    x = ws.var('x')
+    pdf = ws.pdf('dcb_{}'.format(label))
+    params = [ws.function('{}_dcb_{}'.format(p,label)) for p in PARAMS]
+    values = []
+    start = time.time()
+    for m in mhs:
+        mh.setVal(m)
+        values += [param.getVal() for param in params]
+        for xv in xs:
+            x.setVal(xv)
+            values += [pdf.getVal()]
+    return time.time()-start, values
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark shared multi-output splines against per-parameter RooSpline1D')
+
+    parser.add_argument('--masses', type=float, nargs='+', default=[3.6,4,5,6,7,8,9,10,11,12,13,14,15,17,19,21], help='Spline knots in MH')
+    parser.add_argument('--step', type=float, default=0.1, help='MH scan step')
+    parser.add_argument('--xPoints', type=int, default=5, help='Number of x values evaluated per MH')
+    parser.add_argument('--repeat', type=int, default=20, help='Number of scans')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    masses = sorted(args.masses)
+    ws = buildWorkspace(masses)
+    nsteps = int((masses[-1]-masses[0])/args.step)
+    mhs = [masses[0]+i*args.step for i in range(nsteps+1)]*args.repeat
+    xs = [masses[0]+(masses[-1]-masses[0])*(i+0.5)/args.xPoints for i in range(args.xPoints)]
+
+    singleTime, single = scan(ws,'single',mhs,xs)
+    logging.info('Per-parameter splines: {} MH points in {:.3f} s'.format(len(mhs),singleTime))
+    multiTime, multi = scan(ws,'multi',mhs,xs)
+    logging.info('Shared spline: {} MH points in {:.3f} s'.format(len(mhs),multiTime))
+
+    maxDiff = max([abs(s-m)/max(abs(s),1e-12) for s,m in zip(single,multi)])
+    logging.info('Largest relative difference: {:.3g}'.format(maxDiff))
+    if maxDiff>1e-6:
+        logging.error('Shared spline values differ from RooSpline1D')
+        return 1
+    logging.info('Speedup: {:.1f}x'.format(singleTime/multiTime if multiTime else float('inf')))
+
+    return 0
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import logging
+import argparse
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+from CombineLimits.Limits.Limits import Limits
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+def buildCard(nprocesses,nbins,nsysts):
+    '''Build a synthetic card with a mix of fixed, templated and 'all' systematics.'''
+    limits = Limits('bench')
+    processes = ['proc{}'.format(p) for p in range(nprocesses)]
+    bins = ['bin{}'.format(b) for b in range(nbins)]
+    for b in bins:
+        limits.addBin(b)
+    for i,p in enumerate(processes):
+        limits.addProcess(p,signal=(i==0))
+    limits.addSystematic('lumi','lnN',systematics={(tuple(processes),('all',)): 1.025})
+    limits.addSystematic('relNormUnc_{process}','lnN',systematics=dict([(((p,),('all',)),1.05) for p in processes]))
+    for s in range(nsysts):
+        limits.addSystematic('syst{}'.format(s),'lnN',systematics={(('all',),('all',)): 1.01})
+    return limits, processes, bins
+
+def legacyGetSystematic(limits,systname,process,bin):
+    '''The linear scan used before the systematic index.'''
+    result = 1.
+    for syst in limits.systematics:
+        fullSystName = syst.format(process=process,bin=bin)
+        if fullSystName != systname: continue
+        for syst_vals in limits.systematics[syst]['values']:
+            s_processes, s_bins = syst_vals
+            if process not in s_processes and 'all' not in s_processes: continue
+            if bin not in s_bins and 'all' not in s_bins: continue
+            result = limits.systematics[syst]['values'][syst_vals]
+    return result
+
+def runCells(limits,processes,bins,getter):
+    '''Mimic the lookups done when filling the systematic rows of a card.'''
+    values = {}
+    for syst in limits.systematics:
+        for bin in bins:
+            for process in processes:
+                systname = syst.format(process=process,bin=bin)
+                values[(systname,process,bin)] = getter(limits,systname,process,bin)
+    return values
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark systematic lookups for datacard writing')
+
+    parser.add_argument('--processes', type=int, default=200, help='Number of processes')
+    parser.add_argument('--bins', type=int, default=50, help='Number of bins')
+    parser.add_argument('--systematics', type=int, default=30, help='Number of additional flat systematics')
+    parser.add_argument('--skipLegacy', action='store_true', help='Only time the indexed lookup')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    start = time.time()
+    limits, processes, bins = buildCard(args.processes,args.bins,args.systematics)
+    logging.info('Built card with {} processes, {} bins, {} systematics in {:.3f} s'.format(len(processes),len(bins),len(limits.systematics),time.time()-start))
+
+    start = time.time()
+    indexed = runCells(limits,processes,bins,lambda l,s,p,b: l.getSystematic(s,p,b))
+    indexedTime = time.time()-start
+    logging.info('Indexed lookup: {} cells in {:.3f} s'.format(len(indexed),indexedTime))
+
+    if args.skipLegacy: return 0
+
+    start = time.time()
+    legacy = runCells(limits,processes,bins,legacyGetSystematic)
+    legacyTime = time.time()-start
+    logging.info('Legacy lookup: {} cells in {:.3f} s'.format(len(legacy),legacyTime))
+
+    mismatches = [key for key in legacy if legacy[key]!=indexed[key]]
+    if mismatches:
+        logging.error('{} cells differ, e.g. {}'.format(len(mismatches),mismatches[0]))
+        return 1
+    logging.info('Speedup: {:.1f}x'.format(legacyTime/indexedTime if indexedTime else float('inf')))
+
+    return 0
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
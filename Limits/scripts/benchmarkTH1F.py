@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+
+import numpy as np
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+from CombineLimits.Limits.InputLoader import getTH1F, histArrays
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+def legacyTH1F(hist,xMin=0,xMax=30):
+    '''The bin by bin copy done by getTH1F before the array version.'''
+    width = hist.GetBinWidth(3)
+    newHist = ROOT.TH1F(hist.GetName()+'_legacy', hist.GetTitle(), hist.GetNbinsX(), hist.GetXaxis().GetXmin(), hist.GetXaxis().GetXmax())
+    newHist.SetDirectory(0)
+    for i in range(hist.GetNbinsX()):
+        upperEdge = hist.GetBinCenter(i) + width/2
+        lowerEdge = hist.GetBinCenter(i) - width/2
+        if upperEdge > xMin and lowerEdge < xMax:
+            newHist.SetBinContent(i, hist.GetBinContent(i))
+            newHist.SetBinError(i,   hist.GetBinError(i))
+        else:
+            newHist.SetBinContent(i,0)
+            newHist.SetBinError(i,0)
+    return newHist
+
+def buildHists(nhists,nbins,xMax,entries):
+    hists = []
+    for h in range(nhists):
+        hist = ROOT.TH1F('bench{}'.format(h),'bench{}'.format(h),nbins,0,xMax)
+        hist.SetDirectory(0)
+        hist.Sumw2()
+        mean = random.uniform(0.1,0.9)*xMax
+        for i in range(entries):
+            hist.Fill(random.gauss(mean,0.05*xMax),random.uniform(0.5,1.5))
+        hists += [hist]
+    return hists
+
+def timeCopies(function,hists,*args,**kwargs):
+    start = time.time()
+    results = [function(hist,*args,**kwargs) for hist in hists]
+    return time.time()-start, results
+
+def comparedCells(nbins,xMax,xMin,xMaxKept):
+    '''
+    The cells compared to the bin by bin copy. It skips the last bin and the overflow,
+    and rounds the bin edges differently, so the bins with an edge on the range are skipped too.
+    '''
+    edges = np.linspace(0,xMax,nbins+1)
+    lowerEdges = np.concatenate([[-np.inf],edges])[:nbins]
+    upperEdges = edges
+    boundary = np.zeros(nbins,dtype=bool)
+    for edge in [xMin,xMaxKept]:
+        boundary |= np.isclose(lowerEdges,edge) | np.isclose(upperEdges,edge)
+    return np.nonzero(~boundary)[0]
+
+def maxDifference(first,second,cells):
+    '''Largest difference of the contents and errors of two histograms over cells.'''
+    c1, w1 = histArrays(first)
+    c2, w2 = histArrays(second)
+    return max(np.max(np.abs(c1[cells]-c2[cells])),np.max(np.abs(np.sqrt(w1[cells])-np.sqrt(w2[cells]))))
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the array getTH1F against the bin by bin copy it replaces')
+
+    parser.add_argument('--hists', type=int, default=100, help='Number of histograms')
+    parser.add_argument('--bins', type=int, default=3000, help='Number of bins of each histogram')
+    parser.add_argument('--entries', type=int, default=10000, help='Number of entries of each histogram')
+    parser.add_argument('--xRange', type=float, nargs=2, default=[2.5,25], help='Range kept by getTH1F')
+    parser.add_argument('--rebin', type=int, default=10, help='Bins merged in the rebinning check')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed')
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='Largest allowed difference of the contents and errors')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    random.seed(args.seed)
+    hists = buildHists(args.hists,args.bins,30.,args.entries)
+
+    legacyTime, legacyHists = timeCopies(legacyTH1F,hists,*args.xRange)
+    arrayTime, arrayHists = timeCopies(getTH1F,hists,*args.xRange)
+    logging.info('{} histograms of {} bins: bin by bin {:.3g} s, arrays {:.3g} s, speedup {:.1f}x'.format(
+        args.hists,args.bins,legacyTime,arrayTime,legacyTime/arrayTime if arrayTime else float('inf')))
+
+    cells = comparedCells(args.bins,30.,*args.xRange)
+    maxDiff = max([maxDifference(l,a,cells) for l,a in zip(legacyHists,arrayHists)])
+    logging.info('largest difference to the bin by bin copy {:.3g}'.format(maxDiff))
+
+    rebinTime, rebinned = timeCopies(getTH1F,hists,float('-inf'),float('inf'),rebin=args.rebin)
+    start = time.time()
+    reference = []
+    for hist in hists:
+        clone = hist.Clone(hist.GetName()+'_rebin')
+        clone.SetDirectory(0)
+        reference += [clone.Rebin(args.rebin)]
+    referenceTime = time.time()-start
+    rebinDiff = max([maxDifference(r,a,slice(None)) for r,a in zip(reference,rebinned)])
+    logging.info('rebinning by {}: TH1::Rebin {:.3g} s, arrays {:.3g} s, largest difference {:.3g}'.format(args.rebin,referenceTime,rebinTime,rebinDiff))
+
+    status = 0
+    if maxDiff>args.tolerance:
+        logging.error('array and bin by bin copies differ')
+        status = 1
+    if rebinDiff>args.tolerance:
+        logging.error('array rebinning and TH1::Rebin differ')
+        status = 1
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
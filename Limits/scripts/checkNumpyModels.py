@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+import os
+import sys
+import math
+import logging
+import argparse
+
+import numpy as np
+
+import ROOT
+ROOT.PyConfig.IgnoreCommandLineOptions = True
+ROOT.gROOT.SetBatch()
+
+import CombineLimits.Limits.Models as Models
+from CombineLimits.Limits.NumpyModels import Evaluator
+
+logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s.%(msecs)03d %(levelname)s %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+XRANGE = [0,30]
+YRANGE = [0,30]
+MASSES = [4,5,7,9,11,13,15,17,19,21]
+
+def getModels():
+    '''(label, model) for every Models shape with a NumPy version, dependencies first.'''
+    splineArgs = lambda **kwargs: dict([('masses',MASSES)]+[(k,[f(m) for m in MASSES]) for k,f in kwargs.iteritems()])
+    return [
+        ('gaus',  Models.Gaussian('gaus', mean=[10,0,30], sigma=[0.8,0.1,5])),
+        ('bw',    Models.BreitWigner('bw', mean=[10,0,30], width=[0.5,0.1,5])),
+        ('voig',  Models.Voigtian('voig', mean=[10,0,30], width=[0.2,0.01,5], sigma=[0.4,0.01,5])),
+        ('cb',    Models.CrystalBall('cb', mean=[10,0,30], sigma=[0.6,0.1,5], a=[1.2,0.5,5], n=[2,1,10])),
+        ('dcb',   Models.DoubleCrystalBall('dcb', mean=[10,0,30], sigma=[0.6,0.1,5], a1=[1.2,0.5,5], n1=[3,1,10], a2=[1.8,0.5,5], n2=[2,1,10])),
+        ('dg',    Models.DoubleSidedGaussian('dg', mean=[10,0,30], sigma1=[0.4,0.1,5], sigma2=[0.9,0.1,5])),
+        ('dv',    Models.DoubleSidedVoigtian('dv', mean=[10,0,30], sigma1=[0.4,0.1,5], sigma2=[0.9,0.1,5], width1=[0.1,0.01,1], width2=[0.2,0.01,1], yMax=30)),
+        ('exp',   Models.Exponential('exp', lamb=[-0.2,-1,0])),
+        ('erf',   Models.Erf('erf', erfScale=[0.5,0.1,5], erfShift=[4,0,10])),
+        ('land',  Models.Landau('land', mu=[6,0,30], sigma=[1.5,0.1,5])),
+        ('cheb',  Models.Chebychev('cheb', order=2, p0=[0.2,-1,1], p1=[-0.1,-1,1])),
+        ('sum',   Models.Sum('sum', recursive=True, gaus=[0.3,0,1], exp=[0.4,0,1], land=[0.5,0,1])),
+        ('erfc',  Models.Prod('erfc', 'erf', 'exp')),
+        ('gausy', Models.Gaussian('gausy', x='y', mean=[8,0,30], sigma=[1.5,0.1,5])),
+        ('xy',    Models.Prod('xy', 'dcb', 'gausy')),
+        ('voigS', Models.VoigtianSpline('voigS', **splineArgs(means=lambda m: 0.99*m, widths=lambda m: 0.01*m, sigmas=lambda m: 0.02*m+0.01*math.sin(m)))),
+        ('dcbS',  Models.DoubleCrystalBallSpline('dcbS', **splineArgs(means=lambda m: m, sigmas=lambda m: 0.03*m, a1s=lambda m: 1.5, n1s=lambda m: 2+0.1*m, a2s=lambda m: 2, n2s=lambda m: 3))),
+        ('landS', Models.LandauSpline('landS', **splineArgs(mus=lambda m: 0.5*m, sigmas=lambda m: 0.1*m))),
+    ]
+
+def buildWorkspace(models):
+    ws = ROOT.RooWorkspace('check')
+    ws.factory('x[{},{}]'.format(*XRANGE))
+    ws.factory('y[{},{}]'.format(*YRANGE))
+    ws.factory('MH[{},{}]'.format(MASSES[0],MASSES[-1]))
+    for label, model in models:
+        model.build(ws,label)
+    return ws
+
+def compare(ws,evaluator,label,model,points,mhs):
+    '''Largest relative difference between RooFit and the evaluator on a grid of x, y and MH.'''
+    pdf = ws.pdf(label)
+    observables = sorted(evaluator.observables(label))
+    normSet = ROOT.RooArgSet()
+    for obs in observables: normSet.add(ws.var(obs))
+    grids = {}
+    for obs in observables:
+        lo, hi = XRANGE if obs=='x' else YRANGE
+        grids[obs] = [lo+(hi-lo)*(i+0.5)/points for i in range(points)]
+    spline = isinstance(model,Models.ModelSpline)
+    coords = dict([(obs,[]) for obs in observables]+([('MH',[])] if spline else []))
+    roofit = []
+    for mh in (mhs if spline else [None]):
+        if spline: ws.var('MH').setVal(mh)
+        for xv in grids[observables[0]]:
+            for yv in (grids[observables[1]] if len(observables)>1 else [None]):
+                ws.var(observables[0]).setVal(xv)
+                coords[observables[0]] += [xv]
+                if yv is not None:
+                    ws.var(observables[1]).setVal(yv)
+                    coords[observables[1]] += [yv]
+                if spline: coords['MH'] += [mh]
+                roofit += [pdf.getVal(normSet)]
+    roofit = np.array(roofit)
+    values = evaluator.evaluate(label,**coords)
+    good = roofit>1e-12*roofit.max()
+    return np.max(np.abs(values[good]-roofit[good])/roofit[good])
+
+def parse_command_line(argv):
+    parser = argparse.ArgumentParser(description='Cross-check the NumPy versions of the Models shapes against RooFit')
+
+    parser.add_argument('--points', type=int, default=60, help='Number of points per observable')
+    parser.add_argument('--mhs', type=float, nargs='+', default=[4.5,8.2,12,20.5], help='MH values for the spline models')
+    parser.add_argument('--tolerance', type=float, default=1e-4, help='Largest allowed relative difference')
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = parse_command_line(argv)
+
+    models = getModels()
+    ws = buildWorkspace(models)
+    evaluator = Evaluator({'x': XRANGE, 'y': YRANGE})
+    for label, model in models:
+        evaluator.add(model,label)
+
+    status = 0
+    for label, model in models:
+        maxDiff = compare(ws,evaluator,label,model,args.points,args.mhs)
+        logging.info('{} ({}): largest relative difference {:.3g}'.format(label,model.__class__.__name__,maxDiff))
+        if maxDiff>args.tolerance:
+            logging.error('{}: NumPy and RooFit values differ'.format(label))
+            status = 1
+
+    return status
+
+if __name__ == "__main__":
+    status = main()
+    sys.exit(status)
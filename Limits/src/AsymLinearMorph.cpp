@@ -0,0 +1,54 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A constant with asymmetric linear shifts in nuisance parameters           *
+ *****************************************************************************/
+
+#include "CombineLimits/Limits/interface/AsymLinearMorph.h"
+
+ClassImp(AsymLinearMorph)
+
+AsymLinearMorph::AsymLinearMorph(const char *name, const char *title,
+                       double _central,
+                       const RooArgList& _nuisances,
+                       const double *_ups,
+                       const double *_downs) :
+  RooAbsReal(name,title),
+  nuisances("nuisances","nuisances",this),
+  central(_central),
+  ups(_ups,_ups+_nuisances.getSize()),
+  downs(_downs,_downs+_nuisances.getSize())
+{
+  nuisances.add(_nuisances);
+}
+
+
+AsymLinearMorph::AsymLinearMorph(const AsymLinearMorph& other, const char* name) :
+  RooAbsReal(other,name),
+  nuisances("nuisances",this,other.nuisances),
+  central(other.central),
+  ups(other.ups),
+  downs(other.downs)
+{
+}
+
+
+Double_t AsymLinearMorph::evaluate() const
+{
+  double result = central;
+  const RooArgSet* nset = nuisances.nset();
+  for (unsigned int i=0; i<ups.size(); ++i) {
+    double shift = static_cast<RooAbsReal&>(nuisances[i]).getVal(nset);
+    result += shift*(shift>0 ? ups[i] : downs[i]);
+  }
+  return result;
+}
+
+
+Double_t AsymLinearMorph::partialDerivative(const RooAbsArg& nuisance) const
+{
+  int i = nuisances.index(&nuisance);
+  if (i<0) return 0;
+  double shift = static_cast<RooAbsReal&>(nuisances[i]).getVal(nuisances.nset());
+  return shift<0 ? downs[i] : ups[i];
+}
@@ -0,0 +1,57 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * Copies between a RooDataSet and contiguous columns of doubles             *
+ *****************************************************************************/
+
+#include "CombineLimits/Limits/interface/DataSetColumns.h"
+#include "RooRealVar.h"
+#include "RooArgSet.h"
+#include "RooGlobalFunc.h"
+#include <stdexcept>
+#include <vector>
+
+void DataSetColumns::extract(const RooDataSet& data, const RooArgList& vars, double *columns)
+{
+  unsigned int n = data.numEntries();
+  unsigned int ncol = vars.getSize();
+  // data.get(i) loads entry i into the same row, so the variables are looked up once
+  const RooArgSet* row = data.get();
+  std::vector<RooAbsReal*> reals(ncol);
+  for (unsigned int c=0; c<ncol; ++c) {
+    reals[c] = dynamic_cast<RooAbsReal*>(row->find(vars[c].GetName()));
+    if (!reals[c]) throw std::invalid_argument("DataSetColumns: a column is not a real variable of the dataset");
+  }
+  for (unsigned int i=0; i<n; ++i) {
+    data.get(i);
+    for (unsigned int c=0; c<ncol; ++c) columns[c*n+i] = reals[c]->getVal();
+    columns[ncol*n+i] = data.weight();
+  }
+}
+
+
+RooDataSet* DataSetColumns::fill(const char *name, const char *title,
+                                 const RooArgList& vars, RooRealVar *weightVar,
+                                 unsigned int n, const double *columns)
+{
+  unsigned int ncol = vars.getSize();
+  std::vector<RooRealVar*> reals(ncol);
+  for (unsigned int c=0; c<ncol; ++c) {
+    reals[c] = dynamic_cast<RooRealVar*>(vars.at(c));
+    if (!reals[c]) throw std::invalid_argument("DataSetColumns: only RooRealVar columns are supported");
+  }
+  RooArgSet row(vars);
+  RooDataSet* data;
+  if (weightVar) {
+    row.add(*weightVar);
+    data = new RooDataSet(name,title,row,RooFit::WeightVar(*weightVar));
+  }
+  else {
+    data = new RooDataSet(name,title,row);
+  }
+  for (unsigned int i=0; i<n; ++i) {
+    for (unsigned int c=0; c<ncol; ++c) reals[c]->setVal(columns[c*n+i]);
+    data->add(row,columns[ncol*n+i]);
+  }
+  return data;
+}
@@ -29,7 +29,8 @@ ClassImp(DoubleCrystalBall)
    a1("a1","a1",this,_a1),
    n1("n1","n1",this,_n1),
    a2("a2","a2",this,_a2),
-   n2("n2","n2",this,_n2)
+   n2("n2","n2",this,_n2),
+   cacheValid(false)
  { 
  } 
 
@@ -42,26 +43,78 @@ ClassImp(DoubleCrystalBall)
    a1("a1",this,other.a1),
    n1("n1",this,other.n1),
    a2("a2",this,other.a2),
-   n2("n2",this,other.n2)
+   n2("n2",this,other.n2),
+   cacheValid(false)
  { 
  } 
 
 
 
+void DoubleCrystalBall::updateConstants() const
+{
+	if (cacheValid && a1==cache_a1 && n1==cache_n1 && a2==cache_a2 && n2==cache_n2) return;
+	cache_a1 = a1; cache_n1 = n1; cache_a2 = a2; cache_n2 = n2;
+	A1  = TMath::Power(n1/TMath::Abs(a1),n1)*TMath::Exp(-a1*a1/2);
+	A2  = TMath::Power(n2/TMath::Abs(a2),n2)*TMath::Exp(-a2*a2/2);
+	B1  = n1/TMath::Abs(a1) - TMath::Abs(a1);
+	B2  = n2/TMath::Abs(a2) - TMath::Abs(a2);
+	cacheValid = true;
+}
+
+
+inline double DoubleCrystalBall::shape(double u) const
+{
+	if      (u<-cache_a1) return A1*TMath::Power(B1-u,-cache_n1);
+	else if (u<cache_a2)  return TMath::Exp(-u*u/2);
+	else                  return A2*TMath::Power(B2+u,-cache_n2);
+}
+
+
 Double_t DoubleCrystalBall::evaluate() const 
 { 
-	double u   = (x-mean)/sig;
-	double A1  = TMath::Power(n1/TMath::Abs(a1),n1)*TMath::Exp(-a1*a1/2);
-	double A2  = TMath::Power(n2/TMath::Abs(a2),n2)*TMath::Exp(-a2*a2/2);
-	double B1  = n1/TMath::Abs(a1) - TMath::Abs(a1);
-	double B2  = n2/TMath::Abs(a2) - TMath::Abs(a2);
-
-	double result(1);
-	if      (u<-a1) result *= A1*TMath::Power(B1-u,-n1);
-	else if (u<a2)  result *= TMath::Exp(-u*u/2);
-	else            result *= A2*TMath::Power(B2+u,-n2);
- 	return result;
+	updateConstants();
+	return shape((x-mean)/sig);
 } 
 
 
+void DoubleCrystalBall::evaluateArray(const double *xs, double *out, unsigned int n) const
+{
+	updateConstants();
+	double m = mean;
+	double invSig = 1./sig;
+	for (unsigned int i=0; i<n; ++i) out[i] = shape((xs[i]-m)*invSig);
+}
+
+
+// integral of A*(B-u)^-n from u0 to u1, both below B
+static double powerTailIntegral(double A, double B, double n, double u0, double u1)
+{
+	if (TMath::Abs(n-1)<1e-5) return A*(TMath::Log(B-u0)-TMath::Log(B-u1));
+	return A/(n-1)*(TMath::Power(B-u1,1-n)-TMath::Power(B-u0,1-n));
+}
+
+
+Int_t DoubleCrystalBall::getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* /*rangeName*/) const
+{
+	if (matchArgs(allVars,analVars,x)) return 1;
+	return 0;
+}
+
+
+Double_t DoubleCrystalBall::analyticalIntegral(Int_t code, const char* rangeName) const
+{
+	R__ASSERT(code==1);
+	// the same pieces as evaluate: power law tails below -a1 and above a2, gaussian core between
+	double umin = (x.min(rangeName)-mean)/sig;
+	double umax = (x.max(rangeName)-mean)/sig;
+	updateConstants();
 
+	double result = 0;
+	if (umin<-a1) result += powerTailIntegral(A1,B1,n1,umin,TMath::Min(umax,-a1));
+	double lo = TMath::Max(umin,-a1);
+	double hi = TMath::Min(umax,a2);
+	if (lo<hi) result += TMath::Sqrt(TMath::PiOver2())*(TMath::Erf(hi/TMath::Sqrt2())-TMath::Erf(lo/TMath::Sqrt2()));
+	// the upper tail in -u is a lower tail
+	if (umax>a2) result += powerTailIntegral(A2,B2,n2,-umax,-TMath::Max(umin,a2));
+	return sig*result;
+}
@@ -26,6 +26,7 @@ DoubleSidedGaussian::DoubleSidedGaussian(const char *name, const char *title,
   mean("mean","mean",this,_mean),
   sig1("sig1","sig1",this,_sig1),
   sig2("sig2","sig2",this,_sig2),
+  cacheValid(false),
   yMax(_yMax)
 {
 } 
@@ -37,28 +38,47 @@ DoubleSidedGaussian::DoubleSidedGaussian(const DoubleSidedGaussian& other, const
   mean("mean",this,other.mean),
   sig1("sig1",this,other.sig1),
   sig2("sig2",this,other.sig2),
+  cacheValid(false),
   yMax(other.yMax)
 { 
 } 
 
 
 
-Double_t DoubleSidedGaussian::evaluate() const 
-{ 
-  double result = -1;
+void DoubleSidedGaussian::updateConstants() const
+{
+  if (cacheValid && mean==cache_mean && sig1==cache_sig1 && sig2==cache_sig2) return;
+  cache_mean = mean; cache_sig1 = sig1; cache_sig2 = sig2;
   double sqrt2pi = TMath::Power( 2 * TMath::Pi(), 0.5); 
-  double mode = mean - 2 / sqrt2pi * (sig2 - sig1);
+  mode = mean - 2 / sqrt2pi * (sig2 - sig1);
 //  if (mode > yMax) 
 //    mode = yMax;
 //  double A = 2 / sqrt2pi / (sig1 + sig2); 
   double A1 = 1 / (sig1*sqrt2pi), A2 = 1 / (sig2*sqrt2pi);
   double scaleFactor = sig2 / sig1;
   double total_integral = 0.5 * (1 + scaleFactor);
-  if ( x < mode)
-    result = A1 * TMath::Exp(-1 * (x-mode) * (x-mode) / (2 * sig1 * sig1)) / total_integral;
+  norm1 = A1 / total_integral;
+  norm2 = A2 * scaleFactor / total_integral;
+  inv1 = 1 / (2 * sig1 * sig1);
+  inv2 = 1 / (2 * sig2 * sig2);
+  cacheValid = true;
+}
+
+
+inline double DoubleSidedGaussian::shape(double xv) const
+{
+  double d = xv - mode;
+  if ( xv < mode)
+    return norm1 * TMath::Exp(-d * d * inv1);
   else
-    result = A2 * TMath::Exp(-1 * (x-mode) * (x-mode) / (2 * sig2 * sig2)) * scaleFactor / total_integral;
-  return result;
+    return norm2 * TMath::Exp(-d * d * inv2);
+}
+
+
+Double_t DoubleSidedGaussian::evaluate() const 
+{ 
+  updateConstants();
+  return shape(x);
 
 //  // From wikipedia
 //  double result = -1;
@@ -72,3 +92,35 @@ Double_t DoubleSidedGaussian::evaluate() const
 //  return result;
 } 
 
+
+void DoubleSidedGaussian::evaluateArray(const double *xs, double *out, unsigned int n) const
+{
+  updateConstants();
+  for (unsigned int i=0; i<n; ++i) out[i] = shape(xs[i]);
+}
+
+
+Int_t DoubleSidedGaussian::getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* /*rangeName*/) const
+{
+  if (matchArgs(allVars,analVars,x)) return 1;
+  return 0;
+}
+
+
+Double_t DoubleSidedGaussian::analyticalIntegral(Int_t code, const char* rangeName) const
+{
+  R__ASSERT(code==1);
+  // the two half gaussians of evaluate, split at the mode
+  updateConstants();
+  double xmin = x.min(rangeName), xmax = x.max(rangeName);
+  double result = 0;
+  if (xmin < mode) {
+    double hi = TMath::Min(xmax,mode);
+    result += norm1 * sig1 * TMath::Sqrt(TMath::PiOver2()) * (TMath::Erf((hi-mode)/(TMath::Sqrt2()*sig1)) - TMath::Erf((xmin-mode)/(TMath::Sqrt2()*sig1)));
+  }
+  if (xmax > mode) {
+    double lo = TMath::Max(xmin,mode);
+    result += norm2 * sig2 * TMath::Sqrt(TMath::PiOver2()) * (TMath::Erf((xmax-mode)/(TMath::Sqrt2()*sig2)) - TMath::Erf((lo-mode)/(TMath::Sqrt2()*sig2)));
+  }
+  return result;
+}
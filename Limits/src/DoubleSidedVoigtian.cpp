@@ -32,6 +32,7 @@ DoubleSidedVoigtian::DoubleSidedVoigtian(const char *name, const char *title,
   sig2("sig2","sig2",this,_sig2),
   wid1("wid1","wid1",this,_wid1),
   wid2("wid2","wid2",this,_wid2),
+  cacheValid(false),
   yMax(_yMax)
 { 
 } 
@@ -45,48 +46,55 @@ DoubleSidedVoigtian::DoubleSidedVoigtian(const DoubleSidedVoigtian& other, const
   sig2("sig2",this,other.sig2),
   wid1("wid1",this,other.wid1),
   wid2("wid2",this,other.wid2),
+  cacheValid(false),
   yMax(other.yMax)
 { 
 } 
 
 
 
-Double_t DoubleSidedVoigtian::evaluate() const 
-{ 
-  double sqrttwologtwo = TMath::Power( 2*TMath::Log(2), 0.5);
-  double gau1_width = sig1*sqrttwologtwo, gau2_width = sig2*sqrttwologtwo;
-  double voigt1_width = 0.5346*wid1 + TMath::Power(.2166*wid1*wid1+gau1_width*gau1_width, 0.5);
-  double voigt2_width = 0.5346*wid2 + TMath::Power(.2166*wid2*wid2+gau2_width*gau2_width, 0.5);
-  double mode = mean - TMath::Power(2/TMath::Pi(), 0.5) * (voigt2_width - voigt1_width);
-  if (mode > yMax)
-    mode = yMax;
-  double C1 = 1 / (TMath::Sqrt(2.0)*sig1); 
-  double C2 = 1 / (TMath::Sqrt(2.0)*sig2);
-  Double_t A1 = 0.5*C1*wid1;
-  Double_t A2 = 0.5*C2*wid2;
-  Double_t U1 = C1*(x-mean);
-  Double_t U2 = C2*(x-mean);
-  std::complex<Double_t> Z1(U1,A1) ;
-  std::complex<Double_t> Z2(U2,A2) ;
-  std::complex<Double_t> voigt(0.) ;
-  std::complex<Double_t> Z1_at_mean(0,A1) ;
-  std::complex<Double_t> Z2_at_mean(0,A2) ;
-  std::complex<Double_t> voigt1_at_mean = RooMath::faddeeva_fast(Z1);
-  std::complex<Double_t> voigt2_at_mean = RooMath::faddeeva_fast(Z2);
-  double scale_factor = (voigt1_at_mean.real() / voigt2_at_mean.real()) * (sig2/sig1);
+void DoubleSidedVoigtian::updateConstants() const
+{
+  if (cacheValid && sig1==cache_sig1 && sig2==cache_sig2 && wid1==cache_wid1 && wid2==cache_wid2) return;
+  cache_sig1 = sig1; cache_sig2 = sig2; cache_wid1 = wid1; cache_wid2 = wid2;
+  C1 = 1 / (TMath::Sqrt(2.0)*sig1); 
+  C2 = 1 / (TMath::Sqrt(2.0)*sig2);
+  A1 = 0.5*C1*wid1;
+  A2 = 0.5*C2*wid2;
+  sigRatio = sig2/sig1;
+  cacheValid = true;
+}
+
+
+// The mode (clamped at yMax) used to be computed here as well, but it never entered the result.
+inline double DoubleSidedVoigtian::shape(double xv) const
+{
+  double m = mean;
+  std::complex<Double_t> Z1(C1*(xv-m),A1) ;
+  std::complex<Double_t> Z2(C2*(xv-m),A2) ;
+  double voigt1 = RooMath::faddeeva_fast(Z1).real();
+  double voigt2 = RooMath::faddeeva_fast(Z2).real();
+  double scale_factor = (voigt1 / voigt2) * sigRatio;
   double total_integral = .5 * (1+scale_factor);
-  if ( x < mean)
-  {
-    voigt = RooMath::faddeeva_fast(Z1);
-    return 0.5 * C1 * voigt.real() / TMath::Power(TMath::Pi(), 0.5) / total_integral;
-  }//if
+  if ( xv < m)
+    return 0.5 * C1 * voigt1 / TMath::Sqrt(TMath::Pi()) / total_integral;
   else
-  {
-    voigt = RooMath::faddeeva_fast(Z2);
-    return 0.5 * C2 * voigt.real() / TMath::Power(TMath::Pi(), 0.5) * scale_factor / total_integral;
-  }//else
+    return 0.5 * C2 * voigt2 / TMath::Sqrt(TMath::Pi()) * scale_factor / total_integral;
+}
 
-} 
 
+// No analytical integral: with the scale factor taken at x, both branches reduce to
+// V1*V2/(V1+V2) of the two Voigt profiles, which has no closed form integral,
+// so the normalization is left to the numerical integration of RooFit.
+Double_t DoubleSidedVoigtian::evaluate() const 
+{ 
+  updateConstants();
+  return shape(x);
+} 
 
 
+void DoubleSidedVoigtian::evaluateArray(const double *xs, double *out, unsigned int n) const
+{
+  updateConstants();
+  for (unsigned int i=0; i<n; ++i) out[i] = shape(xs[i]);
+}
@@ -0,0 +1,131 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A pdf in x tabulated on a uniform grid in MH and x                       *
+ *****************************************************************************/
+
+#include "CombineLimits/Limits/interface/MHTemplatePdf.h"
+#include "TMath.h"
+
+ClassImp(MHTemplatePdf)
+
+MHTemplatePdf::MHTemplatePdf(const char *name, const char *title,
+                       RooAbsReal& _x,
+                       RooAbsReal& _mh,
+                       unsigned int _nmh, double _mhmin, double _mhmax,
+                       unsigned int _nx, double _xmin, double _xmax,
+                       const float *_values) :
+  RooAbsPdf(name,title),
+  x("x","x",this,_x),
+  mh("mh","mh",this,_mh),
+  nmh(_nmh),
+  mhmin(_mhmin),
+  mhmax(_mhmax),
+  nx(_nx),
+  xmin(_xmin),
+  xmax(_xmax),
+  values(_values,_values+_nmh*_nx),
+  cacheValid(false)
+{
+}
+
+
+MHTemplatePdf::MHTemplatePdf(const MHTemplatePdf& other, const char* name) :
+  RooAbsPdf(other,name),
+  x("x",this,other.x),
+  mh("mh",this,other.mh),
+  nmh(other.nmh),
+  mhmin(other.mhmin),
+  mhmax(other.mhmax),
+  nx(other.nx),
+  xmin(other.xmin),
+  xmax(other.xmax),
+  values(other.values),
+  cacheValid(false)
+{
+}
+
+
+// the row i of the grid below mh and the fraction t of the way to row i+1
+void MHTemplatePdf::locateMH(double &t, unsigned int &i) const
+{
+  i = 0;
+  t = 0;
+  if (nmh<2) return;
+  double u = (mh-mhmin)/(mhmax-mhmin)*(nmh-1);
+  if (u<=0) return;
+  if (u>=nmh-1) {
+    i = nmh-2;
+    t = 1;
+    return;
+  }
+  i = (unsigned int)u;
+  t = u-i;
+}
+
+
+Double_t MHTemplatePdf::evaluate() const
+{
+  unsigned int i;
+  double t;
+  locateMH(t,i);
+  double v = (x-xmin)/(xmax-xmin)*(nx-1);
+  v = TMath::Min(TMath::Max(v,0.),double(nx-1));
+  unsigned int j = TMath::Min((unsigned int)v,nx-2);
+  double s = v-j;
+  const float *row = &values[i*nx+j];
+  double result = (1-t)*((1-s)*row[0] + s*row[1]);
+  if (t>0) result += t*((1-s)*row[nx] + s*row[nx+1]);
+  return result;
+}
+
+
+// integral of the row from the first grid point up to the fractional grid index u
+double MHTemplatePdf::rowPrimitive(unsigned int row, double u) const
+{
+  double dx = (xmax-xmin)/(nx-1);
+  unsigned int j = TMath::Min((unsigned int)u,nx-2);
+  double s = u-j;
+  const float *f = &values[row*nx+j];
+  return cumulative[row*nx+j] + dx*(f[0]*s + (f[1]-f[0])*s*s/2);
+}
+
+
+double MHTemplatePdf::rowIntegral(unsigned int row, double a, double b) const
+{
+  double ua = TMath::Min(TMath::Max((a-xmin)/(xmax-xmin)*(nx-1),0.),double(nx-1));
+  double ub = TMath::Min(TMath::Max((b-xmin)/(xmax-xmin)*(nx-1),0.),double(nx-1));
+  return rowPrimitive(row,ub) - rowPrimitive(row,ua);
+}
+
+
+Int_t MHTemplatePdf::getAnalyticalIntegral(RooArgSet& allVars, RooArgSet& analVars, const char* /*rangeName*/) const
+{
+  if (matchArgs(allVars,analVars,x)) return 1;
+  return 0;
+}
+
+
+Double_t MHTemplatePdf::analyticalIntegral(Int_t code, const char* rangeName) const
+{
+  R__ASSERT(code==1);
+  if (!cacheValid) {
+    // trapezoids of the piecewise linear rows
+    double dx = (xmax-xmin)/(nx-1);
+    cumulative.assign(nmh*nx,0.);
+    for (unsigned int k=0; k<nmh; ++k) {
+      for (unsigned int j=1; j<nx; ++j) {
+        cumulative[k*nx+j] = cumulative[k*nx+j-1] + 0.5*dx*(values[k*nx+j-1]+values[k*nx+j]);
+      }
+    }
+    cacheValid = true;
+  }
+  // the interpolation is linear in MH, so is the integral
+  unsigned int i;
+  double t;
+  locateMH(t,i);
+  double a = x.min(rangeName), b = x.max(rangeName);
+  double result = (1-t)*rowIntegral(i,a,b);
+  if (t>0) result += t*rowIntegral(i+1,a,b);
+  return result;
+}
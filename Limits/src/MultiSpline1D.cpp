@@ -0,0 +1,138 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * Several natural cubic splines on a common knot grid                       *
+ *****************************************************************************/
+
+#include "CombineLimits/Limits/interface/MultiSpline1D.h"
+#include <algorithm>
+
+ClassImp(MultiSpline1D)
+ClassImp(MultiSpline1DOutput)
+
+MultiSpline1D::MultiSpline1D(const char *name, const char *title,
+                       RooAbsReal& _xvar,
+                       unsigned int _npoints,
+                       unsigned int _noutputs,
+                       const double *_xvals,
+                       const double *_yvals) :
+  RooAbsReal(name,title),
+  xvar("xvar","xvar",this,_xvar),
+  npoints(_npoints),
+  noutputs(_noutputs),
+  xvals(_xvals,_xvals+_npoints),
+  yvals(_yvals,_yvals+_npoints*_noutputs),
+  cacheValid(false)
+{
+  computeSecondDerivatives();
+}
+
+
+MultiSpline1D::MultiSpline1D(const MultiSpline1D& other, const char* name) :
+  RooAbsReal(other,name),
+  xvar("xvar",this,other.xvar),
+  npoints(other.npoints),
+  noutputs(other.noutputs),
+  xvals(other.xvals),
+  yvals(other.yvals),
+  d2vals(other.d2vals),
+  cacheValid(false)
+{
+}
+
+
+void MultiSpline1D::computeSecondDerivatives()
+{
+  // natural boundary conditions: zero second derivative at the end knots
+  // solve the tridiagonal system for the inner knots of every output
+  d2vals.assign(npoints*noutputs,0.);
+  if (npoints<3) return;
+  std::vector<double> diag(npoints), rhs(npoints);
+  for (unsigned int o=0; o<noutputs; ++o) {
+    const double *y = &yvals[o*npoints];
+    double *d2 = &d2vals[o*npoints];
+    for (unsigned int i=1; i<npoints-1; ++i) {
+      double hl = xvals[i]-xvals[i-1];
+      double hr = xvals[i+1]-xvals[i];
+      diag[i] = 2*(hl+hr);
+      rhs[i]  = 6*((y[i+1]-y[i])/hr - (y[i]-y[i-1])/hl);
+      if (i>1) {
+        double w = hl/diag[i-1];
+        diag[i] -= w*hl;
+        rhs[i]  -= w*rhs[i-1];
+      }
+    }
+    for (unsigned int i=npoints-2; i>0; --i) {
+      double hr = xvals[i+1]-xvals[i];
+      d2[i] = (rhs[i] - hr*d2[i+1])/diag[i];
+    }
+  }
+}
+
+
+void MultiSpline1D::update(double x) const
+{
+  cacheVals.resize(noutputs);
+  if (npoints<2) {
+    for (unsigned int o=0; o<noutputs; ++o) cacheVals[o] = npoints ? yvals[o*npoints] : 0.;
+  }
+  else {
+    // knot search, starting from the last interval since scans move in small steps
+    unsigned int k = cacheInterval;
+    if (!cacheValid || k>npoints-2 || x<xvals[k] || x>=xvals[k+1]) {
+      k = std::upper_bound(xvals.begin(),xvals.end(),x) - xvals.begin();
+      k = k>0 ? k-1 : 0;
+      if (k>npoints-2) k = npoints-2;
+    }
+    double h = xvals[k+1]-xvals[k];
+    double a = (xvals[k+1]-x)/h;
+    double b = (x-xvals[k])/h;
+    double ca = (a*a*a-a)*h*h/6;
+    double cb = (b*b*b-b)*h*h/6;
+    for (unsigned int o=0; o<noutputs; ++o) {
+      unsigned int i = o*npoints+k;
+      cacheVals[o] = a*yvals[i] + b*yvals[i+1] + ca*d2vals[i] + cb*d2vals[i+1];
+    }
+    cacheInterval = k;
+  }
+  cacheX = x;
+  cacheValid = true;
+}
+
+
+Double_t MultiSpline1D::evaluateOutput(unsigned int i) const
+{
+  double x = xvar;
+  if (!cacheValid || x!=cacheX) update(x);
+  return cacheVals[i];
+}
+
+
+Double_t MultiSpline1D::evaluate() const
+{
+  return evaluateOutput(0);
+}
+
+
+MultiSpline1DOutput::MultiSpline1DOutput(const char *name, const char *title,
+                       MultiSpline1D& _spline,
+                       unsigned int _index) :
+  RooAbsReal(name,title),
+  spline("spline","spline",this,_spline),
+  index(_index)
+{
+}
+
+
+MultiSpline1DOutput::MultiSpline1DOutput(const MultiSpline1DOutput& other, const char* name) :
+  RooAbsReal(other,name),
+  spline("spline",this,other.spline),
+  index(other.index)
+{
+}
+
+
+Double_t MultiSpline1DOutput::evaluate() const
+{
+  return static_cast<const MultiSpline1D&>(spline.arg()).evaluateOutput(index);
+}
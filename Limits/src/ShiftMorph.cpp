@@ -0,0 +1,55 @@
+/*****************************************************************************
+ * Project: RooFit                                                           *
+ *                                                                           *
+ * A central value with piecewise linear shifts in nuisance parameters       *
+ *****************************************************************************/
+
+#include "CombineLimits/Limits/interface/ShiftMorph.h"
+#include "RooMsgService.h"
+#include <stdexcept>
+
+ClassImp(ShiftMorph)
+
+ShiftMorph::ShiftMorph(const char *name, const char *title,
+                       RooAbsReal& _central,
+                       const RooArgList& _nuisances,
+                       const RooArgList& _ups,
+                       const RooArgList& _downs) :
+  RooAbsReal(name,title),
+  central("central","central",this,_central),
+  nuisances("nuisances","nuisances",this),
+  ups("ups","ups",this),
+  downs("downs","downs",this)
+{
+  if (_nuisances.getSize()!=_ups.getSize() || _nuisances.getSize()!=_downs.getSize()) {
+    coutE(InputArguments) << "ShiftMorph::ShiftMorph(" << GetName() << ") the nuisance, up and down lists differ in size" << std::endl;
+    throw std::invalid_argument("ShiftMorph: nuisance, up and down lists differ in size");
+  }
+  nuisances.add(_nuisances);
+  ups.add(_ups);
+  downs.add(_downs);
+}
+
+
+ShiftMorph::ShiftMorph(const ShiftMorph& other, const char* name) :
+  RooAbsReal(other,name),
+  central("central",this,other.central),
+  nuisances("nuisances",this,other.nuisances),
+  ups("ups",this,other.ups),
+  downs("downs",this,other.downs)
+{
+}
+
+
+Double_t ShiftMorph::evaluate() const
+{
+  double result = central;
+  const RooArgSet* nset = nuisances.nset();
+  for (int i=0; i<nuisances.getSize(); ++i) {
+    double shift = static_cast<RooAbsReal&>(nuisances[i]).getVal(nset);
+    // only the side that is used is evaluated
+    if (shift>0)      result += shift*static_cast<RooAbsReal&>(ups[i]).getVal(nset);
+    else if (shift<0) result += shift*static_cast<RooAbsReal&>(downs[i]).getVal(nset);
+  }
+  return result;
+}
@@ -2,3 +2,8 @@
 #include "CombineLimits/Limits/interface/DoubleSidedGaussian.h"
 #include "CombineLimits/Limits/interface/DoubleSidedVoigtian.h"
 #include "CombineLimits/Limits/interface/PowerLaw.h"
+#include "CombineLimits/Limits/interface/MultiSpline1D.h"
+#include "CombineLimits/Limits/interface/MHTemplatePdf.h"
+#include "CombineLimits/Limits/interface/ShiftMorph.h"
+#include "CombineLimits/Limits/interface/AsymLinearMorph.h"
+#include "CombineLimits/Limits/interface/DataSetColumns.h"